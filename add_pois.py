@@ -1,10 +1,12 @@
+import os
+
 import osmnx as ox
 import geopandas as gpd
 import pandas as pd
 from bayesian_risk import compute_risk_score  # assumes this function exists and takes amenity as input
+from geo_store import write_geo_table
 
-def main():
-    place = "Uttarakhand, India"
+def extract_pois(place="Uttarakhand, India", out_path='pois.csv'):
     print(f"Downloading POIs for: {place}")
 
     tags = {
@@ -28,8 +30,13 @@ def main():
     # Compute risk scores
     pois['risk_score'] = pois['amenity'].apply(compute_risk_score)
 
-    pois.to_csv('data/pois.csv', index=False)
-    print("✅ POIs with risk_score saved to data/pois.csv")
+    pois.to_csv(out_path, index=False)
+    write_geo_table(pois, os.path.splitext(out_path)[0] + ".parquet")
+    print(f"✅ POIs with risk_score saved to {out_path} (+ .parquet)")
+    return pois
+
+def main():
+    extract_pois()
 
 if __name__ == "__main__":
     main()
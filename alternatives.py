@@ -0,0 +1,163 @@
+# alternatives.py
+import heapq
+from collections import namedtuple
+
+import numpy as np
+
+from profiling import PROFILER
+from route_engine import INF, RouteResult, _as_list, _count_work, _result, bidirectional_dijkstra
+
+# Routes may cost at most (1 + MAX_STRETCH) times the best route
+MAX_STRETCH = 0.25
+# Largest share of a route's length it may have in common with any better-ranked route
+MAX_SHARED = 0.6
+# Sub-paths this share of the best cost long, around the via node, must be shortest paths
+LOCAL_OPTIMALITY = 0.25
+# Slack allowed on the local optimality test (rounding and near-ties)
+LOCAL_SLACK = 0.01
+# Via routes built and tested before giving up on finding k routes
+MAX_CANDIDATES = 200
+
+# rank starts at 1 (the best route); shared is the largest length share in common with a better-ranked route
+Alternative = namedtuple("Alternative", ["rank", "route", "shared", "via"])
+
+
+def _search_trees(snapshot, weights, source, target, stretch):
+    """
+    Bidirectional Dijkstra that keeps going after the shortest path is
+    found, until no unsettled pair of nodes can be joined within
+    (1 + stretch) times the best cost. Returns (best, (dist, parent) forward,
+    (dist, parent) backward) over every labelled node; labels of unsettled
+    nodes are upper bounds reached through settled ones. The backward parent
+    of a node is the edge leaving it towards the target.
+    """
+    adj = snapshot.adjacency_lists()
+    indptr, target_of = adj["indptr"], adj["edge_target"]
+    rev_indptr, rev_edges, source_of = adj["rev_indptr"], adj["rev_edges"], adj["edge_source"]
+    w = _as_list(weights)
+
+    dist = ({source: 0.0}, {target: 0.0})
+    parent = ({source: -1}, {target: -1})
+    settled = (set(), set())
+    heaps = ([(0.0, source)], [(0.0, target)])
+    best = INF
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] > (1 + stretch) * best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        d, node = heapq.heappop(heaps[side])
+        if node in settled[side]:
+            continue
+        settled[side].add(node)
+        my_dist, other_dist, my_parent = dist[side], dist[1 - side], parent[side]
+        if side == 0:
+            edges = range(indptr[node], indptr[node + 1])
+        else:
+            edges = (rev_edges[i] for i in range(rev_indptr[node], rev_indptr[node + 1]))
+        for e in edges:
+            nbr = target_of[e] if side == 0 else source_of[e]
+            nd = d + w[e]
+            if nd < my_dist.get(nbr, INF):
+                my_dist[nbr] = nd
+                my_parent[nbr] = e
+                heapq.heappush(heaps[side], (nd, nbr))
+                if nbr in other_dist and nd + other_dist[nbr] < best:
+                    best = nd + other_dist[nbr]
+
+    if PROFILER.enabled:
+        _count_work(indptr, settled[0], settled[1], rev_indptr)
+    return best, (dist[0], parent[0]), (dist[1], parent[1])
+
+
+def _via_edges(adj, forward_parent, backward_parent, via):
+    # Edge ids source -> via (forward tree) followed by via -> target (backward tree)
+    source_of, target_of = adj["edge_source"], adj["edge_target"]
+    edges = []
+    node = via
+    while forward_parent[node] >= 0:
+        edges.append(forward_parent[node])
+        node = source_of[forward_parent[node]]
+    edges.reverse()
+    node = via
+    while backward_parent[node] >= 0:
+        edges.append(backward_parent[node])
+        node = target_of[backward_parent[node]]
+    return edges
+
+
+def _locally_optimal(snapshot, weights, nodes, prefix, at, window):
+    """
+    T-test: the sub-path reaching window / 2 back and forth from position
+    at must be (almost) a shortest path. prefix holds the route's cumulative
+    cost per node, so the window is found by binary search.
+    """
+    lo = max(int(np.searchsorted(prefix, prefix[at] - window / 2, side="right")) - 1, 0)
+    hi = min(int(np.searchsorted(prefix, prefix[at] + window / 2, side="left")), len(nodes) - 1)
+    if hi - lo < 2:
+        return True
+    shortest = bidirectional_dijkstra(snapshot, weights, nodes[lo], nodes[hi])
+    return shortest is not None and prefix[hi] - prefix[lo] <= (1 + LOCAL_SLACK) * shortest.cost + 1e-9
+
+
+def alternative_routes(snapshot, weights, source, target, k=3, max_stretch=MAX_STRETCH, max_shared=MAX_SHARED,
+                       local_optimality=LOCAL_OPTIMALITY, max_candidates=MAX_CANDIDATES):
+    """
+    Up to k low-cost, meaningfully different routes between two node
+    indices, best first, using via-node search over plateaus.
+
+    One bidirectional search (_search_trees) settles every node that can lie
+    on a route within the stretch bound. Each node labelled from both sides is
+    a via node whose route is the forward tree path to it plus the backward
+    tree path from it. Candidates are taken cheapest first and kept when the
+    route has no loops, shares at most max_shared of its length with every
+    route kept so far, and is locally optimal around the via node. All nodes
+    of a candidate lying on its plateau (sections both trees agree on) give
+    the same route, so they are skipped afterwards.
+    Returns a list of Alternative; empty when the target is unreachable.
+    """
+    if source == target:
+        return [Alternative(1, RouteResult([source], [], 0.0, 0.0), 0.0, source)]
+    weights = np.asarray(weights, dtype=np.float64)
+    best, (forward, forward_parent), (backward, backward_parent) = _search_trees(
+        snapshot, weights, source, target, max_stretch)
+    if best == INF:
+        return []
+
+    adj = snapshot.adjacency_lists()
+    bound = (1 + max_stretch) * best
+    candidates = sorted((forward[v] + backward[v], v) for v in forward.keys() & backward.keys()
+                        if forward[v] + backward[v] <= bound)
+    kept, kept_edges, done = [], [], set()
+    tried = 0
+    for cost, via in candidates:
+        if len(kept) >= k or tried >= max_candidates:
+            break
+        if via in done:
+            continue
+        tried += 1
+        edges = _via_edges(adj, forward_parent, backward_parent, via)
+        route = _result(snapshot, weights, source, edges)
+        # Every node whose own via route is this same route sits on its plateau
+        done.update(n for n in route.nodes if n in backward and forward.get(n, INF) + backward[n] <= cost + 1e-9)
+        if len(set(route.nodes)) < len(route.nodes):
+            continue
+        edge_set = set(edges)
+        shared = max((shared_length(snapshot, edge_set, other) / max(route.length, 1e-9) for other in kept_edges),
+                     default=0.0)
+        if shared > max_shared:
+            continue
+        if kept:
+            prefix = np.concatenate([[0.0], np.cumsum(weights[edges])])
+            if not _locally_optimal(snapshot, weights, route.nodes, prefix, route.nodes.index(via),
+                                    local_optimality * best):
+                continue
+        kept.append(Alternative(len(kept) + 1, route, float(shared), via))
+        kept_edges.append(edge_set)
+    return kept
+
+
+def shared_length(snapshot, a, b):
+    # Meters of road two routes (edge id lists) have in common
+    common = list(set(a) & set(b))
+    return float(snapshot.edge_length[common].sum()) if common else 0.0
@@ -1,22 +1,51 @@
 import streamlit as st
 import osmnx as ox
-import networkx as nx
 from geopy.distance import geodesic
 import folium
 from streamlit_folium import st_folium
 import pandas as pd
 import numpy as np
+from shapely.geometry import Point
+
+from facility_coverage import cell_size_km, coverage_for
+from closures import ClosureRegistry
+from cost_matrix import RELIEF_AMENITIES
+from alternatives import MAX_STRETCH, alternative_routes
+from edge_costs import snapshot_cost
+from graph_snapshot import SNAPSHOT_DIR, load_snapshot, snapshot_exists, snapshot_files_stamp, snapshot_from_networkx
+from map_render import simplify_route
+from hazard_risk import hazard_zones
+from pareto import frontier_route, load_frontiers
+from priority_grid import build_priority_grid
+from profiling import PROFILER, span
+from reliability import candidate_routes, load_edge_posterior, reliability_table, robust_route, route_reliability
+from route_cache import ROUTE_CACHE, cached_route, graph_stamp, route_key, uses_edges
+from route_engine import astar
+from snapping import snap
+from tour_planner import district_cost_matrix, plan_relief_tours
+from data_processing import load_pois
+from utils import DISTRICT_CENTROIDS
 
 st.set_page_config(layout="wide", page_title="AIDRoute Uttarakhand Dashboard")
 
+# Map colors of alternative routes 2, 3, ... (the main route is blue)
+ALTERNATIVE_COLORS = ["orange", "purple", "darkgreen", "gray"]
+
 st.title("AIDRoute - AI & Statistics based Disaster Relief Routing (Uttarakhand)")
 
 # ----- Load Graph and Data -----
 
-@st.cache_data(show_spinner=True)
-def load_road_network():
+@st.cache_resource(show_spinner=True, max_entries=1)
+def load_road_network(files_stamp):
+    # Prefer the offline snapshot compiled by graph_snapshot.py (memory-mapped, no network access).
+    # files_stamp changes when the snapshot files are rewritten (e.g. by hazard_risk.py), which reloads it.
+    if snapshot_exists(SNAPSHOT_DIR):
+        with span("load_road_network.snapshot"):
+            return load_snapshot(SNAPSHOT_DIR)
+
     place = "Uttarakhand, India"
-    G = ox.graph_from_place(place, network_type='drive')
+    with span("load_road_network.download"):
+        G = ox.graph_from_place(place, network_type='drive')
 
     for u, v, k, data in G.edges(keys=True, data=True):
         if 'length' not in data:
@@ -26,24 +55,41 @@ def load_road_network():
                 point_u = (G.nodes[u]['y'], G.nodes[u]['x'])
                 point_v = (G.nodes[v]['y'], G.nodes[v]['x'])
                 data['length'] = geodesic(point_u, point_v).meters
-    return G
+    with span("load_road_network.snapshot_from_networkx"):
+        return snapshot_from_networkx(G)
+
+@st.cache_resource(show_spinner=False)
+def load_route_frontiers(_snapshot, risk_version):
+    # Precomputed distance-risk frontiers between districts (pareto.py); None when missing or stale
+    return load_frontiers(_snapshot)
+
+@st.cache_resource(show_spinner=False)
+def load_risk_posterior(_snapshot, risk_version):
+    # Per-edge risk mean / std from risk_model.py output, falling back to the snapshot's edge risk
+    return load_edge_posterior(_snapshot)
+
+@st.cache_resource(show_spinner=False)
+def load_closure_registry():
+    # Process-wide road closures: every session routes around the same closed roads.
+    # Not keyed on the snapshot, so closures survive a risk rerun or snapshot reload.
+    return ClosureRegistry()
+
+def closure_view(alpha, beta):
+    # RoadClosures on the alpha/beta weights of the current snapshot, with its tracked trees kept between reruns
+    key = (round(float(alpha), 6), round(float(beta), 6))
+    return closure_registry.view(snapshot, key, lambda: snapshot_cost(snapshot, alpha, beta))
+
+@st.cache_data(show_spinner=True)
+def plan_tours(risk_version, closure_version, depot, priority_df, num_vehicles, capacity, time_limit):
+    # Tour plans are cached per input, so reruns that don't touch the tour sliders don't re-plan.
+    # District costs come from the closure trees, which only re-search districts a closure change affected.
+    names, costs = district_cost_matrix(snapshot, closures=closure_view(0.7, 0.3))
+    return plan_relief_tours(names, costs, depot, priority_df, [capacity] * num_vehicles, time_limit)
 
 @st.cache_data(show_spinner=False)
 def get_district_centroids():
     # Centroids for Uttarakhand districts (lat, lon)
-    return {
-        "Dehradun": (30.3165, 78.0322),
-        "Haridwar": (29.9457, 78.1642),
-        "Nainital": (29.3919, 79.4542),
-        "Udham Singh Nagar": (28.9754, 79.3957),
-        "Almora": (29.5987, 79.6581),
-        "Pithoragarh": (29.5588, 80.2200),
-        "Rudraprayag": (30.2833, 79.0167),
-        "Tehri Garhwal": (30.3343, 78.4577),
-        "Champawat": (29.3099, 80.1351),
-        "Chamoli": (30.5079, 79.4083),
-        "Bageshwar": (29.8591, 79.8862),
-    }
+    return dict(DISTRICT_CENTROIDS)
 
 # Dummy demand data per district
 def get_demand_data():
@@ -77,26 +123,45 @@ def get_priority_zones(demand_df, hazard_df):
     merged_sorted = merged.sort_values(by="Priority_Score", ascending=False)
     return merged_sorted
 
-# --- Helper for Risk (same as before)
-def compute_risk_score(u, v):
-    length = G.edges[u, v, 0]['length']
-    max_length = 10000
-    risk = min(length / max_length, 1.0)
-    return risk
+@st.cache_resource(show_spinner=True)
+def load_priority_grid():
+    # POIs and district demand binned once into every grid level; queries only touch the cell aggregates
+    centroids = get_district_centroids()
+    demand_df = get_demand_data()
+    demand = pd.DataFrame({
+        "lat": [centroids[d][0] for d in demand_df["District"]],
+        "lon": [centroids[d][1] for d in demand_df["District"]],
+        "demand": demand_df["Demand"].to_numpy(),
+    })
+    return build_priority_grid(load_pois("pois.csv", columns=["amenity", "geometry"]), demand, hazard_zones())
+
+@st.cache_resource(show_spinner=True)
+def load_coverage(_snapshot, risk_version, metric, amenities):
+    # One resumable search per metric and amenity set; budget changes reuse its labels
+    pois = load_pois("pois.csv")
+    if metric == "Distance":
+        return coverage_for(_snapshot, pois, amenities=amenities)
+    return coverage_for(_snapshot, pois, 0.7, 0.3, amenities=amenities)
 
 # ----- Main app -----
 
-G = load_road_network()
+snapshot = load_road_network(snapshot_files_stamp(SNAPSHOT_DIR))
+closure_registry = load_closure_registry()
 district_centroids = get_district_centroids()
 
 # Sidebar menu for views
-view = st.sidebar.selectbox("Select Dashboard View", [
+views = [
     "Route Planner",
     "Demand Chart",
     "Hazards Summary",
     "Priority Zones",
+    "Coverage",
     "Core Logic"
-])
+]
+# Hidden unless opened with ?diagnostics=1 or profiling is already on
+if "diagnostics" in st.query_params or PROFILER.enabled:
+    views.append("Diagnostics")
+view = st.sidebar.selectbox("Select Dashboard View", views)
 
 # Show relevant content by selected view
 if view == "Route Planner":
@@ -105,9 +170,6 @@ if view == "Route Planner":
     source_district = st.selectbox("Select Source District", districts)
     dest_district = st.selectbox("Select Destination District", districts, index=1)
 
-    source_node = ox.nearest_nodes(G, district_centroids[source_district][1], district_centroids[source_district][0])
-    dest_node = ox.nearest_nodes(G, district_centroids[dest_district][1], district_centroids[dest_district][0])
-
     alpha = st.slider("Alpha (Distance weight)", 0.0, 1.0, 0.7, 0.05)
     beta = st.slider("Beta (Risk weight)", 0.0, 1.0, 0.3, 0.05)
 
@@ -117,38 +179,152 @@ if view == "Route Planner":
     $$Cost = \\alpha \\times Distance + \\beta \\times Risk$$
     """)
 
-    for u, v, k, data in G.edges(keys=True, data=True):
-        length = data['length']
-        risk = compute_risk_score(u, v)
-        data['cost'] = alpha * length + beta * (risk * 10000)
+    def lift_improves(key, entry):
+        # A lifted closure can only shorten routes from sources whose closure tree it repaired. Sources
+        # without a tree are dropped to be safe, and so are alternatives, which any reopened road may add to.
+        if len(key) > 5:
+            return True
+        closures = closure_registry.views.get(key[3:5])
+        node = district_nodes[key[1]]
+        return closures is None or node not in closures.trees or node in closures.last_repaired
+
+    with st.expander(f"Road closures ({len(closure_registry.closures)} active)"):
+        closure_district = st.selectbox("Close roads around", districts)
+        radius_km = st.slider("Radius (km)", 1, 20, 5)
+        if st.button("Close roads"):
+            lat, lon = district_centroids[closure_district]
+            name = closure_registry.close_area(snapshot, Point(lon, lat).buffer(radius_km / 111.0),
+                                               name=f"{closure_district} ({radius_km} km)")
+            # Closing roads only makes the cached routes that run over them stale
+            closed = set(closure_registry.edges(snapshot, name).tolist())
+            ROUTE_CACHE.invalidate_where(lambda key, entry: uses_edges(entry, closed))
+            st.rerun()
+        for name, (rows, _) in list(closure_registry.closures.items()):
+            if st.button(f"Lift {name} ({len(rows)} roads)", key=f"lift-{name}"):
+                lats, lons = zip(*district_centroids.values())
+                district_nodes = dict(zip(district_centroids, snap(snapshot, lats, lons).tolist()))
+                with closure_registry.lock:
+                    closure_registry.lift(name)
+                    ROUTE_CACHE.invalidate_where(lift_improves)
+                st.rerun()
+
+    def request_weights():
+        # Per-request edge weights (alpha * length + beta * risk over the snapshot arrays) with closures applied;
+        # the cached graph is shared between sessions and is never written to
+        if closure_registry.closures:
+            return closure_view(alpha, beta).weights
+        return snapshot_cost(snapshot, alpha, beta)
+
+    def compute_route():
+        # Both districts snapped in one KD-tree query
+        with span("route_planner.snap"):
+            lats, lons = zip(district_centroids[source_district], district_centroids[dest_district])
+            source_node, dest_node = snap(snapshot, lats, lons).tolist()
+        # Slider changes are answered from the stored frontier when available; frontiers ignore closures
+        if closure_registry.closures:
+            # The source's tree is built once and then repaired as closures change
+            with span("route_planner.closures"):
+                route = closure_view(alpha, beta).route(source_node, dest_node)
+        else:
+            with span("route_planner.frontier"):
+                frontiers = load_route_frontiers(snapshot, snapshot.risk_version())
+                route = frontier_route(frontiers, snapshot, source_node, dest_node, alpha, beta)
+        if route is None and not closure_registry.closures:
+            with span("route_planner.edge_cost", edges=snapshot.num_edges):
+                weights = request_weights()
+            with span("route_planner.astar"):
+                route = astar(snapshot, weights, source_node, dest_node, alpha=alpha)
+        if route is None:
+            return None
+        with span("route_planner.simplify"):
+            return cached_route(route, simplify_route(snapshot.path_latlons(route.nodes)))
 
+    # Repeat queries are a lookup in the process-wide cache; a new risk version drops stale entries
+    # and closure changes drop only the routes they affect
+    stamp = graph_stamp(snapshot)
+    ROUTE_CACHE.ensure_stamp(stamp)
     try:
-        path = nx.shortest_path(G, source=source_node, target=dest_node, weight='cost')
-        path_length = sum(G.edges[u, v, 0]['length'] for u, v in zip(path[:-1], path[1:]))
-        path_cost = sum(G.edges[u, v, 0]['cost'] for u, v in zip(path[:-1], path[1:]))
+        with span("route_planner.query"):
+            entry = ROUTE_CACHE.get_or_compute(route_key(source_district, dest_district, alpha, beta, stamp),
+                                               compute_route)
+        if entry is None:
+            raise ValueError(f"No path between {source_district} and {dest_district}")
     except Exception as e:
         st.error(f"Routing failed: {e}")
-        path = []
-        path_length = None
-        path_cost = None
+        entry = None
 
-    if path_length is not None:
+    if entry is not None:
         st.markdown(f"### Route from **{source_district}** to **{dest_district}**")
-        st.markdown(f"- Distance (meters): {path_length:.2f}")
-        st.markdown(f"- Combined Cost: {path_cost:.2f} (weighted sum)")
+        st.markdown(f"- Distance (meters): {entry.length:.2f}")
+        st.markdown(f"- Combined Cost: {entry.cost:.2f} (weighted sum)")
     else:
         st.info("No route found for selected districts.")
 
-    if path:
-        latlons = [(G.nodes[n]['y'], G.nodes[n]['x']) for n in path]
-        avg_lat = sum(lat for lat, lon in latlons) / len(latlons)
-        avg_lon = sum(lon for lat, lon in latlons) / len(latlons)
+    # Ranked backup routes that share at most a limited part of their length with better ones
+    alternatives = []
+    show_alternatives = entry is not None and st.checkbox("Alternative routes")
+    if show_alternatives:
+        num_routes = st.slider("Routes", 2, 5, 3)
 
-        m = folium.Map(location=[avg_lat, avg_lon], zoom_start=8)
-        folium.PolyLine(latlons, color='blue', weight=5, opacity=0.8).add_to(m)
-        folium.Marker(latlons[0], popup=f"Source: {source_district}", icon=folium.Icon(color='green')).add_to(m)
-        folium.Marker(latlons[-1], popup=f"Destination: {dest_district}", icon=folium.Icon(color='red')).add_to(m)
-        st_folium(m, width=900, height=600)
+        def compute_alternatives():
+            lats, lons = zip(district_centroids[source_district], district_centroids[dest_district])
+            source_node, dest_node = snap(snapshot, lats, lons).tolist()
+            weights = request_weights()
+            with span("route_planner.alternatives", routes=num_routes):
+                ranked = alternative_routes(snapshot, weights, source_node, dest_node, k=num_routes)
+            return [cached_route(alt.route, simplify_route(snapshot.path_latlons(alt.route.nodes))) for alt in ranked]
+
+        alternatives = ROUTE_CACHE.get_or_compute(
+            route_key(source_district, dest_district, alpha, beta, stamp) + ("alternatives", num_routes),
+            compute_alternatives) or []
+        st.dataframe(pd.DataFrame({
+            "Rank": range(1, len(alternatives) + 1),
+            "Distance (m)": [alt.length for alt in alternatives],
+            "Combined Cost": [alt.cost for alt in alternatives],
+            "Extra cost": [alt.cost / alternatives[0].cost - 1 if alternatives[0].cost else 0.0 for alt in alternatives],
+        }).style.format({"Distance (m)": "{:.0f}", "Combined Cost": "{:.0f}", "Extra cost": "{:+.1%}"}))
+        if len(alternatives) < num_routes:
+            st.caption(f"Only {len(alternatives)} sufficiently different routes within {MAX_STRETCH:.0%} of the best cost.")
+
+    if entry is not None and entry.points:
+        points = entry.points
+        avg_lat = sum(lat for lat, lon in points) / len(points)
+        avg_lon = sum(lon for lat, lon in points) / len(points)
+
+        with span("route_planner.render_map", points=len(points)):
+            m = folium.Map(location=[avg_lat, avg_lon], zoom_start=8)
+            # Alternatives are drawn under the main route, lower ranks fainter
+            for rank, alt in reversed(list(enumerate(alternatives[1:], start=2))):
+                style = {"color": ALTERNATIVE_COLORS[(rank - 2) % len(ALTERNATIVE_COLORS)], "weight": 4,
+                         "opacity": 0.9 - 0.1 * rank, "dashArray": "8 6"}
+                folium.GeoJson(alt.geojson, tooltip=f"Alternative {rank}",
+                               style_function=lambda x, style=style: style).add_to(m)
+            # Geometry was simplified and serialised once, when the route was cached
+            folium.GeoJson(entry.geojson, style_function=lambda x: {"color": "blue", "weight": 5, "opacity": 0.8}).add_to(m)
+            folium.Marker(points[0], popup=f"Source: {source_district}", icon=folium.Icon(color='green')).add_to(m)
+            folium.Marker(points[-1], popup=f"Destination: {dest_district}", icon=folium.Icon(color='red')).add_to(m)
+            st_folium(m, width=900, height=600)
+
+    if entry is not None and st.checkbox("Route reliability (Monte Carlo over edge risk)"):
+        num_scenarios = st.slider("Scenarios", 500, 5000, 2000, 500)
+        cvar_level = st.slider("CVaR level", 0.5, 0.99, 0.9, 0.01)
+        with span("route_planner.reliability", scenarios=num_scenarios):
+            lats, lons = zip(district_centroids[source_district], district_centroids[dest_district])
+            source_node, dest_node = snap(snapshot, lats, lons).tolist()
+            routes = candidate_routes(snapshot, source_node, dest_node,
+                                      load_route_frontiers(snapshot, snapshot.risk_version()))
+            mean, std = load_risk_posterior(snapshot, snapshot.risk_version())
+            reliabilities = route_reliability(snapshot, routes, mean, std, alpha, beta, num_scenarios,
+                                              cvar_level, seed=0)
+        if reliabilities:
+            robust = robust_route(reliabilities)
+            st.markdown(f"- Most robust candidate: {robust.length:.0f} m, passable in "
+                        f"{robust.passable:.1%} of scenarios, CVaR {robust.cvar:.0f}")
+            st.dataframe(reliability_table(reliabilities))
+
+    stats = ROUTE_CACHE.stats()
+    st.caption(f"Route cache: {stats['entries']} entries, {stats['hits']} hits, "
+               f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
 
 elif view == "Demand Chart":
     st.header("Demand by District")
@@ -167,6 +343,77 @@ elif view == "Priority Zones":
     priority_df = get_priority_zones(demand_df, hazard_df)
     st.dataframe(priority_df[["District", "Demand", "Hazard", "Severity", "Priority_Score"]])
 
+    st.subheader("Priority Grid")
+    grid = load_priority_grid()
+    area = st.selectbox("Area", ["All"] + list(district_centroids.keys()))
+    level = st.slider("Grid level (cell size doubles per level)", 0, grid.num_levels - 1, 2)
+    top_k = st.slider("Cells", 5, 50, 10, 5)
+    bbox = None
+    if area != "All":
+        lat, lon = district_centroids[area]
+        bbox = (lon - 0.25, lat - 0.25, lon + 0.25, lat + 0.25)
+    cells = grid.top_cells(top_k, level=level, bbox=bbox)
+    st.dataframe(cells[["min_lat", "min_lon", "max_lat", "max_lon", "poi_count", "amenity_score",
+                        "demand", "hazard", "priority"]])
+
+    st.subheader("Relief Tours")
+    depot = st.selectbox("Depot District", list(district_centroids.keys()))
+    num_vehicles = st.slider("Vehicles", 1, 10, 3)
+    capacity = st.slider("Capacity per vehicle", 50, 1000, 400, 50)
+    time_limit = st.slider("Planning time limit (seconds)", 0.5, 10.0, 2.0, 0.5)
+
+    plan = plan_tours(snapshot.risk_version(), closure_registry.version, depot, priority_df, num_vehicles, capacity,
+                      time_limit)
+    tours = pd.DataFrame({
+        "Vehicle": range(1, len(plan.routes) + 1),
+        "Stops": [" → ".join([depot] + route + [depot]) if route else "-" for route in plan.routes],
+        "Load": plan.loads,
+        "Cost": plan.costs,
+    })
+    st.dataframe(tours)
+    if plan.unserved:
+        st.warning(f"Not enough capacity for: {', '.join(plan.unserved)}")
+
+elif view == "Coverage":
+    st.header("Relief Facility Coverage")
+    amenities = st.multiselect("Facilities", list(RELIEF_AMENITIES), default=list(RELIEF_AMENITIES))
+    metric = st.radio("Budget in", ["Distance", "Cost (α=0.7, β=0.3)"], horizontal=True)
+    budget_km = st.slider("Budget (km of road, or cost / 1000)", 1, 100, 20)
+    level = st.slider("Cell level", 1, 5, 2, help="Cell edge doubles per level")
+    if not amenities:
+        st.info("Select at least one facility type.")
+    else:
+        with span("coverage.labels"):
+            coverage = load_coverage(snapshot, snapshot.risk_version(), metric.split()[0], tuple(sorted(amenities)))
+            budget = budget_km * 1000.0
+            cost, owner = coverage.node_labels(budget)
+        with span("coverage.cells"):
+            cells = coverage.cells(budget, level)
+        covered = owner >= 0
+        st.caption(f"{covered.mean():.1%} of road nodes reached by {len(coverage.facilities)} facilities; "
+                   f"cells ~{cell_size_km(level):.1f} km wide")
+
+        m = folium.Map(location=[30.0668, 79.0193], zoom_start=8)
+        features = [
+            {"type": "Feature", "geometry": row.geometry.__geo_interface__,
+             "properties": {"covered": bool(row.owner >= 0), "share": round(float(row.covered_share), 2)}}
+            for row in cells.itertuples()
+        ]
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": features},
+            style_function=lambda f: {"fillColor": "green" if f["properties"]["covered"] else "red",
+                                      "color": None, "fillOpacity": 0.35},
+            tooltip=folium.GeoJsonTooltip(fields=["share"], aliases=["Covered share"]),
+        ).add_to(m)
+        fx = snapshot.node_x[coverage.area.sources]
+        fy = snapshot.node_y[coverage.area.sources]
+        for amenity, x, y in zip(coverage.facilities["amenity"], fx, fy):
+            folium.CircleMarker([y, x], radius=4, color="blue", fill=True, tooltip=amenity).add_to(m)
+        st_folium(m, width=900, height=600)
+
+        summary = coverage.facility_summary(budget)
+        st.dataframe(summary.sort_values("nodes_reached", ascending=False))
+
 elif view == "Core Logic":
     st.header("Core Logic (Cost Formula)")
     st.markdown(f"""
@@ -178,7 +425,30 @@ elif view == "Core Logic":
     **Why?**
 
     - To balance fastest route and safest route based on hazard risk.
-    - Risk is a dummy score proportional to road segment length here (for demo).
+    - Risk is each road's exposure to hazard zones: meters of road inside a zone times the zone's severity (`hazard_risk.py`). Until that layer is built, longer roads simply count as riskier.
     - Tunable sliders help NGO adjust based on priorities (speed vs safety).
     """)
 
+elif view == "Diagnostics":
+    st.header("Diagnostics")
+    # Profiling is process-wide: switching it here affects every session
+    enabled = st.checkbox("Record timing spans", value=PROFILER.enabled)
+    memory = st.checkbox("Trace peak allocations (slower)", value=PROFILER.memory)
+    if enabled and (not PROFILER.enabled or memory != PROFILER.memory):
+        PROFILER.disable()
+        PROFILER.enable(memory=memory)
+    elif not enabled and PROFILER.enabled:
+        PROFILER.disable()
+    if st.button("Clear recorded spans"):
+        PROFILER.clear()
+
+    summary = pd.DataFrame(PROFILER.summary())
+    if summary.empty:
+        st.info("No spans recorded yet. Enable recording and use the other views.")
+    else:
+        st.subheader("Spans by total time")
+        st.dataframe(summary)
+        st.subheader("Recent spans")
+        st.dataframe(pd.DataFrame(PROFILER.recent(200)))
+    st.download_button("Download spans (JSON lines)", PROFILER.to_jsonl(), "spans.jsonl", "application/jsonl")
+    st.download_button("Download metrics (Prometheus)", PROFILER.to_prometheus(), "metrics.prom", "text/plain")
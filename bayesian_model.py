@@ -1,28 +1,26 @@
 # bayesian_model.py
-import pandas as pd
 import pymc as pm
 import arviz as az
 import numpy as np
+import pandas as pd
 
-def run_bayesian_priority_model():
+from conjugate import GammaPoisson, PriorityGibbs
+from data_processing import load_pois, poi_districts
+from profiling import profiled
+from utils import AMENITY_WEIGHTS
+
+@profiled()
+def run_bayesian_priority_model(method="gibbs", pois_path='pois.csv', trace_path='bayesian_trace.nc',
+                                district_summary_path='bayesian_priority_by_district.csv'):
     print("Loading POIs...")
-    pois = pd.read_csv('pois.csv')
+    pois = load_pois(pois_path, columns=['amenity', 'geometry'])
 
     # Simple priority model example:
     # Count number of each amenity type and assign weights
     amenity_counts = pois['amenity'].value_counts()
 
-    # Assign manual weights to amenities for priority scoring
-    weights = {
-        'hospital': 5,
-        'clinic': 4,
-        'shelter': 3,
-        'fire_station': 4,
-        'police': 4,
-        'school': 2,
-        'pharmacy': 3,
-        'community_centre': 1
-    }
+    # Manual weights of amenities for priority scoring
+    weights = AMENITY_WEIGHTS
 
     # Build observed data vector y (weighted counts)
     y_obs = []
@@ -36,26 +34,41 @@ def run_bayesian_priority_model():
 
     print(f"Running Bayesian model on amenities: {amenity_types}")
 
-    with pm.Model() as model:
-        # Prior for base rate of POI occurrence
-        base_rate = pm.Exponential('base_rate', 1)
+    if method == "gibbs":
+        # Both full conditionals are Gamma, so a plain Gibbs sampler replaces NUTS
+        sampler = PriorityGibbs(amenity_types, weights)
+        for amenity, count in zip(amenity_types, y_obs):
+            sampler.update(amenity, count)
+        trace = az.from_dict(posterior=sampler.sample(1000, tune=1000, chains=2, random_seed=42))
+    else:
+        with pm.Model() as model:
+            # Prior for base rate of POI occurrence
+            base_rate = pm.Exponential('base_rate', 1)
 
-        # Amenity effects modeled as Gamma distributed
-        amenity_effects = pm.Gamma('amenity_effects', alpha=2, beta=1, shape=len(y_obs))
+            # Amenity effects modeled as Gamma distributed
+            amenity_effects = pm.Gamma('amenity_effects', alpha=2, beta=1, shape=len(y_obs))
 
-        # Expected count modeled as base_rate * amenity_effect * weights
-        mu = base_rate * amenity_effects * np.array([weights[a] for a in amenity_types])
+            # Expected count modeled as base_rate * amenity_effect * weights
+            mu = base_rate * amenity_effects * np.array([weights[a] for a in amenity_types])
 
-        # Likelihood: observed counts are Poisson distributed
-        observed = pm.Poisson('observed', mu=mu, observed=y_obs)
+            # Likelihood: observed counts are Poisson distributed
+            observed = pm.Poisson('observed', mu=mu, observed=y_obs)
 
-        trace = pm.sample(1000, tune=1000, cores=1, return_inferencedata=True)
+            trace = pm.sample(1000, tune=1000, cores=1, return_inferencedata=True)
 
     print("Bayesian model complete, summary:")
     print(az.summary(trace, var_names=['base_rate', 'amenity_effects']))
 
     # Save trace summary for later dashboard use
-    trace.to_netcdf('bayesian_trace.nc')
+    trace.to_netcdf(trace_path)
+
+    # Rate of priority amenities per district (one survey each), Gamma-Poisson in closed form
+    relief = pois[pois['amenity'].isin(list(weights))]
+    district_rates = GammaPoisson(prior_alpha=1, prior_beta=1)
+    for district, count in pd.Series(poi_districts(relief)).value_counts().items():
+        district_rates.update(district, count)
+    district_rates.summary(hdi_prob=0.95).to_csv(district_summary_path)
+    return trace
 
 if __name__ == "__main__":
     run_bayesian_priority_model()
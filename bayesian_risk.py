@@ -1,41 +1,66 @@
-import pymc as pm
 import numpy as np
-import pandas as pd
-import arviz as az
-from shapely import wkt
 
-print("Loading POIs...")
-pois = pd.read_csv('data/pois.csv')  # Updated path if you moved it to /data
+from conjugate import BetaBernoulli
+from data_processing import load_pois, poi_districts, save_table
+from profiling import profiled
 
-# Convert geometry from WKT to shapely objects
-pois['geometry'] = pois['geometry'].apply(wkt.loads)
+@profiled()
+def run_bayesian_risk(pois_path='pois.csv', summary_path='bayesian_risk_summary.csv',
+                      amenity_summary_path='bayesian_risk_by_amenity.csv',
+                      district_summary_path='bayesian_risk_by_district.csv', use_mcmc=False):
+    print("Loading POIs...")
+    # Geometry is decoded by the loader (GeoParquet when available, else CSV)
+    pois = load_pois(pois_path)
 
-# Add synthetic risk score if missing
-if 'risk_score' not in pois.columns:
-    print("Generating synthetic risk scores...")
-    np.random.seed(42)
-    pois['risk_score'] = np.random.beta(2, 5, size=len(pois))
+    # Add synthetic risk score if missing
+    if 'risk_score' not in pois.columns:
+        print("Generating synthetic risk scores...")
+        np.random.seed(42)
+        pois['risk_score'] = np.random.beta(2, 5, size=len(pois))
 
-    # Save updated POIs with risk_score back to file
-    pois.to_csv('data/pois.csv', index=False)
-    print("✅ Updated pois.csv with risk_score")
+        # Save updated POIs with risk_score back to file
+        save_table(pois, pois_path)
+        print(f"✅ Updated {pois_path} with risk_score")
 
-# Define high-risk as score > 0.5
-high_risk = (pois['risk_score'] > 0.5).astype(int)
+    # Define high-risk as score > 0.5
+    high_risk = (pois['risk_score'] > 0.5).astype(int)
 
-print("Building Bayesian model to estimate probability of high-risk POIs...")
+    # Beta-Bernoulli is conjugate, so the posterior is summarised in closed form.
+    # use_mcmc=True samples the same model with PyMC instead.
+    if use_mcmc:
+        # Imported here so that importing this module (e.g. for compute_risk_score) stays cheap
+        import arviz as az
+        import pymc as pm
 
-with pm.Model() as model:
-    p = pm.Beta('p', alpha=1, beta=1)
-    obs = pm.Bernoulli('obs', p=p, observed=high_risk)
-    trace = pm.sample(1000, tune=1000, cores=1, random_seed=42, progressbar=True)
+        print("Building Bayesian model to estimate probability of high-risk POIs...")
 
-print("Bayesian inference summary:")
-summary = az.summary(trace, hdi_prob=0.95)
-print(summary)
+        with pm.Model() as model:
+            p = pm.Beta('p', alpha=1, beta=1)
+            obs = pm.Bernoulli('obs', p=p, observed=high_risk)
+            trace = pm.sample(1000, tune=1000, cores=1, random_seed=42, progressbar=True)
 
-summary.to_csv('bayesian_risk_summary.csv')
-print("✅ Saved Bayesian risk summary to bayesian_risk_summary.csv")
+        summary = az.summary(trace, hdi_prob=0.95)
+    else:
+        print("Computing conjugate posterior for probability of high-risk POIs...")
+        risk_posterior = BetaBernoulli(prior_alpha=1, prior_beta=1)
+        risk_posterior.update('p', high_risk.values)
+        summary = risk_posterior.summary(hdi_prob=0.95)
+
+        # Same posterior per amenity type and per district (nearest district centroid)
+        amenity_posterior = BetaBernoulli(prior_alpha=1, prior_beta=1)
+        amenity_posterior.update_groups(pois['amenity'], high_risk)
+        amenity_posterior.summary(hdi_prob=0.95).to_csv(amenity_summary_path)
+
+        district_posterior = BetaBernoulli(prior_alpha=1, prior_beta=1)
+        district_posterior.update_groups(poi_districts(pois), high_risk)
+        district_posterior.summary(hdi_prob=0.95).to_csv(district_summary_path)
+
+    print("Bayesian inference summary:")
+    print(summary)
+
+    summary.to_csv(summary_path)
+    print(f"✅ Saved Bayesian risk summary to {summary_path}")
+    return summary
 
 
 def compute_risk_score(amenity):
@@ -51,3 +76,6 @@ def compute_risk_score(amenity):
         'community_centre': 0.3
     }
     return weights.get(amenity, 0.2)
+
+if __name__ == "__main__":
+    run_bayesian_risk()
@@ -0,0 +1,200 @@
+# benchmark.py
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from alternatives import alternative_routes
+from conjugate import BetaBernoulli
+from cost_matrix import cost_matrix
+from data_processing import load_pois, load_roads
+from edge_costs import snapshot_cost
+from geo_store import to_geometry_array
+from graph_snapshot import load_snapshot
+from hazard_risk import HazardRiskLayer
+from map_render import capped_lines_geojson, simplify_route
+from route_engine import astar, bidirectional_dijkstra
+from snapping import snap
+from synthetic import synthetic_hazards, write_synthetic_dataset
+from utils import UTTARAKHAND_BBOX
+
+try:
+    from risk_model import simulate_road_risks
+except ImportError:
+    # pymc is optional here: without it the risk_advi benchmark is skipped
+    simulate_road_risks = None
+
+BENCHMARK_SIZES = (10_000, 100_000, 1_000_000)
+# A benchmark is reported as a regression when it is this much slower than the baseline run
+REGRESSION_THRESHOLD = 1.25
+# Fixed, small ADVI budget for the risk_advi benchmark, so its time tracks the per-road code and not convergence
+ADVI_ITERATIONS = 500
+ADVI_DRAWS = 200
+
+
+def measure(name, edges, func, items=1, repeat=1):
+    """
+    Runs func repeat times and returns {benchmark, edges, seconds, peak_mb,
+    items_per_s}: best wall time, peak traced allocation (Python and numpy
+    memory, measured on a separate run) and items processed per second.
+    """
+    func()  # warm-up: builds lazy per-snapshot structures and imports
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {
+        "benchmark": name,
+        "edges": edges,
+        "seconds": best,
+        "peak_mb": peak / 1e6,
+        "items_per_s": items / best if best > 0 else float("inf"),
+    }
+    print(f"{name:>16} @ {edges:>9,} edges: {best * 1000:9.1f} ms  {peak / 1e6:8.1f} MB  "
+          f"{result['items_per_s']:12,.0f} items/s")
+    return result
+
+
+def run_size(size, work_dir, seed=42, num_queries=20, num_points=100_000, matrix_size=16, num_zones=1000):
+    # All benchmarks on one synthetic dataset of about size edges
+    data_dir = os.path.join(work_dir, f"edges-{size}")
+    start = time.perf_counter()
+    write_synthetic_dataset(data_dir, size, seed=seed)
+    print(f"Generated {size:,}-edge dataset in {time.perf_counter() - start:.1f}s")
+    snapshot_dir = os.path.join(data_dir, "graph_snapshot")
+    roads_csv = os.path.join(data_dir, "roads.csv")
+    snapshot = load_snapshot(snapshot_dir)
+    # Results record the edges actually generated, not the requested size
+    edges = snapshot.num_edges
+    rng = np.random.default_rng(seed)
+    pairs = rng.integers(0, snapshot.num_nodes, (num_queries, 2)).tolist()
+    weights = snapshot_cost(snapshot)
+    results = []
+
+    def graph_load():
+        s = load_snapshot(snapshot_dir)
+        s.adjacency_lists()
+
+    results.append(measure("graph_load", edges, graph_load, snapshot.num_edges))
+    results.append(measure("edge_reweight", edges, lambda: snapshot_cost(snapshot, 0.6, 0.4), snapshot.num_edges, 5))
+    results.append(measure("route_bidir", edges, lambda: [bidirectional_dijkstra(snapshot, weights, s, t)
+                                                         for s, t in pairs], num_queries))
+    # Compare with route_bidir: three alternatives should stay under twice a single query
+    results.append(measure("alternatives_3", edges, lambda: [alternative_routes(snapshot, weights, s, t, k=3)
+                                                            for s, t in pairs], num_queries))
+    results.append(measure("route_astar", edges, lambda: [astar(snapshot, weights, s, t, alpha=0.7)
+                                                         for s, t in pairs], num_queries))
+
+    lon = rng.uniform(UTTARAKHAND_BBOX[0], UTTARAKHAND_BBOX[2], num_points)
+    lat = rng.uniform(UTTARAKHAND_BBOX[1], UTTARAKHAND_BBOX[3], num_points)
+    results.append(measure("snapping", edges, lambda: snap(snapshot, lat, lon), num_points, 3))
+
+    nodes = rng.choice(snapshot.num_nodes, matrix_size * 2, replace=False)
+    origins, targets = nodes[:matrix_size], nodes[matrix_size:]
+    results.append(measure("cost_matrix", edges, lambda: cost_matrix(snapshot, origins, targets, weights=weights,
+                                                                     workers=1), matrix_size ** 2))
+
+    wkt = pd.read_csv(roads_csv, usecols=["geometry"])["geometry"].to_numpy()
+    results.append(measure("wkt_decode", edges, lambda: to_geometry_array(wkt), len(wkt)))
+    results.append(measure("parquet_load", edges, lambda: load_roads(roads_csv, columns=["u", "v", "geometry"]),
+                           len(wkt)))
+
+    zones = synthetic_hazards(num_zones, seed=seed)
+    pois = load_pois(os.path.join(data_dir, "pois.csv"))
+
+    def hazard_join():
+        layer = HazardRiskLayer(snapshot.edge_geometries(), edge_meters=snapshot.edge_length)
+        layer.add_zones(zones)
+        return layer.risk()
+
+    def risk_posterior():
+        model = BetaBernoulli()
+        model.update_groups(pois["amenity"], (pois["risk_score"] > 0.5).astype(int))
+        return model.summary()
+
+    results.append(measure("hazard_join", edges, hazard_join, snapshot.num_edges))
+    results.append(measure("risk_posterior", edges, risk_posterior, len(pois)))
+    if simulate_road_risks is None:
+        print(f"{'risk_advi':>16} @ {edges:>9,} edges: skipped (pymc is not installed)")
+    else:
+        roads = load_roads(roads_csv, columns=["length"])
+        results.append(measure("risk_advi", edges, lambda: simulate_road_risks(
+            roads, advi_iterations=ADVI_ITERATIONS, draws=ADVI_DRAWS), len(roads)))
+
+    geoms = snapshot.edge_geometries()
+    results.append(measure("render_roads", edges, lambda: capped_lines_geojson(geoms, 12), snapshot.num_edges))
+    route = next((r for r in (bidirectional_dijkstra(snapshot, weights, s, t) for s, t in pairs) if r is not None),
+                 None)
+    if route is not None:
+        latlons = snapshot.path_latlons(route.nodes)
+        results.append(measure("render_route", edges, lambda: simplify_route(latlons), len(latlons), 5))
+    return results
+
+
+def run_benchmarks(sizes=BENCHMARK_SIZES, out_path=None, work_dir=None, **kwargs):
+    """
+    Runs every benchmark at each size (approximate edge count) on synthetic
+    data and returns a report {environment, results}. It is saved as JSON
+    when out_path is given. Datasets go to work_dir (a temporary directory
+    by default, removed afterwards).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        for size in sizes:
+            results.extend(run_size(size, work_dir or tmp, **kwargs))
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "machine": platform.machine(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    if out_path:
+        with open(out_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Benchmark results saved to {out_path}")
+    return report
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Per (benchmark, edges) ratio of current to baseline wall time, for two
+    reports (dicts or JSON paths). Returns a DataFrame sorted by slowdown,
+    with a regression column set where the ratio exceeds threshold.
+    """
+    frames = []
+    for report in (baseline, current):
+        if isinstance(report, str):
+            with open(report) as f:
+                report = json.load(f)
+        frames.append(pd.DataFrame(report["results"]).set_index(["benchmark", "edges"])[["seconds", "peak_mb"]])
+    df = frames[0].join(frames[1], lsuffix="_baseline", rsuffix="_current", how="inner")
+    df["ratio"] = df["seconds_current"] / df["seconds_baseline"]
+    df["regression"] = df["ratio"] > threshold
+    return df.sort_values("ratio", ascending=False)
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py [size ...] [--out results.json] [--compare baseline.json]
+    args = sys.argv[1:]
+    out_path = args[args.index("--out") + 1] if "--out" in args else "benchmark_results.json"
+    baseline = args[args.index("--compare") + 1] if "--compare" in args else None
+    sizes = [int(a) for a in args if a.isdigit()] or BENCHMARK_SIZES
+    report = run_benchmarks(sizes, out_path)
+    if baseline:
+        diff = compare(baseline, report)
+        print(diff.to_string())
+        if diff["regression"].any():
+            sys.exit(1)
@@ -0,0 +1,320 @@
+# closures.py
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from route_engine import INF, RouteResult, path_edges, remember_list
+
+# Weight settings (e.g. alpha/beta pairs) whose RoadClosures a ClosureRegistry keeps at once
+MAX_VIEWS = 8
+
+
+class ShortestPathTree:
+    # Full single-source shortest-path tree kept as flat per-node lists
+    def __init__(self, source, num_nodes):
+        self.source = source
+        self.dist = [INF] * num_nodes
+        self.parent = [-1] * num_nodes
+        self.dist[source] = 0.0
+
+
+class RoadClosures:
+    """
+    Closed or penalised roads on top of a base weight array, with incremental
+    repair of the shortest-path trees of tracked sources.
+
+    Weight increases (closures) are repaired Ramalingam-Reps style: only the
+    subtrees hanging below a closed tree edge are reset and re-settled from
+    their unaffected in-neighbours. Weight decreases (lifted closures) are
+    propagated with a Dijkstra seeded at the reopened edges. Trees that do not
+    use an affected edge are left untouched, so their routes and cost-matrix
+    rows stay valid. All public methods hold self.lock, so sessions can share
+    one instance.
+    """
+
+    def __init__(self, snapshot, weights):
+        self.snapshot = snapshot
+        self.base = np.array(weights, dtype=np.float64)
+        self.weights = self.base.copy()
+        # Kept in step with weights by _set, and registered so searches on weights reuse it
+        self._w = remember_list(self.weights, self.weights.tolist())
+        self.closures = {}
+        self.trees = {}
+        self.version = 0
+        self._ids = itertools.count(1)
+        # Sources whose trees (routes / matrix rows) changed in the last update
+        self.last_repaired = set()
+        self.lock = threading.RLock()
+
+    # ----- Tracked sources -----
+
+    def track(self, source):
+        # Builds (once) the full shortest-path tree of a source node index
+        source = int(source)
+        with self.lock:
+            if source not in self.trees:
+                tree = ShortestPathTree(source, self.snapshot.num_nodes)
+                self._propagate(tree, [(0.0, source)])
+                self.trees[source] = tree
+            return self.trees[source]
+
+    def route(self, source, target):
+        # Current shortest route from a tracked source, or None when unreachable
+        with self.lock:
+            tree = self.track(source)
+            if tree.dist[target] == INF:
+                return None
+            edges = path_edges(self.snapshot, tree.parent, target)
+        nodes = [int(source)] + [int(t) for t in self.snapshot.edge_target[edges]]
+        length = float(self.snapshot.edge_length[edges].sum()) if edges else 0.0
+        return RouteResult(nodes, edges, tree.dist[target], length)
+
+    def cost_row(self, source, targets):
+        with self.lock:
+            tree = self.track(source)
+            return np.array([tree.dist[t] for t in targets], dtype=np.float64)
+
+    def matrix(self, origins, targets, return_paths=False):
+        """
+        Cost-matrix rows from the tracked trees, in the cost_matrix layout:
+        (costs, lengths, paths). Only rows whose trees were repaired by a
+        closure change are actually different from the previous call.
+        """
+        origins = [int(o) for o in origins]
+        targets = [int(t) for t in targets]
+        costs = np.full((len(origins), len(targets)), INF)
+        lengths = np.full((len(origins), len(targets)), INF)
+        paths = {}
+        with self.lock:
+            for i, origin in enumerate(origins):
+                costs[i] = self.cost_row(origin, targets)
+                parent = self.trees[origin].parent
+                for j, target in enumerate(targets):
+                    if costs[i, j] == INF:
+                        continue
+                    edges = path_edges(self.snapshot, parent, target)
+                    lengths[i, j] = float(self.snapshot.edge_length[edges].sum()) if edges else 0.0
+                    if return_paths:
+                        paths[(i, j)] = edges
+        return costs, lengths, paths
+
+    # ----- Closures -----
+
+    def close_edges(self, edges, factor=INF, name=None):
+        """
+        Closes (factor=inf) or penalises (weight * factor) the given edge ids.
+        Returns the closure name used to lift it later.
+        """
+        with self.lock:
+            name = name if name is not None else f"closure-{next(self._ids)}"
+            self.closures[name] = (np.unique(np.asarray(edges, dtype=np.int64)), float(factor))
+            self._refresh(self.closures[name][0])
+            return name
+
+    def close_area(self, geometry, factor=INF, name=None):
+        # Closes every edge whose geometry intersects a shapely geometry (lon/lat)
+        return self.close_edges(self.edges_in_area(geometry), factor, name)
+
+    def lift(self, name):
+        with self.lock:
+            edges, _ = self.closures.pop(name)
+            self._refresh(edges)
+
+    def edges_in_area(self, geometry):
+        return self.snapshot.edge_tree().query(geometry, predicate="intersects")
+
+    def apply(self, weights):
+        """
+        Copy of another per-edge weights array (e.g. a request's alpha/beta
+        cost) with the active closures applied: closed edges become inf and
+        penalised ones are multiplied by their factor.
+        """
+        weights = np.array(weights, dtype=np.float64)
+        factor = np.ones(len(weights))
+        with self.lock:
+            for closed, f in self.closures.values():
+                factor[closed] = np.maximum(factor[closed], f)
+        with np.errstate(invalid="ignore"):
+            return np.where(np.isinf(factor), INF, weights * factor)
+
+    def _refresh(self, edges):
+        # Recomputes the effective weight of edges from all active closures, then repairs the trees
+        factor = np.ones(len(edges))
+        for closed, f in self.closures.values():
+            hit = np.isin(edges, closed)
+            factor[hit] = np.maximum(factor[hit], f)
+        with np.errstate(invalid="ignore"):
+            new = np.where(np.isinf(factor), INF, self.base[edges] * factor)
+        old = self.weights[edges]
+        increased, decreased = edges[new > old], edges[new < old]
+        self.last_repaired = set()
+        if len(increased):
+            self._set(increased, new[new > old])
+            for source, tree in self.trees.items():
+                if self._repair_increase(tree, increased.tolist()):
+                    self.last_repaired.add(source)
+        if len(decreased):
+            self._set(decreased, new[new < old])
+            for source, tree in self.trees.items():
+                if self._repair_decrease(tree, decreased.tolist()):
+                    self.last_repaired.add(source)
+        self.version += 1
+
+    def _set(self, edges, values):
+        self.weights[edges] = values
+        for e, value in zip(edges.tolist(), values.tolist()):
+            self._w[e] = value
+
+    # ----- Tree repair -----
+
+    def _propagate(self, tree, heap):
+        # Dijkstra from the given (dist, node) entries; only ever lowers distances
+        adj = self.snapshot.adjacency_lists()
+        indptr, target_of, w = adj["indptr"], adj["edge_target"], self._w
+        dist, parent = tree.dist, tree.parent
+        heapq.heapify(heap)
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            for e in range(indptr[node], indptr[node + 1]):
+                nbr = target_of[e]
+                nd = d + w[e]
+                if nd < dist[nbr]:
+                    dist[nbr] = nd
+                    parent[nbr] = e
+                    heapq.heappush(heap, (nd, nbr))
+
+    def _repair_increase(self, tree, edges):
+        adj = self.snapshot.adjacency_lists()
+        indptr, target_of = adj["indptr"], adj["edge_target"]
+        rev_indptr, rev_edges, source_of = adj["rev_indptr"], adj["rev_edges"], adj["edge_source"]
+        dist, parent, w = tree.dist, tree.parent, self._w
+
+        # Only tree edges matter: a costlier non-tree edge cannot change any shortest path
+        roots = [target_of[e] for e in edges if parent[target_of[e]] == e]
+        if not roots:
+            return False
+        affected = set(roots)
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            for e in range(indptr[node], indptr[node + 1]):
+                child = target_of[e]
+                if parent[child] == e and child not in affected:
+                    affected.add(child)
+                    stack.append(child)
+
+        for node in affected:
+            dist[node] = INF
+            parent[node] = -1
+        # Re-seed each affected node from its best unaffected in-neighbour
+        heap = []
+        for node in affected:
+            best, best_edge = INF, -1
+            for i in range(rev_indptr[node], rev_indptr[node + 1]):
+                e = rev_edges[i]
+                u = source_of[e]
+                if u not in affected and dist[u] + w[e] < best:
+                    best, best_edge = dist[u] + w[e], e
+            if best_edge >= 0:
+                dist[node], parent[node] = best, best_edge
+                heap.append((best, node))
+        self._propagate(tree, heap)
+        return True
+
+    def _repair_decrease(self, tree, edges):
+        adj = self.snapshot.adjacency_lists()
+        source_of, target_of = adj["edge_source"], adj["edge_target"]
+        dist, parent, w = tree.dist, tree.parent, self._w
+        heap = []
+        for e in edges:
+            u, v = source_of[e], target_of[e]
+            if dist[u] + w[e] < dist[v]:
+                dist[v] = dist[u] + w[e]
+                parent[v] = e
+                heap.append((dist[v], v))
+        if not heap:
+            return False
+        self._propagate(tree, heap)
+        return True
+
+
+def edges_for_rows(snapshot, rows):
+    # Edge ids of a snapshot whose edge_row (row in the roads file) is in rows
+    return np.flatnonzero(np.isin(np.asarray(snapshot.edge_row), rows))
+
+
+class ClosureRegistry:
+    """
+    Process-wide road closures that outlive any one snapshot. Closures are
+    stored by road row (snapshot.edge_row, the row in the roads file), so a
+    snapshot reloaded after a hazard_risk.py run, or recompiled from the same
+    roads, gets them back.
+
+    view() hands out one RoadClosures per weight setting (e.g. an alpha/beta
+    pair) of the current snapshot, with every closure applied. Closing or
+    lifting updates all live views, which repair their tracked trees instead
+    of recomputing them. At most max_views views are kept, least recently
+    used first out.
+    """
+
+    def __init__(self, max_views=MAX_VIEWS):
+        self.max_views = max_views
+        self.lock = threading.RLock()
+        self.closures = {}
+        self.views = OrderedDict()
+        self.snapshot = None
+        self.version = 0
+        self._ids = itertools.count(1)
+
+    def view(self, snapshot, key, weights):
+        """
+        RoadClosures of snapshot for the weight setting key. weights is the
+        per-edge base weight array, or a callable returning it; it is only
+        used when the view has to be built.
+        """
+        with self.lock:
+            if snapshot is not self.snapshot:
+                # New snapshot: views of the old one hold stale trees and edge ids
+                self.snapshot = snapshot
+                self.views.clear()
+            if key in self.views:
+                self.views.move_to_end(key)
+                return self.views[key]
+            closures = RoadClosures(snapshot, weights() if callable(weights) else weights)
+            for name, (rows, factor) in self.closures.items():
+                closures.close_edges(edges_for_rows(snapshot, rows), factor, name)
+            self.views[key] = closures
+            while len(self.views) > self.max_views:
+                self.views.popitem(last=False)
+            return closures
+
+    def close_edges(self, snapshot, edges, factor=INF, name=None):
+        # Closes (factor=inf) or penalises edge ids of snapshot; returns the closure name
+        with self.lock:
+            name = name if name is not None else f"closure-{next(self._ids)}"
+            rows = np.unique(np.asarray(snapshot.edge_row)[np.asarray(edges, dtype=np.int64)])
+            self.closures[name] = (rows, float(factor))
+            for closures in self.views.values():
+                closures.close_edges(edges_for_rows(closures.snapshot, rows), factor, name)
+            self.version += 1
+            return name
+
+    def close_area(self, snapshot, geometry, factor=INF, name=None):
+        # Closes every edge whose geometry intersects a shapely geometry (lon/lat)
+        return self.close_edges(snapshot, snapshot.edge_tree().query(geometry, predicate="intersects"), factor, name)
+
+    def lift(self, name):
+        with self.lock:
+            self.closures.pop(name)
+            for closures in self.views.values():
+                closures.lift(name)
+            self.version += 1
+
+    def edges(self, snapshot, name):
+        # Edge ids of snapshot covered by a closure
+        return edges_for_rows(snapshot, self.closures[name][0])
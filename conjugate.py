@@ -0,0 +1,145 @@
+# conjugate.py
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.optimize import minimize_scalar
+
+
+def hdi_columns(hdi_prob):
+    # Same column names as az.summary, e.g. hdi_2.5% / hdi_97.5% for hdi_prob=0.95
+    tail = 100 * (1 - hdi_prob) / 2
+    return f"hdi_{tail:g}%", f"hdi_{100 - tail:g}%"
+
+
+def distribution_hdi(dist, hdi_prob=0.95):
+    # Narrowest interval holding hdi_prob of a frozen scipy distribution (unimodal)
+    def width(lower_tail):
+        return dist.ppf(lower_tail + hdi_prob) - dist.ppf(lower_tail)
+
+    result = minimize_scalar(width, bounds=(0.0, 1.0 - hdi_prob), method="bounded",
+                             options={"xatol": 1e-10})
+    return float(dist.ppf(result.x)), float(dist.ppf(result.x + hdi_prob))
+
+
+# az.summary's sampling diagnostics; closed-form posteriors have none, so they are written as NaN
+DIAGNOSTIC_COLUMNS = ["mcse_mean", "mcse_sd", "ess_bulk", "ess_tail", "r_hat"]
+
+
+def _summary(rows, hdi_prob):
+    low, high = hdi_columns(hdi_prob)
+    df = pd.DataFrame(rows, columns=["name", "mean", "sd", low, high]).set_index("name")
+    df.index.name = None
+    df = df.round(3)
+    for column in DIAGNOSTIC_COLUMNS:
+        df[column] = np.nan
+    return df
+
+
+class BetaBernoulli:
+    """
+    Beta-Bernoulli model keeping (successes, trials) per key, e.g. per district
+    or amenity type. Updates are O(1) per observation or batch, and the posterior
+    Beta(prior_alpha + successes, prior_beta + failures) is summarised analytically.
+    """
+
+    def __init__(self, prior_alpha=1.0, prior_beta=1.0):
+        self.prior_alpha = prior_alpha
+        self.prior_beta = prior_beta
+        self.successes = {}
+        self.trials = {}
+
+    def update(self, key, observations):
+        # observations: a single 0/1 outcome or an array of them
+        observations = np.atleast_1d(observations)
+        self.successes[key] = self.successes.get(key, 0) + int(observations.sum())
+        self.trials[key] = self.trials.get(key, 0) + len(observations)
+
+    def update_groups(self, keys, observations):
+        # Batch update from aligned key / outcome arrays, one pass per distinct key
+        grouped = pd.Series(np.asarray(observations)).groupby(np.asarray(keys)).agg(["sum", "count"])
+        for key, (successes, trials) in grouped.iterrows():
+            self.successes[key] = self.successes.get(key, 0) + int(successes)
+            self.trials[key] = self.trials.get(key, 0) + int(trials)
+
+    def posterior(self, key):
+        s, n = self.successes.get(key, 0), self.trials.get(key, 0)
+        return stats.beta(self.prior_alpha + s, self.prior_beta + n - s)
+
+    def summary(self, hdi_prob=0.95, keys=None):
+        rows = []
+        for key in keys if keys is not None else self.trials:
+            dist = self.posterior(key)
+            rows.append((key, dist.mean(), dist.std(), *distribution_hdi(dist, hdi_prob)))
+        return _summary(rows, hdi_prob)
+
+
+class GammaPoisson:
+    """
+    Gamma-Poisson model keeping (total count, total exposure) per key, e.g.
+    POI counts per district. Each count covers one unit of exposure unless
+    exposure is given. The rate posterior is
+    Gamma(prior_alpha + counts, prior_beta + exposure).
+    """
+
+    def __init__(self, prior_alpha=1.0, prior_beta=1.0):
+        self.prior_alpha = prior_alpha
+        self.prior_beta = prior_beta
+        self.counts = {}
+        self.exposure = {}
+
+    def update(self, key, counts, exposure=None):
+        # counts: one count or an array of them; exposure: their total exposure (default one per count)
+        counts = np.atleast_1d(counts)
+        exposure = len(counts) if exposure is None else float(np.sum(exposure))
+        self.counts[key] = self.counts.get(key, 0) + int(counts.sum())
+        self.exposure[key] = self.exposure.get(key, 0.0) + exposure
+
+    def posterior(self, key):
+        shape = self.prior_alpha + self.counts.get(key, 0)
+        rate = self.prior_beta + self.exposure.get(key, 0.0)
+        return stats.gamma(shape, scale=1.0 / rate)
+
+    def summary(self, hdi_prob=0.95, keys=None):
+        rows = []
+        for key in keys if keys is not None else self.counts:
+            dist = self.posterior(key)
+            rows.append((key, dist.mean(), dist.std(), *distribution_hdi(dist, hdi_prob)))
+        return _summary(rows, hdi_prob)
+
+
+class PriorityGibbs:
+    """
+    Gibbs sampler for the bayesian_model.py priority model:
+        base_rate ~ Exponential(1), amenity_effects ~ Gamma(2, 1),
+        count_i ~ Poisson(base_rate * amenity_effects[i] * weight_i)
+    Both full conditionals are Gamma (conditionally conjugate), so a draw costs
+    O(#amenities) and needs no step-size tuning. Counts are sufficient statistics
+    and can be updated online before re-sampling.
+    """
+
+    def __init__(self, amenity_types, weights, effect_alpha=2.0, effect_beta=1.0, base_alpha=1.0, base_beta=1.0):
+        self.amenity_types = list(amenity_types)
+        self.weights = np.array([weights[a] for a in self.amenity_types], dtype=np.float64)
+        self.counts = np.zeros(len(self.amenity_types))
+        self.effect_alpha, self.effect_beta = effect_alpha, effect_beta
+        self.base_alpha, self.base_beta = base_alpha, base_beta
+
+    def update(self, amenity, count=1):
+        self.counts[self.amenity_types.index(amenity)] += count
+
+    def sample(self, draws=1000, tune=1000, chains=2, random_seed=None):
+        # Returns {'base_rate': (chains, draws), 'amenity_effects': (chains, draws, k)}
+        rng = np.random.default_rng(random_seed)
+        k = len(self.counts)
+        base = rng.gamma(self.base_alpha, 1.0 / self.base_beta, size=chains)
+        base_draws = np.empty((chains, draws))
+        effect_draws = np.empty((chains, draws, k))
+        for it in range(tune + draws):
+            effects = rng.gamma(self.effect_alpha + self.counts,
+                                1.0 / (self.effect_beta + base[:, None] * self.weights))
+            base = rng.gamma(self.base_alpha + self.counts.sum(),
+                             1.0 / (self.base_beta + effects @ self.weights))
+            if it >= tune:
+                base_draws[:, it - tune] = base
+                effect_draws[:, it - tune] = effects
+        return {"base_rate": base_draws, "amenity_effects": effect_draws}
@@ -0,0 +1,127 @@
+# cost_matrix.py
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_processing import load_pois
+from edge_costs import snapshot_cost
+from graph_snapshot import SNAPSHOT_DIR, load_snapshot
+from route_engine import path_edges, single_source
+from snapping import snap, snap_pois
+from utils import DISTRICT_CENTROIDS
+
+RELIEF_AMENITIES = ("hospital", "shelter", "fire_station")
+
+# Per-worker state, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(snapshot_path, weights_path, alpha, beta):
+    # Each worker memory-maps the same snapshot (and weights) instead of receiving copies
+    snapshot = load_snapshot(snapshot_path)
+    if weights_path is not None:
+        weights = np.load(weights_path, mmap_mode="r")
+    else:
+        weights = snapshot_cost(snapshot, alpha, beta)
+    _worker["snapshot"] = snapshot
+    _worker["weights"] = weights
+
+
+def _rows(snapshot, weights, origins, targets, return_paths):
+    # One early-stopping single-source search per origin
+    costs = np.full((len(origins), len(targets)), np.inf)
+    lengths = np.full((len(origins), len(targets)), np.inf)
+    paths = {}
+    for i, origin in enumerate(origins):
+        dist, length, parent = single_source(snapshot, weights, origin, targets)
+        for j, target in enumerate(targets):
+            if target in dist:
+                costs[i, j] = dist[target]
+                lengths[i, j] = length[target]
+                if return_paths:
+                    paths[(i, j)] = path_edges(snapshot, parent, target)
+    return costs, lengths, paths
+
+
+def _worker_rows(args):
+    offset, origins, targets, return_paths = args
+    costs, lengths, paths = _rows(_worker["snapshot"], _worker["weights"], origins, targets, return_paths)
+    return offset, costs, lengths, {(offset + i, j): p for (i, j), p in paths.items()}
+
+
+def cost_matrix(snapshot, origins, targets, alpha=0.7, beta=0.3, weights=None,
+                workers=None, return_paths=False, chunk_size=32, closures=None):
+    """
+    Travel cost and distance from every origin to every target (node indices).
+    Returns (costs, lengths, paths): dense (origins x targets) arrays with inf
+    where unreachable, and {(i, j): edge ids} when return_paths is set.
+    With workers > 1 the origins are split across a process pool whose workers
+    memory-map the snapshot from snapshot.path.
+    With closures (a closures.RoadClosures built on the request weights) the
+    rows come from its incrementally repaired trees instead, and alpha, beta,
+    weights and workers are ignored.
+    """
+    origins = [int(o) for o in origins]
+    targets = [int(t) for t in targets]
+    if closures is not None:
+        return closures.matrix(origins, targets, return_paths)
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1 or snapshot.path is None or len(origins) <= chunk_size:
+        if weights is None:
+            weights = snapshot_cost(snapshot, alpha, beta)
+        return _rows(snapshot, weights, origins, targets, return_paths)
+
+    costs = np.full((len(origins), len(targets)), np.inf)
+    lengths = np.full((len(origins), len(targets)), np.inf)
+    paths = {}
+    weights_path = None
+    try:
+        if weights is not None:
+            fd, weights_path = tempfile.mkstemp(suffix=".npy")
+            os.close(fd)
+            np.save(weights_path, np.asarray(weights, dtype=np.float64))
+        chunks = [
+            (start, origins[start:start + chunk_size], targets, return_paths)
+            for start in range(0, len(origins), chunk_size)
+        ]
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(snapshot.path, weights_path, alpha, beta)) as pool:
+            for offset, chunk_costs, chunk_lengths, chunk_paths in pool.map(_worker_rows, chunks):
+                costs[offset:offset + len(chunk_costs)] = chunk_costs
+                lengths[offset:offset + len(chunk_lengths)] = chunk_lengths
+                paths.update(chunk_paths)
+    finally:
+        if weights_path is not None:
+            os.remove(weights_path)
+    return costs, lengths, paths
+
+
+def facility_district_matrix(snapshot, pois, amenities=RELIEF_AMENITIES, alpha=0.7, beta=0.3, workers=None):
+    """
+    Cost from every relief facility in pois (pois.csv layout) to every district centroid.
+    Uses the node_id column written by snapping.py when present.
+    Returns (facilities, districts, costs, lengths).
+    """
+    facilities = pois[pois["amenity"].isin(amenities)].reset_index(drop=True)
+    if "node_id" not in facilities.columns:
+        facilities = snap_pois(snapshot, facilities)
+    origins = snapshot.node_index(facilities["node_id"].to_numpy())
+    districts = list(DISTRICT_CENTROIDS)
+    lats, lons = zip(*DISTRICT_CENTROIDS.values())
+    targets = snap(snapshot, lats, lons)
+    costs, lengths, _ = cost_matrix(snapshot, origins, targets, alpha, beta, workers=workers)
+    return facilities, districts, costs, lengths
+
+
+if __name__ == "__main__":
+    snapshot = load_snapshot(SNAPSHOT_DIR)
+    print("Computing relief facility -> district cost matrix...")
+    facilities, districts, costs, lengths = facility_district_matrix(snapshot, load_pois("pois.csv"))
+    matrix = pd.DataFrame(costs, columns=districts)
+    matrix.insert(0, "amenity", facilities["amenity"])
+    matrix.insert(0, "id", facilities["id"])
+    matrix.to_csv("relief_cost_matrix.csv", index=False)
+    print(f"✅ Saved {costs.shape[0]} x {costs.shape[1]} cost matrix to relief_cost_matrix.csv")
@@ -1,11 +1,79 @@
+import os
+
+import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
+
+from geo_store import GEOMETRY_COLUMN, ROW_ID_COLUMN, read_geo_table, to_geometry_array, write_geo_table
+from utils import DISTRICT_CENTROIDS
+
+def columnar_path(path):
+    """
+    Path actually read for path: a .parquet file itself, or the .parquet
+    sibling of a CSV when it exists and is at least as new as the CSV.
+    Otherwise the CSV path is returned unchanged.
+    """
+    if path.endswith(".parquet"):
+        return path
+    parquet = os.path.splitext(path)[0] + ".parquet"
+    if os.path.exists(parquet) and (not os.path.exists(path) or os.path.getmtime(parquet) >= os.path.getmtime(path)):
+        return parquet
+    return path
+
+def load_table(path, columns=None, bbox=None):
+    """
+    Loads a roads / locations / POI table from GeoParquet when available,
+    falling back to WKT-in-CSV. Returns a GeoDataFrame when a geometry column
+    is loaded. columns and bbox are pushed down to the Parquet reader; for
+    CSV they are applied after reading. Like the Parquet reader, a row_id
+    column is always kept, so rows still map to the original file
+    (geo_store.original_rows) when only some columns are read.
+    """
+    source = columnar_path(path)
+    if source.endswith(".parquet"):
+        return read_geo_table(source, columns=columns, bbox=bbox)
+
+    usecols = (lambda c: c in columns or c == ROW_ID_COLUMN) if columns is not None else None
+    df = pd.read_csv(source, usecols=usecols, low_memory=False)
+    if GEOMETRY_COLUMN not in df.columns:
+        return df
+    gdf = gpd.GeoDataFrame(df, geometry=to_geometry_array(df[GEOMETRY_COLUMN]), crs="EPSG:4326")
+    if bbox is not None:
+        gdf = gdf[shapely.intersects(shapely.box(*bbox), shapely.envelope(gdf.geometry.to_numpy()))]
+    return gdf
 
-def load_locations(path="data/locations.csv"):
-    df = pd.read_csv(path)
-    # Expect columns: id, name, latitude, longitude, type (e.g., 'aid_center', 'affected_area')
+def save_table(df, path):
+    # Writes back in the format load_table(path) reads, so a stale copy never shadows it
+    target = columnar_path(path)
+    if target.endswith(".parquet"):
+        return write_geo_table(df, target)
+    df = pd.DataFrame(df)
+    if GEOMETRY_COLUMN in df.columns:
+        df[GEOMETRY_COLUMN] = shapely.to_wkt(to_geometry_array(df[GEOMETRY_COLUMN]))
+    df.to_csv(target, index=False)
+    return target
+
+def load_locations(path="data/locations.csv", columns=None, bbox=None):
+    df = load_table(path, columns, bbox)
+    # Expect columns: osmid, x, y, geometry (graph nodes from generate_datasets.py)
+    return df
+
+def load_roads(path="data/roads.csv", columns=None, bbox=None):
+    df = load_table(path, columns, bbox)
+    # Expect columns: u, v, length, geometry
     return df
 
-def load_roads(path="data/roads.csv"):
-    df = pd.read_csv(path)
-    # Expect columns: source_id, target_id, distance_km
+def load_pois(path="pois.csv", columns=None, bbox=None):
+    df = load_table(path, columns, bbox)
+    # Expect columns: id, amenity, geometry, risk_score (+ node_id once snapped)
     return df
+
+def poi_districts(pois, centroids=DISTRICT_CENTROIDS):
+    # Nearest district centroid per POI (polygon features by their centroid), as an array of district names
+    lonlat = shapely.get_coordinates(shapely.centroid(to_geometry_array(pois[GEOMETRY_COLUMN])))
+    names = np.array(list(centroids))
+    lat, lon = np.array(list(centroids.values()), dtype=np.float64).T
+    # Longitude degrees are shorter at Uttarakhand's latitude
+    d2 = (lonlat[:, [1]] - lat) ** 2 + ((lonlat[:, [0]] - lon) * np.cos(np.radians(30.0))) ** 2
+    return names[d2.argmin(axis=1)]
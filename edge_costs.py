@@ -0,0 +1,45 @@
+# edge_costs.py
+import numpy as np
+
+# Risk is scaled to meters so it is comparable with road length in the cost formula
+RISK_SCALE = 10000
+MAX_RISK_LENGTH = 10000
+
+
+def length_proxy_risk(edge_length):
+    # Placeholder risk used until a real risk layer exists: longer roads are riskier
+    return np.minimum(np.asarray(edge_length, dtype=np.float64) / MAX_RISK_LENGTH, 1.0)
+
+
+def edge_cost(edge_length, edge_risk, alpha=0.7, beta=0.3, risk_scale=RISK_SCALE):
+    """
+    Vectorized Cost = alpha * Distance + beta * Risk over aligned per-edge arrays.
+    Returns a new array; the inputs (often memory-mapped) are never written.
+    """
+    return alpha * np.asarray(edge_length) + (beta * risk_scale) * np.asarray(edge_risk)
+
+
+def snapshot_cost(snapshot, alpha=0.7, beta=0.3, risk_scale=RISK_SCALE):
+    # Per-request weight array aligned with the snapshot's edge order
+    return edge_cost(snapshot.edge_length, snapshot.edge_risk, alpha, beta, risk_scale)
+
+
+def graph_edge_arrays(G, default_length=1.0, default_risk=0.0):
+    """
+    Returns (edges, length, risk) for a NetworkX graph, where edges is the list of
+    edge keys in G.edges order ((u, v, k) on multigraphs such as OSMnx graphs,
+    (u, v) otherwise) and length/risk are aligned numpy arrays. Read fresh on
+    every call, so edited risk_score attributes are always picked up.
+    """
+    if G.is_multigraph():
+        items = ((u, v, k, data) for u, v, k, data in G.edges(keys=True, data=True))
+    else:
+        items = ((u, v, None, data) for u, v, data in G.edges(data=True))
+    edges = []
+    length = []
+    risk = []
+    for u, v, k, data in items:
+        edges.append((u, v) if k is None else (u, v, k))
+        length.append(data.get("length", default_length))
+        risk.append(data.get("risk_score", default_risk))
+    return edges, np.array(length, dtype=np.float64), np.array(risk, dtype=np.float64)
@@ -0,0 +1,147 @@
+# facility_coverage.py
+import heapq
+import threading
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from cost_matrix import RELIEF_AMENITIES
+from edge_costs import snapshot_cost
+from priority_grid import cell_bounds, cell_indices, cell_size
+from route_engine import INF, _as_list
+from snapping import snap_pois
+
+
+class ServiceArea:
+    """
+    Bounded multi-source Dijkstra from a set of facility nodes. Every
+    settled node is labelled with its nearest facility (index into sources)
+    and the cost to reach it, all in one search.
+
+    The search is resumable: extend(budget) settles nodes up to budget and
+    keeps the heap, so a larger budget continues where the last one stopped
+    and a smaller one is answered from the labels already computed.
+    """
+
+    def __init__(self, snapshot, weights, sources):
+        self.snapshot = snapshot
+        self.sources = [int(s) for s in sources]
+        self._w = _as_list(weights)
+        self.cost = np.full(snapshot.num_nodes, INF)
+        self.owner = np.full(snapshot.num_nodes, -1, dtype=np.int64)
+        self.budget = -1.0
+        self._tentative = {}
+        self._heap = []
+        for i, node in enumerate(self.sources):
+            # Facilities snapped to the same node: the first one owns it
+            if node not in self._tentative:
+                self._tentative[node] = 0.0
+                self._heap.append((0.0, i, node))
+        heapq.heapify(self._heap)
+
+    def extend(self, budget):
+        # Settles every node reachable within budget; a no-op when budget was already covered
+        if budget <= self.budget:
+            return self
+        adj = self.snapshot.adjacency_lists()
+        indptr, target_of, w = adj["indptr"], adj["edge_target"], self._w
+        cost, owner, tentative, heap = self.cost, self.owner, self._tentative, self._heap
+        while heap and heap[0][0] <= budget:
+            d, facility, node = heapq.heappop(heap)
+            if owner[node] >= 0:
+                continue
+            cost[node] = d
+            owner[node] = facility
+            for e in range(indptr[node], indptr[node + 1]):
+                nbr = target_of[e]
+                nd = d + w[e]
+                if nd < tentative.get(nbr, INF):
+                    tentative[nbr] = nd
+                    heapq.heappush(heap, (nd, facility, nbr))
+        self.budget = budget
+        return self
+
+    def labels(self, budget):
+        """
+        (cost, owner) per node for budget: owner is -1 where no facility
+        reaches the node within budget.
+        """
+        self.extend(budget)
+        within = self.cost <= budget
+        return np.where(within, self.cost, INF), np.where(within, self.owner, -1)
+
+
+class Coverage:
+    """
+    Service areas of relief facilities in pois (pois.csv layout), with grid
+    cell summaries cached per (budget, level). Costs are road meters by
+    default, or alpha * length + beta * risk when weights are given.
+    """
+
+    def __init__(self, snapshot, pois, amenities=RELIEF_AMENITIES, weights=None):
+        facilities = pois[pois["amenity"].isin(amenities)].reset_index(drop=True)
+        if "node_id" not in facilities.columns:
+            facilities = snap_pois(snapshot, facilities)
+        self.snapshot = snapshot
+        self.facilities = facilities
+        weights = snapshot.edge_length if weights is None else weights
+        self.area = ServiceArea(snapshot, weights, snapshot.node_index(facilities["node_id"].to_numpy()))
+        self._cells = {}
+        # Shared between dashboard sessions, and extend() mutates the search state
+        self._lock = threading.Lock()
+
+    def node_labels(self, budget):
+        with self._lock:
+            return self.area.labels(budget)
+
+    def facility_summary(self, budget):
+        # Nodes reached per facility within budget
+        _, owner = self.node_labels(budget)
+        reached = np.bincount(owner[owner >= 0], minlength=len(self.facilities))
+        return self.facilities[["id", "amenity"]].assign(nodes_reached=reached)
+
+    def cells(self, budget, level=2):
+        """
+        Grid cells (priority_grid levels) holding graph nodes, with the
+        facility nearest to any node in the cell, that cost and the share
+        of the cell's nodes that are covered. Cached per (budget, level).
+        """
+        key = (float(budget), level)
+        cells = self._cells.get(key)
+        if cells is None:
+            cost, owner = self.node_labels(budget)
+            ix, iy = cell_indices(self.snapshot.node_x, self.snapshot.node_y, level)
+            frame = pd.DataFrame({"ix": ix, "iy": iy, "cost": cost, "covered": owner >= 0})
+            # The owner of a cell is the facility of its cheapest node
+            order = np.lexsort((cost, iy, ix))
+            frame = frame.iloc[order].assign(owner=owner[order])
+            cells = frame.groupby(["ix", "iy"], sort=False).agg(
+                cost=("cost", "first"), owner=("owner", "first"), covered_share=("covered", "mean"), nodes=("cost", "size"),
+            ).reset_index()
+            min_lon, min_lat, max_lon, max_lat = cell_bounds(cells["ix"].to_numpy(), cells["iy"].to_numpy(), level)
+            cells = self._cells[key] = cells.assign(geometry=shapely.box(min_lon, min_lat, max_lon, max_lat))
+        return cells
+
+    def polygons(self, budget, level=2):
+        """
+        One (multi)polygon per facility made of the cells it owns, plus a
+        row with facility -1 for the cells that no facility reaches.
+        """
+        cells = self.cells(budget, level)
+        rows = []
+        for facility, group in cells.groupby("owner"):
+            rows.append({"facility": int(facility), "cells": len(group),
+                         "geometry": shapely.union_all(group["geometry"].to_numpy())})
+        return pd.DataFrame(rows, columns=["facility", "cells", "geometry"])
+
+
+def coverage_for(snapshot, pois, alpha=None, beta=None, amenities=RELIEF_AMENITIES):
+    # Coverage in road meters, or in combined cost when alpha and beta are given
+    weights = snapshot_cost(snapshot, alpha, beta) if alpha is not None and beta is not None else None
+    return Coverage(snapshot, pois, amenities, weights)
+
+
+def cell_size_km(level):
+    # Rough cell edge in km at Uttarakhand's latitude, for labels
+    return cell_size(level) * 111.0 * np.cos(np.radians(30.0))
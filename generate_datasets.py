@@ -1,8 +1,12 @@
+import os
+
 import osmnx as ox
 import geopandas as gpd
 
-def main():
-    place = "Uttarakhand, India"
+from geo_store import write_geo_table
+from graph_snapshot import SNAPSHOT_DIR, compile_graph
+
+def download_datasets(place="Uttarakhand, India", roads_path="roads.csv", locations_path="locations.csv"):
     print(f"Downloading road network for: {place}")
 
     # Get the driving network graph
@@ -19,10 +23,21 @@ def main():
     roads_df = edges[['u', 'v', 'length', 'geometry']].copy()
 
     # Save roads.csv and nodes.csv
-    roads_df.to_csv("roads.csv", index=False)
-    nodes.to_csv("locations.csv", index=True)  # nodes have 'osmid' as index
+    roads_df.to_csv(roads_path, index=False)
+    nodes.to_csv(locations_path, index=True)  # nodes have 'osmid' as index
+
+    # GeoParquet copies (WKB geometry, int64 ids); the loaders prefer these over the CSVs
+    write_geo_table(roads_df, os.path.splitext(roads_path)[0] + ".parquet")
+    write_geo_table(nodes.reset_index(), os.path.splitext(locations_path)[0] + ".parquet")
+
+    print(f"✅ Datasets saved: {locations_path} and {roads_path} (+ .parquet)")
+
+def main():
+    download_datasets()
 
-    print("✅ Datasets saved: locations.csv and roads.csv")
+    # Compile the CSVs into the memory-mapped snapshot used by the dashboard
+    snapshot = compile_graph("roads.csv", "locations.csv", SNAPSHOT_DIR)
+    print(f"✅ Graph snapshot saved to {SNAPSHOT_DIR}/ ({snapshot.num_nodes} nodes, {snapshot.num_edges} edges)")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,174 @@
+# geo_store.py
+import json
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import shapely
+
+GEOMETRY_COLUMN = "geometry"
+BBOX_COLUMN = "bbox"
+# Position of each row in the table as first written, kept through the spatial sort
+ROW_ID_COLUMN = "row_id"
+# OSM identifiers stored as int64 instead of whatever the CSV parser guessed
+ID_COLUMNS = ("id", "osmid", "u", "v", "key", "node_id", ROW_ID_COLUMN)
+ROW_GROUP_SIZE = 16384
+# GeoParquet geometry type names, indexed by shapely type id
+GEOMETRY_TYPES = ["Point", "LineString", "LinearRing", "Polygon", "MultiPoint",
+                  "MultiLineString", "MultiPolygon", "GeometryCollection"]
+
+
+def to_geometry_array(values):
+    """
+    Vectorized conversion of a geometry column to a numpy array of shapely
+    geometries. Accepts shapely objects, WKT strings or WKB bytes; missing
+    or invalid entries become None.
+    """
+    if isinstance(values, gpd.GeoSeries):
+        return values.to_numpy()
+    values = np.asarray(values, dtype=object)
+    if len(values) == 0 or isinstance(values[0], shapely.Geometry):
+        return values
+    missing = pd.isna(values)
+    values = np.where(missing, None, values)
+    sample = values[~missing][:1]
+    if len(sample) and isinstance(sample[0], (bytes, bytearray)):
+        return shapely.from_wkb(values, on_invalid="ignore")
+    return shapely.from_wkt(values, on_invalid="ignore")
+
+
+def _morton_order(bounds):
+    # Z-order of bbox centres, so each row group covers a compact area
+    centre = np.nan_to_num((bounds[:, :2] + bounds[:, 2:]) / 2)
+    low, high = centre.min(axis=0), centre.max(axis=0)
+    cells = ((centre - low) / np.where(high > low, high - low, 1.0) * 65535).astype(np.uint64)
+    code = np.zeros(len(cells), dtype=np.uint64)
+    for bit in range(16):
+        code |= ((cells[:, 0] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit)
+        code |= ((cells[:, 1] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit + 1)
+    return np.argsort(code, kind="stable")
+
+
+def _arrow_column(series):
+    if series.name in ID_COLUMNS:
+        numeric = pd.to_numeric(series, errors="coerce")
+        if numeric.notna().all() and (numeric == numeric.round()).all():
+            return pa.array(numeric.to_numpy(dtype=np.int64))
+    if series.dtype == object:
+        # e.g. OSM tags holding lists: keep them readable as text
+        return pa.array([None if pd.isna(v) else str(v) for v in series], type=pa.string())
+    return pa.array(series.to_numpy(), from_pandas=True)
+
+
+def write_geo_table(df, path, geometry=GEOMETRY_COLUMN, row_group_size=ROW_GROUP_SIZE, spatial_sort=True):
+    """
+    Writes df as GeoParquet: WKB geometry, int64 OSM ids and a per-row bbox
+    struct column. Row-group statistics on the bbox give bounding-box
+    filtering in read_geo_table. With spatial_sort the rows are written in
+    Z-order so that each row group covers a small area, and a row_id column
+    keeps each row's original position (see original_rows).
+    """
+    df = pd.DataFrame(df).reset_index(drop=True)
+    columns = {}
+    geo_meta = None
+    if geometry in df.columns:
+        geoms = to_geometry_array(df[geometry])
+        bounds = shapely.bounds(geoms)
+        if spatial_sort and len(df):
+            if ROW_ID_COLUMN not in df.columns:
+                df[ROW_ID_COLUMN] = np.arange(len(df), dtype=np.int64)
+            order = _morton_order(bounds)
+            df, geoms, bounds = df.iloc[order].reset_index(drop=True), geoms[order], bounds[order]
+        columns[geometry] = pa.array(shapely.to_wkb(geoms), type=pa.binary())
+        columns[BBOX_COLUMN] = pa.StructArray.from_arrays(
+            [pa.array(bounds[:, i], from_pandas=True) for i in range(4)], names=["xmin", "ymin", "xmax", "ymax"]
+        )
+        types = np.unique(shapely.get_type_id(geoms[~shapely.is_missing(geoms)]))
+        geo_meta = {
+            "version": "1.1.0",
+            "primary_column": geometry,
+            "columns": {
+                geometry: {
+                    "encoding": "WKB",
+                    "geometry_types": [GEOMETRY_TYPES[t] for t in types],
+                    "bbox": np.nan_to_num([np.nanmin(bounds[:, 0]), np.nanmin(bounds[:, 1]),
+                                           np.nanmax(bounds[:, 2]), np.nanmax(bounds[:, 3])]).tolist() if len(df) else [],
+                    "covering": {"bbox": {k: [BBOX_COLUMN, k] for k in ("xmin", "ymin", "xmax", "ymax")}},
+                }
+            },
+        }
+    for name in df.columns:
+        if name != geometry:
+            columns[name] = _arrow_column(df[name])
+
+    # Keep the original column order, with the bbox covering column last
+    names = [c for c in df.columns] + ([BBOX_COLUMN] if geo_meta else [])
+    table = pa.table({name: columns[name] for name in names})
+    if geo_meta:
+        table = table.replace_schema_metadata({b"geo": json.dumps(geo_meta).encode()})
+    pq.write_table(table, path, row_group_size=row_group_size, compression="zstd")
+    return path
+
+
+def read_geo_table(path, columns=None, bbox=None, decode=True):
+    """
+    Reads a table written by write_geo_table.
+    columns: subset of columns to read (names not in the file are skipped).
+    bbox: (minx, miny, maxx, maxy); row groups outside it are never read and
+    only rows whose bounds intersect it are returned.
+    decode: turn the WKB column into shapely geometries (one vectorized call)
+    and return a GeoDataFrame; otherwise the geometry stays as WKB bytes.
+    """
+    dataset = ds.dataset(path, format="parquet")
+    names = dataset.schema.names
+    wanted = [c for c in (columns if columns is not None else names) if c in names and c != BBOX_COLUMN]
+    # Row ids are always read, so rows can be matched back to the original table
+    if ROW_ID_COLUMN in names and ROW_ID_COLUMN not in wanted:
+        wanted.append(ROW_ID_COLUMN)
+    row_filter = None
+    if bbox is not None and BBOX_COLUMN in names:
+        minx, miny, maxx, maxy = bbox
+        row_filter = (
+            (pc.field(BBOX_COLUMN, "xmin") <= maxx) & (pc.field(BBOX_COLUMN, "xmax") >= minx)
+            & (pc.field(BBOX_COLUMN, "ymin") <= maxy) & (pc.field(BBOX_COLUMN, "ymax") >= miny)
+        )
+    df = dataset.to_table(columns=wanted, filter=row_filter).to_pandas()
+    if decode and GEOMETRY_COLUMN in df.columns:
+        geoms = shapely.from_wkb(df[GEOMETRY_COLUMN].to_numpy(dtype=object))
+        return gpd.GeoDataFrame(df, geometry=geoms, crs="EPSG:4326")
+    return df
+
+
+def original_rows(df):
+    # Original row position of each row: the row_id column of a spatially sorted table, else the CSV index
+    if ROW_ID_COLUMN in df.columns:
+        return df[ROW_ID_COLUMN].to_numpy(dtype=np.int64)
+    return df.index.to_numpy(dtype=np.int64)
+
+
+def csv_to_geo_table(csv_path, out_path=None, **kwargs):
+    # Imports a WKT-in-CSV file (generate_datasets.py / add_pois.py layout)
+    out_path = out_path or os.path.splitext(csv_path)[0] + ".parquet"
+    return write_geo_table(pd.read_csv(csv_path, low_memory=False), out_path, **kwargs)
+
+
+def geo_table_to_csv(path, csv_path=None):
+    # Exports back to CSV with WKT geometry
+    csv_path = csv_path or os.path.splitext(path)[0] + ".csv"
+    df = read_geo_table(path, decode=False)
+    if GEOMETRY_COLUMN in df.columns:
+        df[GEOMETRY_COLUMN] = shapely.to_wkt(shapely.from_wkb(df[GEOMETRY_COLUMN].to_numpy(dtype=object)))
+    df.to_csv(csv_path, index=False)
+    return csv_path
+
+
+if __name__ == "__main__":
+    for csv_path in ("roads.csv", "locations.csv", "pois.csv"):
+        if os.path.exists(csv_path):
+            out_path = csv_to_geo_table(csv_path)
+            print(f"✅ Converted {csv_path} to {out_path}")
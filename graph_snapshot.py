@@ -0,0 +1,324 @@
+# graph_snapshot.py
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from data_processing import columnar_path, load_locations, load_roads
+from edge_costs import length_proxy_risk
+from geo_store import original_rows
+
+SNAPSHOT_DIR = "graph_snapshot"
+SNAPSHOT_VERSION = 2
+
+# Flat arrays making up a snapshot, one .npy file each
+SNAPSHOT_ARRAYS = [
+    "node_ids",      # int64 OSM ids, sorted (node index -> osmid)
+    "node_x",        # float64 longitude per node
+    "node_y",        # float64 latitude per node
+    "indptr",        # int64 CSR row pointer over outgoing edges (n + 1)
+    "edge_source",   # int32 source node index per edge
+    "edge_target",   # int32 target node index per edge
+    "edge_length",   # float64 length in meters per edge
+    "edge_row",      # int64 row of the edge in the source roads file (CSV order, see geo_store.original_rows)
+    "rev_indptr",    # int64 CSR row pointer over incoming edges (n + 1)
+    "rev_edges",     # int64 edge ids grouped by target node
+    "geom_offsets",  # int64 offsets into geom_coords per edge (m + 1)
+    "geom_coords",   # float64 (k, 2) lon/lat vertices of all edge geometries
+    "edge_risk",     # float64 risk score in [0, 1] per edge
+]
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    # Great-circle distance in meters, works on scalars and numpy arrays
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GraphSnapshot:
+    """
+    Read-only road graph held as flat (usually memory-mapped) numpy arrays.
+    Nodes are addressed by their index into node_ids, edges by their CSR position.
+    """
+
+    def __init__(self, arrays, meta=None, path=None):
+        for name in SNAPSHOT_ARRAYS:
+            setattr(self, name, arrays[name])
+        self._lists = None
+        self.meta = meta or {}
+        self.path = path
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_target)
+
+    def node_index(self, osmid):
+        # Map OSM ids (scalar or array) to node indices
+        osmid = np.asarray(osmid, dtype=np.int64)
+        idx = np.searchsorted(self.node_ids, osmid)
+        idx = np.minimum(idx, self.num_nodes - 1)
+        if not np.all(self.node_ids[idx] == osmid):
+            raise KeyError(f"Unknown node id(s): {osmid[self.node_ids[idx] != osmid]}")
+        return idx
+
+    def out_edges(self, node):
+        return range(self.indptr[node], self.indptr[node + 1])
+
+    def edge_geometry(self, edge):
+        # (k, 2) lon/lat vertices of one edge
+        return self.geom_coords[self.geom_offsets[edge]:self.geom_offsets[edge + 1]]
+
+    def risk_version(self):
+        # Content hash of the per-edge length and risk arrays, used to invalidate derived data
+        if getattr(self, "_risk_version", None) is None:
+            digest = hashlib.sha1()
+            digest.update(np.ascontiguousarray(self.edge_length).tobytes())
+            digest.update(np.ascontiguousarray(self.edge_risk).tobytes())
+            self._risk_version = digest.hexdigest()
+        return self._risk_version
+
+    def adjacency_lists(self):
+        # Plain Python lists of the CSR arrays, built once for the pure-Python search loops.
+        # They are private to each process: pool workers share the memory-mapped arrays, not these lists
+        if getattr(self, "_lists", None) is None:
+            self._lists = {
+                "indptr": self.indptr.tolist(),
+                "edge_source": self.edge_source.tolist(),
+                "edge_target": self.edge_target.tolist(),
+                "rev_indptr": self.rev_indptr.tolist(),
+                "rev_edges": self.rev_edges.tolist(),
+                "edge_length": self.edge_length.tolist(),
+            }
+        return self._lists
+
+    def edge_geometries(self):
+        # Shapely LineStrings for every edge (lon/lat), built once from the flat vertex arrays
+        if getattr(self, "_edge_geoms", None) is None:
+            counts = np.diff(self.geom_offsets)
+            self._edge_geoms = shapely.linestrings(
+                self.geom_coords, indices=np.repeat(np.arange(self.num_edges), counts)
+            )
+        return self._edge_geoms
+
+    def edge_tree(self):
+        # STRtree over edge_geometries(); tree indices are edge ids
+        if getattr(self, "_edge_tree", None) is None:
+            self._edge_tree = shapely.STRtree(self.edge_geometries())
+        return self._edge_tree
+
+    def path_latlons(self, nodes):
+        return [(float(self.node_y[n]), float(self.node_x[n])) for n in nodes]
+
+    def to_networkx(self):
+        # Build a MultiDiGraph keyed by OSM id, for code that still expects NetworkX
+        import networkx as nx
+
+        G = nx.MultiDiGraph(crs="epsg:4326")
+        ids = self.node_ids.tolist()
+        G.add_nodes_from(
+            (osmid, {"x": x, "y": y})
+            for osmid, x, y in zip(ids, self.node_x.tolist(), self.node_y.tolist())
+        )
+        src = self.node_ids[self.edge_source].tolist()
+        dst = self.node_ids[self.edge_target].tolist()
+        G.add_edges_from(
+            (u, v, {"length": length, "edge_id": e})
+            for e, (u, v, length) in enumerate(zip(src, dst, self.edge_length.tolist()))
+        )
+        return G
+
+
+def build_arrays(node_ids, node_x, node_y, u, v, length=None, geoms=None, risk=None):
+    """
+    Builds the snapshot arrays from sorted node ids/coordinates and per-road
+    endpoint indices (u, v). Missing lengths are filled with great-circle
+    distances, missing geometries with straight segments and missing risk
+    with the length-based proxy. Roads are reordered into CSR order.
+    """
+    n = len(node_ids)
+    order = np.lexsort((v, u))
+    edge_source = np.asarray(u)[order].astype(np.int32)
+    edge_target = np.asarray(v)[order].astype(np.int32)
+    m = len(order)
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edge_source, minlength=n), out=indptr[1:])
+    rev_edges = np.argsort(edge_target, kind="stable").astype(np.int64)
+    rev_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edge_target, minlength=n), out=rev_indptr[1:])
+
+    straight = haversine_m(node_y[edge_source], node_x[edge_source], node_y[edge_target], node_x[edge_target])
+    if length is None:
+        edge_length = straight
+    else:
+        edge_length = np.asarray(length, dtype=np.float64)[order]
+        edge_length = np.where(np.isnan(edge_length), straight, edge_length)
+
+    if geoms is None:
+        geoms = np.full(m, None, dtype=object)
+    else:
+        geoms = np.asarray(geoms, dtype=object)[order]
+    missing = shapely.is_missing(geoms) | shapely.is_empty(geoms)
+    if missing.any():
+        ends = np.stack([
+            np.column_stack([node_x[edge_source[missing]], node_y[edge_source[missing]]]),
+            np.column_stack([node_x[edge_target[missing]], node_y[edge_target[missing]]]),
+        ], axis=1)
+        geoms[missing] = shapely.linestrings(ends)
+    geom_coords, geom_index = shapely.get_coordinates(geoms, return_index=True)
+    geom_offsets = np.zeros(m + 1, dtype=np.int64)
+    np.cumsum(np.bincount(geom_index, minlength=m), out=geom_offsets[1:])
+
+    if risk is None:
+        edge_risk = length_proxy_risk(edge_length)
+    else:
+        edge_risk = np.asarray(risk, dtype=np.float64)[order]
+
+    return {
+        "node_ids": np.asarray(node_ids, dtype=np.int64),
+        "node_x": np.asarray(node_x, dtype=np.float64),
+        "node_y": np.asarray(node_y, dtype=np.float64),
+        "indptr": indptr,
+        "edge_source": edge_source,
+        "edge_target": edge_target,
+        "edge_length": edge_length,
+        "edge_row": order.astype(np.int64),
+        "rev_indptr": rev_indptr,
+        "rev_edges": rev_edges,
+        "geom_offsets": geom_offsets,
+        "geom_coords": geom_coords.astype(np.float64),
+        "edge_risk": edge_risk,
+    }
+
+
+def compile_graph(roads_path="roads.csv", locations_path="locations.csv", out_dir=SNAPSHOT_DIR):
+    """
+    Compiles the generate_datasets.py outputs into an on-disk graph snapshot.
+    Edges whose endpoints are missing from the locations file are dropped.
+    GeoParquet copies of the CSVs (geo_store.py) are read instead when present.
+    """
+    nodes = pd.DataFrame(load_locations(locations_path, columns=["osmid", "x", "y"]))
+    nodes = nodes.drop_duplicates("osmid").sort_values("osmid")
+    node_ids = nodes["osmid"].to_numpy(dtype=np.int64)
+    node_x = nodes["x"].to_numpy(dtype=np.float64)
+    node_y = nodes["y"].to_numpy(dtype=np.float64)
+    n = len(node_ids)
+
+    roads = load_roads(roads_path, columns=["u", "v", "length", "geometry"])
+    u_ids = roads["u"].to_numpy(dtype=np.int64)
+    v_ids = roads["v"].to_numpy(dtype=np.int64)
+    u = np.minimum(np.searchsorted(node_ids, u_ids), n - 1)
+    v = np.minimum(np.searchsorted(node_ids, v_ids), n - 1)
+    known = (node_ids[u] == u_ids) & (node_ids[v] == v_ids)
+    if not known.all():
+        print(f"Dropping {(~known).sum()} roads with endpoints missing from {locations_path}")
+    rows = np.flatnonzero(known)
+
+    length = roads["length"].to_numpy(dtype=np.float64)[rows] if "length" in roads.columns else None
+
+    # Geometries arrive decoded (vectorized WKB or WKT parsing in load_roads)
+    geoms = roads["geometry"].to_numpy()[rows] if "geometry" in roads.columns else None
+
+    arrays = build_arrays(node_ids, node_x, node_y, u[rows], v[rows], length, geoms)
+    # Keep edge_row pointing at rows of the original roads file, not of its spatially sorted Parquet copy
+    arrays["edge_row"] = original_rows(roads)[rows[arrays["edge_row"]]]
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "num_nodes": int(n),
+        "num_edges": int(len(rows)),
+        "roads": os.path.abspath(columnar_path(roads_path)),
+        "locations": os.path.abspath(columnar_path(locations_path)),
+    }
+    save_snapshot(arrays, meta, out_dir)
+    return GraphSnapshot(arrays, meta, out_dir)
+
+
+def snapshot_from_networkx(G):
+    """
+    Builds an in-memory snapshot from a NetworkX graph whose nodes carry x/y
+    attributes (an OSMnx graph or utils.load_graph_and_nodes). Node ids must be
+    integers; edge length, geometry and risk_score attributes are used when present.
+    Nodes without x/y get NaN coordinates, which Dijkstra does not need.
+    """
+    node_ids = np.array(sorted(G.nodes), dtype=np.int64)
+    node_x = np.array([G.nodes[n].get("x", np.nan) for n in node_ids.tolist()], dtype=np.float64)
+    node_y = np.array([G.nodes[n].get("y", np.nan) for n in node_ids.tolist()], dtype=np.float64)
+
+    edges = list(G.edges(data=True))
+    u = np.searchsorted(node_ids, np.array([e[0] for e in edges], dtype=np.int64))
+    v = np.searchsorted(node_ids, np.array([e[1] for e in edges], dtype=np.int64))
+    length = np.array([d.get("length", np.nan) for _, _, d in edges], dtype=np.float64)
+    geoms = np.array([d.get("geometry") for _, _, d in edges] + [None], dtype=object)[:-1]
+    risk = None
+    if any("risk_score" in d for _, _, d in edges):
+        risk = np.array([d.get("risk_score", 0.0) for _, _, d in edges], dtype=np.float64)
+
+    arrays = build_arrays(node_ids, node_x, node_y, u, v, length, geoms, risk)
+    meta = {"version": SNAPSHOT_VERSION, "num_nodes": len(node_ids), "num_edges": len(edges)}
+    return GraphSnapshot(arrays, meta)
+
+
+def save_array(path, array):
+    """
+    Writes a .npy file next to path and renames it into place. Processes that
+    have the old file memory-mapped keep reading the old data instead of
+    seeing it rewritten under them (which can end in SIGBUS).
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp, path)
+
+
+def save_snapshot(arrays, meta, out_dir=SNAPSHOT_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+    for name in SNAPSHOT_ARRAYS:
+        save_array(os.path.join(out_dir, f"{name}.npy"), arrays[name])
+    # meta.json is replaced last so a half-written snapshot is never picked up
+    tmp = os.path.join(out_dir, f"meta.json.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, "meta.json"))
+
+
+def snapshot_exists(path=SNAPSHOT_DIR):
+    return os.path.exists(os.path.join(path, "meta.json"))
+
+
+def snapshot_files_stamp(path=SNAPSHOT_DIR):
+    # (mtime_ns, size) of meta.json and edge_risk.npy; changes when the snapshot is recompiled or its risk rewritten
+    stamp = []
+    for name in ("meta.json", "edge_risk.npy"):
+        file_path = os.path.join(path, name)
+        if os.path.exists(file_path):
+            stat = os.stat(file_path)
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        else:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def load_snapshot(path=SNAPSHOT_DIR, mmap=True):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot at {path} has version {meta.get('version')}, expected {SNAPSHOT_VERSION}")
+    mode = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in SNAPSHOT_ARRAYS}
+    return GraphSnapshot(arrays, meta, path)
+
+
+if __name__ == "__main__":
+    print("Compiling roads.csv and locations.csv into graph snapshot...")
+    snapshot = compile_graph()
+    print(f"✅ Snapshot saved to {SNAPSHOT_DIR}/ ({snapshot.num_nodes} nodes, {snapshot.num_edges} edges)")
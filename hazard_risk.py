@@ -0,0 +1,209 @@
+# hazard_risk.py
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from edge_costs import MAX_RISK_LENGTH
+from graph_snapshot import SNAPSHOT_DIR, load_snapshot, save_array
+from utils import load_districts, load_hazard_info
+
+# Severity labels used by the dashboard hazard table, as the chance a road inside the zone is impassable
+SEVERITY_SCORE = {"Low": 0.25, "Medium": 0.5, "High": 0.75, "Very High": 1.0}
+# Severity given to hazards from utils.load_hazard_info, which has no severity column
+DEFAULT_SEVERITY = "High"
+# Keeps log(1 - exposure) finite for edges fully inside a maximum-severity zone
+MAX_EXPOSURE = 1.0 - 1e-9
+# Approximate meters per degree, for edges whose length in meters is not known
+METERS_PER_DEGREE = 111_000.0
+
+
+def hazard_zones(districts=None, hazards=None):
+    """
+    One hazard zone per (district, hazard) pair as a GeoDataFrame with
+    district_name, hazard, severity (0-1) and geometry columns.
+
+    hazards is either a dashboard-style table (District, Hazard, Severity)
+    or utils.load_hazard_info() (hazard_type, comma separated
+    affected_districts), whose hazards get DEFAULT_SEVERITY.
+    Districts without a polygon are dropped.
+    """
+    districts = load_districts() if districts is None else districts
+    hazards = load_hazard_info() if hazards is None else hazards
+    if "affected_districts" in hazards.columns:
+        hazards = pd.DataFrame({
+            "District": hazards["affected_districts"].str.split(","),
+            "Hazard": hazards["hazard_type"],
+            "Severity": DEFAULT_SEVERITY,
+        }).explode("District")
+        hazards["District"] = hazards["District"].str.strip()
+    zones = districts[["district_name", "geometry"]].merge(
+        pd.DataFrame({
+            "district_name": hazards["District"].to_numpy(),
+            "hazard": hazards["Hazard"].to_numpy(),
+            "severity": hazards["Severity"].map(SEVERITY_SCORE).fillna(0.0).to_numpy(),
+        }),
+        on="district_name",
+    )
+    return zones.reset_index(drop=True)
+
+
+def edge_exposure(edge_geoms, tree, polygons, edge_length=None):
+    """
+    Share of each edge inside each polygon, from one bulk STRtree query.
+    Returns (polygon index, edge index, fraction of the edge inside the polygon)
+    for every intersecting pair. Edges lying wholly inside a polygon skip the
+    intersection and count as 1.
+    edge_length may hold precomputed (planar) edge lengths aligned with edge_geoms.
+    """
+    polygons = np.asarray(polygons, dtype=object)
+    poly_idx, edge_idx = tree.query(polygons, predicate="intersects")
+    if not len(edge_idx):
+        return poly_idx, edge_idx, np.zeros(0)
+    shapely.prepare(polygons)
+    fraction = np.ones(len(edge_idx))
+    crossing = ~shapely.contains_properly(polygons[poly_idx], edge_geoms[edge_idx])
+    if crossing.any():
+        inside = shapely.intersection(edge_geoms[edge_idx[crossing]], polygons[poly_idx[crossing]])
+        total = edge_length[edge_idx[crossing]] if edge_length is not None else shapely.length(edge_geoms[edge_idx[crossing]])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Degenerate (zero-length) edges count as fully exposed when they touch the polygon
+            fraction[crossing] = np.where(total > 0, shapely.length(inside) / total, 1.0)
+    return poly_idx, edge_idx, np.clip(fraction, 0.0, 1.0)
+
+
+class HazardRiskLayer:
+    """
+    Per-edge hazard risk for a fixed set of edge geometries.
+
+    Each zone contributes the meters of road inside it times its severity,
+    normalised by MAX_RISK_LENGTH (the scale of the length-based placeholder
+    risk) and capped below 1, so a long road through a zone is riskier than
+    a short one. Zones are combined as independent hazards:
+    risk = 1 - prod(1 - contribution).
+    The sum of log(1 - contribution) is kept per edge together with every
+    zone's own contributions, so set_zone() / remove_zone() only touch the
+    edges of the changed zone instead of re-joining the whole layer.
+    """
+
+    def __init__(self, edge_geoms, tree=None, edge_meters=None):
+        # edge_meters: edge lengths in meters; approximated from the (degree) geometries when missing
+        self.edge_geoms = np.asarray(edge_geoms, dtype=object)
+        self.tree = tree if tree is not None else shapely.STRtree(self.edge_geoms)
+        self.edge_length = shapely.length(self.edge_geoms)
+        if edge_meters is None:
+            edge_meters = self.edge_length * METERS_PER_DEGREE
+        self.edge_meters = np.asarray(edge_meters, dtype=np.float64)
+        self.log_safe = np.zeros(len(self.edge_geoms))
+        self.zones = {}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot.edge_geometries(), snapshot.edge_tree(), snapshot.edge_length)
+
+    def _contribution(self, edge_idx, fraction, severity):
+        # log(1 - exposure) with exposure = meters inside * severity / MAX_RISK_LENGTH
+        exposure = fraction * self.edge_meters[edge_idx] * severity / MAX_RISK_LENGTH
+        return np.log1p(-np.minimum(exposure, MAX_EXPOSURE))
+
+    def add_zones(self, zones, key_columns=("district_name", "hazard")):
+        """
+        Joins a zone GeoDataFrame (hazard_zones) onto the edges in one bulk
+        query. Zones are keyed by the values of key_columns.
+        """
+        keys = list(zip(*(zones[c].tolist() for c in key_columns)))
+        polygons = zones.geometry.to_numpy()
+        severity = zones["severity"].to_numpy(dtype=np.float64)
+        poly_idx, edge_idx, fraction = edge_exposure(self.edge_geoms, self.tree, polygons, self.edge_length)
+        contribution = self._contribution(edge_idx, fraction, severity[poly_idx])
+        order = np.argsort(poly_idx, kind="stable")
+        bounds = np.searchsorted(poly_idx[order], np.arange(len(keys) + 1))
+        for i, key in enumerate(keys):
+            if key in self.zones:
+                self.remove_zone(key)
+            rows = order[bounds[i]:bounds[i + 1]]
+            self._apply(key, edge_idx[rows], contribution[rows])
+
+    def set_zone(self, key, polygon, severity):
+        # Adds or replaces a single zone; only edges near its old and new polygon are updated
+        if key in self.zones:
+            self.remove_zone(key)
+        _, edge_idx, fraction = edge_exposure(self.edge_geoms, self.tree, [polygon], self.edge_length)
+        self._apply(key, edge_idx, self._contribution(edge_idx, fraction, severity))
+
+    def remove_zone(self, key):
+        edges, contribution = self.zones.pop(key)
+        np.subtract.at(self.log_safe, edges, contribution)
+
+    def _apply(self, key, edges, contribution):
+        np.add.at(self.log_safe, edges, contribution)
+        self.zones[key] = (edges, contribution)
+
+    def risk(self):
+        # Per-edge risk in [0, 1], aligned with the edge geometries
+        return np.clip(-np.expm1(self.log_safe), 0.0, 1.0)
+
+
+def snapshot_hazard_risk(snapshot, zones=None):
+    # Per-edge risk aligned with the snapshot's CSR edge order
+    layer = HazardRiskLayer.from_snapshot(snapshot)
+    layer.add_zones(hazard_zones() if zones is None else zones)
+    return layer.risk()
+
+
+def graph_hazard_risk(G, zones=None):
+    """
+    Per-edge risk for a NetworkX graph, aligned with G.edges order, and set
+    as each edge's risk_score attribute (as used by routing.add_combined_cost).
+    Edges without a geometry attribute are drawn straight between their nodes;
+    edges without a length attribute are measured from their geometry.
+    """
+    edges = list(G.edges(data=True))
+    geoms = np.array([d.get("geometry") for _, _, d in edges] + [None], dtype=object)[:-1]
+    missing = shapely.is_missing(geoms)
+    if missing.any():
+        ends = np.array([[(G.nodes[u]["x"], G.nodes[u]["y"]), (G.nodes[v]["x"], G.nodes[v]["y"])]
+                         for (u, v, _), m in zip(edges, missing) if m], dtype=np.float64)
+        geoms[missing] = shapely.linestrings(ends)
+    meters = np.array([d.get("length", np.nan) for _, _, d in edges], dtype=np.float64)
+    meters = np.where(np.isnan(meters), shapely.length(geoms) * METERS_PER_DEGREE, meters)
+    layer = HazardRiskLayer(geoms, edge_meters=meters)
+    layer.add_zones(hazard_zones() if zones is None else zones)
+    risk = layer.risk()
+    for (_, _, data), r in zip(edges, risk.tolist()):
+        data["risk_score"] = r
+    return risk
+
+
+def save_snapshot_risk(risk, path=SNAPSHOT_DIR, source="hazard_zones"):
+    """
+    Replaces edge_risk.npy of an on-disk snapshot. Both files are written
+    to a temporary file and renamed into place, meta.json last, so running
+    processes keep reading their memory-mapped old risk. The new risk changes
+    the snapshot's risk_version, which invalidates the Pareto frontiers and
+    cached routes built on the old risk.
+    """
+    save_array(os.path.join(path, "edge_risk.npy"), np.asarray(risk, dtype=np.float64))
+    meta_path = os.path.join(path, "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["risk"] = source
+    tmp = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, meta_path)
+
+
+def build_risk_layer(snapshot_dir=SNAPSHOT_DIR):
+    snapshot = load_snapshot(snapshot_dir, mmap=False)
+    risk = snapshot_hazard_risk(snapshot)
+    save_snapshot_risk(risk, snapshot_dir)
+    return risk
+
+
+if __name__ == "__main__":
+    print("Joining hazard zones onto road edges...")
+    risk = build_risk_layer()
+    print(f"✅ Hazard risk saved to {SNAPSHOT_DIR}/edge_risk.npy ({(risk > 0).sum()} of {len(risk)} edges exposed)")
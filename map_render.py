@@ -0,0 +1,175 @@
+# map_render.py
+import json
+
+import folium
+import numpy as np
+import shapely
+from branca.element import MacroElement
+from folium.plugins import FastMarkerCluster
+from jinja2 import Template
+
+# Road layers and the zoom levels each is shown at; coarser bands get coarser geometry
+ZOOM_BANDS = ((0, 9), (10, 12), (13, 18))
+# Payload cap per road layer; geometry is simplified further until it fits
+MAX_LAYER_BYTES = 8_000_000
+# Cap on the points sent for a single route polyline
+MAX_ROUTE_POINTS = 2000
+# Decimal places kept for coordinates (5 is about 1 m)
+COORD_PRECISION = 5
+
+# Drawn client-side for every POI row [lat, lon, risk, amenity]
+POI_CALLBACK = """function (row) {
+    var color = row[2] > 0.5 ? 'red' : 'green';
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]),
+        {radius: 5, color: color, fill: true, fillColor: color});
+    marker.bindPopup('Amenity: ' + row[3] + '<br>Risk: ' + row[2].toFixed(2));
+    return marker;
+}"""
+
+
+class ZoomBands(MacroElement):
+    # Shows each layer only between its min and max zoom
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var bands = [{% for lo, hi, layer in this.bands %}[{{ lo }}, {{ hi }}, {{ layer }}],{% endfor %}];
+            function update() {
+                var z = map.getZoom();
+                bands.forEach(function(b) {
+                    var show = z >= b[0] && z <= b[1];
+                    if (show && !map.hasLayer(b[2])) { map.addLayer(b[2]); }
+                    if (!show && map.hasLayer(b[2])) { map.removeLayer(b[2]); }
+                });
+            }
+            map.on('zoomend', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, bands):
+        super().__init__()
+        self._name = "ZoomBands"
+        self.bands = bands
+
+
+def pixel_degrees(zoom):
+    # Width of one web-mercator tile pixel in degrees of longitude
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def simplify_lines(geoms, tolerance, precision=COORD_PRECISION):
+    """
+    Vectorized Douglas-Peucker simplification of line geometries, snapped to
+    precision decimals. Lines that collapse below the tolerance are dropped.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    geoms = geoms[~shapely.is_missing(geoms)]
+    simplified = shapely.simplify(geoms, tolerance, preserve_topology=False)
+    simplified = shapely.set_precision(simplified, 10.0 ** -precision)
+    keep = ~shapely.is_empty(simplified) & (shapely.length(simplified) >= tolerance)
+    return simplified[keep]
+
+
+def lines_geojson(lines, precision=COORD_PRECISION):
+    # All (already simplified) lines as a single MultiLineString feature: one layer, no per-road overhead
+    coords, index = shapely.get_coordinates(shapely.get_parts(lines), return_index=True)
+    coords = np.round(coords, precision)
+    splits = np.flatnonzero(np.diff(index)) + 1
+    parts = [c.tolist() for c in np.split(coords, splits)] if len(coords) else []
+    return {
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "properties": {},
+                      "geometry": {"type": "MultiLineString", "coordinates": parts}}],
+    }
+
+
+def estimated_bytes(lines, precision=COORD_PRECISION):
+    # Serialized size without serializing: about precision + 4 characters per number plus separators
+    return int(shapely.get_num_coordinates(lines).sum() * (2 * (precision + 4) + 4) + len(lines) * 4)
+
+
+def capped_lines_geojson(geoms, zoom, max_bytes=MAX_LAYER_BYTES):
+    """
+    GeoJSON of geoms simplified to half a pixel at zoom. When the estimated
+    size is over max_bytes the tolerance is doubled until it fits.
+    Returns (geojson, tolerance, size in bytes).
+    """
+    tolerance = pixel_degrees(zoom) / 2
+    lines = simplify_lines(geoms, tolerance)
+    while estimated_bytes(lines) > max_bytes and len(lines):
+        tolerance *= 2
+        lines = simplify_lines(geoms, tolerance)
+    geojson = lines_geojson(lines)
+    return geojson, tolerance, len(json.dumps(geojson, separators=(",", ":")))
+
+
+def add_road_layers(m, geoms, bands=ZOOM_BANDS, max_bytes=MAX_LAYER_BYTES, color="blue", weight=1):
+    """
+    Adds one merged road layer per zoom band to the folium map m, each
+    simplified for the highest zoom of its band and capped at max_bytes.
+    Bands past the first one that hits the cap share its layer.
+    Returns [(min zoom, max zoom, tolerance, bytes)] per layer.
+    """
+    bands_out = []
+    for lo, hi in bands:
+        if bands_out and bands_out[-1][2] > pixel_degrees(bands_out[-1][1]) / 2:
+            # The previous band was already coarsened to fit the cap. Tolerances double per zoom
+            # level, so a finer band would be capped to the same geometry: extend that layer instead
+            bands_out[-1][1] = hi
+            continue
+        geojson, tolerance, size = capped_lines_geojson(geoms, hi, max_bytes)
+        bands_out.append([lo, hi, tolerance, size, geojson])
+
+    layers = []
+    for lo, hi, tolerance, size, geojson in bands_out:
+        layer = folium.GeoJson(geojson, name=f"Roads (zoom {lo}-{hi})", control=False,
+                               style_function=lambda x: {"color": color, "weight": weight})
+        layer.add_to(m)
+        layers.append((lo, hi, layer.get_name()))
+    ZoomBands(layers).add_to(m)
+    return [(lo, hi, tolerance, size) for lo, hi, tolerance, size, _ in bands_out]
+
+
+def add_poi_clusters(m, pois):
+    """
+    Adds POIs (lat, lon, risk_score, amenity columns) as one client-side
+    marker cluster. Only the raw rows are embedded, the markers are built
+    in the browser.
+    """
+    rows = np.column_stack([
+        np.round(pois["lat"].to_numpy(dtype=np.float64), COORD_PRECISION),
+        np.round(pois["lon"].to_numpy(dtype=np.float64), COORD_PRECISION),
+        np.round(pois["risk_score"].to_numpy(dtype=np.float64), 3),
+    ]).tolist()
+    amenities = pois["amenity"].fillna("N/A").astype(str).tolist() if "amenity" in pois.columns else ["N/A"] * len(rows)
+    data = [row + [amenity] for row, amenity in zip(rows, amenities)]
+    FastMarkerCluster(data, callback=POI_CALLBACK, name="POIs", disableClusteringAtZoom=14).add_to(m)
+
+
+def simplify_route(latlons, max_points=MAX_ROUTE_POINTS, zoom=14):
+    """
+    Route (lat, lon) points simplified to half a pixel at zoom. When more
+    than max_points remain, the tolerance is bisected to the smallest one
+    that fits. Endpoints are kept.
+    """
+    if len(latlons) <= 2:
+        return [tuple(p) for p in latlons]
+    line = shapely.linestrings(np.asarray(latlons, dtype=np.float64)[:, ::-1])
+
+    def simplified(tolerance):
+        return shapely.get_coordinates(shapely.simplify(line, tolerance, preserve_topology=False))
+
+    low = pixel_degrees(zoom) / 2
+    coords = simplified(low)
+    if len(coords) > max_points:
+        high = low * 2
+        while len(simplified(high)) > max_points:
+            low, high = high, high * 2
+        for _ in range(20):
+            mid = (low + high) / 2
+            low, high = (mid, high) if len(simplified(mid)) > max_points else (low, mid)
+        coords = simplified(high)
+    coords = np.round(coords, COORD_PRECISION)
+    return [(lat, lon) for lon, lat in coords.tolist()]
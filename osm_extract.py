@@ -0,0 +1,346 @@
+# osm_extract.py
+import glob
+import json
+import math
+import os
+import shutil
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from bayesian_risk import compute_risk_score
+from geo_store import write_geo_table
+from graph_snapshot import EARTH_RADIUS_M, SNAPSHOT_DIR, compile_graph
+from utils import AMENITY_WEIGHTS, UTTARAKHAND_BBOX
+
+TILES_DIR = "osm_tiles"
+TILE_SIZE_DEG = 0.5
+# Rows buffered per output file before they are appended to its CSV
+CHUNK_ROWS = 50_000
+# Drive-way node references buffered in memory before they are appended to their cells' files
+REF_CHUNK = 1_000_000
+# Cells of reference counts held in memory at once while tiles are written (a tile and its neighbours)
+MAX_LOADED_CELLS = 9
+POI_COLUMNS = ["id", "amenity", "geometry", "risk_score"]
+
+# Highway values kept for the drive network, following OSMnx's "drive" filter
+DRIVE_HIGHWAYS = {
+    "motorway", "motorway_link", "trunk", "trunk_link", "primary", "primary_link",
+    "secondary", "secondary_link", "tertiary", "tertiary_link", "unclassified",
+    "residential", "living_street", "road", "service",
+}
+EXCLUDED_SERVICE = {"parking", "parking_aisle", "driveway", "private", "emergency_access"}
+EXCLUDED_ACCESS = {"private", "no"}
+RELIEF_AMENITIES = set(AMENITY_WEIGHTS)
+
+
+def is_drive_way(tags):
+    # Same tag filter for every pass, so tiles agree on which ways form the network
+    if tags.get("highway") not in DRIVE_HIGHWAYS or tags.get("area") == "yes":
+        return False
+    if tags.get("access") in EXCLUDED_ACCESS or tags.get("motor_vehicle") == "no":
+        return False
+    return tags.get("service") not in EXCLUDED_SERVICE
+
+
+def tile_grid(bbox=UTTARAKHAND_BBOX, tile_size=TILE_SIZE_DEG):
+    # {tile id: (min lon, min lat, max lon, max lat)} covering bbox
+    nx = math.ceil((bbox[2] - bbox[0]) / tile_size)
+    ny = math.ceil((bbox[3] - bbox[1]) / tile_size)
+    return {
+        f"{ix}_{iy}": (bbox[0] + ix * tile_size, bbox[1] + iy * tile_size,
+                       min(bbox[0] + (ix + 1) * tile_size, bbox[2]), min(bbox[1] + (iy + 1) * tile_size, bbox[3]))
+        for ix in range(nx) for iy in range(ny)
+    }
+
+
+def tile_of(lon, lat, bbox=UTTARAKHAND_BBOX, tile_size=TILE_SIZE_DEG):
+    # Id of the tile_grid tile holding a point, or None outside bbox. Tiles are half-open on the
+    # max side, so a point on a shared border belongs to exactly one tile.
+    if not (bbox[0] <= lon < bbox[2] and bbox[1] <= lat < bbox[3]):
+        return None
+    return f"{int((lon - bbox[0]) // tile_size)}_{int((lat - bbox[1]) // tile_size)}"
+
+
+class ChunkedCsv:
+    # Appends rows to a CSV in chunks of CHUNK_ROWS, so output never piles up in memory
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.rows = []
+        self.count = 0
+        pd.DataFrame(columns=columns).to_csv(path, index=False)
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= CHUNK_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            pd.DataFrame(self.rows, columns=self.columns).to_csv(self.path, mode="a", header=False, index=False)
+            self.count += len(self.rows)
+            self.rows = []
+
+
+class RefCounts:
+    """
+    How many drive ways reference each node, kept on disk. References are
+    bucketed by the tile-grid cell of the node's location (the grid carries on
+    past bbox), appended to one file per cell during the pass, and reduced to
+    sorted (ids, counts) per cell afterwards. Lookups load at most
+    MAX_LOADED_CELLS cells, so memory depends on the tile size, not the size
+    of the extract.
+    """
+
+    def __init__(self, ref_dir, bbox, tile_size):
+        self.ref_dir = ref_dir
+        self.bbox = bbox
+        self.tile_size = tile_size
+        os.makedirs(ref_dir, exist_ok=True)
+        self.buffers = {}
+        self.buffered = 0
+        self.loaded = OrderedDict()
+
+    def cell(self, lon, lat):
+        return math.floor((lon - self.bbox[0]) / self.tile_size), math.floor((lat - self.bbox[1]) / self.tile_size)
+
+    def _path(self, cell, suffix):
+        return os.path.join(self.ref_dir, f"{cell[0]}_{cell[1]}{suffix}")
+
+    def add(self, ref, lon, lat):
+        self.buffers.setdefault(self.cell(lon, lat), []).append(ref)
+        self.buffered += 1
+        if self.buffered >= REF_CHUNK:
+            self.flush()
+
+    def flush(self):
+        for cell, refs in self.buffers.items():
+            with open(self._path(cell, ".bin"), "ab") as f:
+                np.asarray(refs, dtype=np.int64).tofile(f)
+        self.buffers = {}
+        self.buffered = 0
+
+    def finish(self):
+        # Replaces each cell's raw references by its sorted node ids and their counts, one cell at a time
+        self.flush()
+        for path in glob.glob(os.path.join(self.ref_dir, "*.bin")):
+            ids, counts = np.unique(np.fromfile(path, dtype=np.int64), return_counts=True)
+            base = path[:-len(".bin")]
+            np.save(f"{base}.ids.npy", ids)
+            np.save(f"{base}.counts.npy", counts)
+            os.remove(path)
+
+    def _load(self, cell):
+        if cell in self.loaded:
+            self.loaded.move_to_end(cell)
+            return self.loaded[cell]
+        if os.path.exists(self._path(cell, ".ids.npy")):
+            table = np.load(self._path(cell, ".ids.npy")), np.load(self._path(cell, ".counts.npy"))
+        else:
+            table = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        self.loaded[cell] = table
+        while len(self.loaded) > MAX_LOADED_CELLS:
+            self.loaded.popitem(last=False)
+        return table
+
+    def counts(self, refs, coords):
+        # Reference counts of a way's nodes, given with their (lon, lat)
+        refs = np.asarray(refs, dtype=np.int64)
+        cells = [self.cell(lon, lat) for lon, lat in coords]
+        out = np.zeros(len(refs), dtype=np.int64)
+        for cell in set(cells):
+            ids, counts = self._load(cell)
+            if not len(ids):
+                continue
+            idx = np.array([i for i, c in enumerate(cells) if c == cell])
+            pos = np.minimum(np.searchsorted(ids, refs[idx]), len(ids) - 1)
+            out[idx] = np.where(ids[pos] == refs[idx], counts[pos], 0)
+        return out.tolist()
+
+    def close(self):
+        self.loaded.clear()
+        shutil.rmtree(self.ref_dir, ignore_errors=True)
+
+
+def _line_length_m(coords):
+    lon = np.radians([c[0] for c in coords])
+    lat = np.radians([c[1] for c in coords])
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    return float((2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).sum())
+
+
+def _wkt_line(coords):
+    return "LINESTRING (" + ", ".join(f"{lon:.7f} {lat:.7f}" for lon, lat in coords) + ")"
+
+
+def _collect_tiles(pbf_path, tile_dirs, bbox, tile_size, index_path, ref_counts):
+    """
+    The one streaming pass over the file, with a disk-backed node location
+    index built once for all tiles. Each drive way is spilled to
+    <tile dir>/ways.jsonl of the tile of its first node (as node ids,
+    coordinates and oneway tag) and each relief POI is appended to its
+    tile's pois.csv, for the tiles in tile_dirs only. Node references of
+    every drive way in the extract are spilled to ref_counts (RefCounts)
+    along the way, so roads are split at shared nodes even across tile borders.
+    Returns {tile id: POI count}.
+    """
+    import osmium
+
+    class Collector(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.ways = {t: open(os.path.join(d, "ways.jsonl"), "w") for t, d in tile_dirs.items()}
+            self.pois = {t: ChunkedCsv(os.path.join(d, "pois.csv"), POI_COLUMNS) for t, d in tile_dirs.items()}
+
+        def tile(self, location):
+            tile_id = tile_of(location.lon, location.lat, bbox, tile_size)
+            return tile_id if tile_id in self.ways else None
+
+        def node(self, n):
+            amenity = n.tags.get("amenity")
+            if amenity in RELIEF_AMENITIES:
+                tile_id = self.tile(n.location)
+                if tile_id is not None:
+                    wkt = f"POINT ({n.location.lon:.7f} {n.location.lat:.7f})"
+                    self.pois[tile_id].append((n.id, amenity, wkt, compute_risk_score(amenity)))
+
+        def way(self, w):
+            tags = w.tags
+            amenity = tags.get("amenity")
+            drive = is_drive_way(tags)
+            if not drive and amenity not in RELIEF_AMENITIES:
+                return
+            nodes = w.nodes
+            if drive:
+                # Nodes without a location cannot be in a spilled way, so their references are not needed
+                for n in nodes:
+                    if n.location.valid():
+                        ref_counts.add(n.ref, n.location.lon, n.location.lat)
+            if len(nodes) < 2 or not nodes[0].location.valid():
+                return
+            tile_id = self.tile(nodes[0].location)
+            if tile_id is None:
+                return
+            coords = [(n.location.lon, n.location.lat) for n in nodes if n.location.valid()]
+            if drive and len(coords) == len(nodes):
+                way = [[n.ref for n in nodes], coords, tags.get("oneway", "no")]
+                self.ways[tile_id].write(json.dumps(way) + "\n")
+            if amenity in RELIEF_AMENITIES and len(coords) >= 4 and nodes[0].ref == nodes[-1].ref:
+                wkt = shapely.to_wkt(shapely.Polygon(coords), rounding_precision=7)
+                self.pois[tile_id].append((w.id, amenity, wkt, compute_risk_score(amenity)))
+
+    handler = Collector()
+    try:
+        handler.apply_file(pbf_path, locations=True, idx=f"sparse_file_array,{index_path}")
+    finally:
+        for f in handler.ways.values():
+            f.close()
+    for pois_out in handler.pois.values():
+        pois_out.flush()
+    ref_counts.finish()
+    return {t: pois_out.count for t, pois_out in handler.pois.items()}
+
+
+def _write_tile(out_dir, ref_counts):
+    """
+    Turns a tile's spilled ways into roads.csv and locations.csv
+    (generate_datasets.py layouts), plus GeoParquet copies of those and
+    pois.csv. Ways are split into roads at every node shared with another
+    drive way, as in an OSMnx graph; two-way roads get a row per direction.
+    Ways are read back one line at a time, so memory is bounded by the
+    tile's nodes. Returns (roads, nodes) row counts.
+    """
+    roads_out = ChunkedCsv(os.path.join(out_dir, "roads.csv"), ["u", "v", "length", "geometry"])
+    nodes = {}
+    ways_path = os.path.join(out_dir, "ways.jsonl")
+    with open(ways_path) as f:
+        for line in f:
+            refs, coords, oneway = json.loads(line)
+            counts = ref_counts.counts(refs, coords)
+            start = 0
+            for i in range(1, len(refs)):
+                if i < len(refs) - 1 and counts[i] < 2:
+                    continue
+                segment = coords[start:i + 1]
+                length = _line_length_m(segment)
+                if oneway != "-1":
+                    roads_out.append((refs[start], refs[i], length, _wkt_line(segment)))
+                if oneway not in ("yes", "true", "1"):
+                    roads_out.append((refs[i], refs[start], length, _wkt_line(segment[::-1])))
+                for j in (start, i):
+                    nodes[refs[j]] = (coords[j], counts[j])
+                start = i
+    roads_out.flush()
+    os.remove(ways_path)
+
+    locations_out = ChunkedCsv(os.path.join(out_dir, "locations.csv"), ["osmid", "y", "x", "street_count", "geometry"])
+    for osmid, ((lon, lat), count) in nodes.items():
+        locations_out.append((osmid, lat, lon, count, f"POINT ({lon:.7f} {lat:.7f})"))
+    locations_out.flush()
+
+    # Tiles are small enough to convert whole; the merged files stay CSV-only
+    for name in ("roads", "locations", "pois"):
+        write_geo_table(pd.read_csv(os.path.join(out_dir, f"{name}.csv")), os.path.join(out_dir, f"{name}.parquet"))
+    return roads_out.count, locations_out.count
+
+
+def extract_pbf(pbf_path, tiles_dir=TILES_DIR, bbox=UTTARAKHAND_BBOX, tile_size=TILE_SIZE_DEG, only=None):
+    """
+    Extracts every tile of bbox (or only the tile ids in only) from a local
+    .osm.pbf file into tiles_dir/<tile id>/ as roads.csv, locations.csv and
+    pois.csv (generate_datasets.py / add_pois.py layouts) plus GeoParquet
+    copies. Ways belong to the tile of their first node. All tiles come from
+    a single pass over the file (_collect_tiles); re-extracting some tiles
+    makes the same pass and replaces just those tiles' files.
+    """
+    tiles = tile_grid(bbox, tile_size)
+    tile_dirs = {tile_id: os.path.join(tiles_dir, tile_id) for tile_id in tiles if not only or tile_id in only}
+    for out_dir in tile_dirs.values():
+        os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(tiles_dir, "locations.idx")
+    ref_counts = RefCounts(os.path.join(tiles_dir, "refs"), bbox, tile_size)
+    try:
+        try:
+            poi_counts = _collect_tiles(pbf_path, tile_dirs, bbox, tile_size, index_path, ref_counts)
+        finally:
+            if os.path.exists(index_path):
+                os.remove(index_path)
+        for tile_id, out_dir in tile_dirs.items():
+            roads, nodes = _write_tile(out_dir, ref_counts)
+            print(f"Tile {tile_id}: {roads} roads, {nodes} nodes, {poi_counts[tile_id]} POIs")
+    finally:
+        ref_counts.close()
+    return tiles
+
+
+def merge_tiles(tiles_dir=TILES_DIR, roads_path="roads.csv", locations_path="locations.csv", pois_path="pois.csv"):
+    """
+    Concatenates the tile CSVs into the top-level files, one chunk at a time.
+    Nodes on tile borders appear in several tiles; compile_graph keeps one.
+    Stale GeoParquet copies of the outputs are removed so the loaders read the new CSVs.
+    """
+    for name, out_path in (("roads", roads_path), ("locations", locations_path), ("pois", pois_path)):
+        parquet = os.path.splitext(out_path)[0] + ".parquet"
+        if os.path.exists(parquet):
+            os.remove(parquet)
+        header = True
+        for path in sorted(glob.glob(os.path.join(tiles_dir, "*", f"{name}.csv"))):
+            for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS):
+                chunk.to_csv(out_path, mode="w" if header else "a", header=header, index=False)
+                header = False
+
+
+def main(pbf_path, only=None):
+    extract_pbf(pbf_path, only=only)
+    merge_tiles()
+    snapshot = compile_graph("roads.csv", "locations.csv", SNAPSHOT_DIR)
+    print(f"✅ Graph snapshot saved to {SNAPSHOT_DIR}/ ({snapshot.num_nodes} nodes, {snapshot.num_edges} edges)")
+
+
+if __name__ == "__main__":
+    # Usage: python osm_extract.py extract.osm.pbf [tile_id ...]
+    main(sys.argv[1], sys.argv[2:] or None)
@@ -0,0 +1,174 @@
+# pareto.py
+import json
+import os
+
+import numpy as np
+
+from edge_costs import RISK_SCALE
+from graph_snapshot import SNAPSHOT_DIR, load_snapshot
+from route_engine import RouteResult, bidirectional_dijkstra
+from snapping import snap
+from utils import DISTRICT_CENTROIDS
+
+FRONTIER_FILE = "pareto_frontiers.npz"
+
+
+def pareto_frontier(snapshot, source, target, max_points=64, tol=1e-9):
+    """
+    Supported Pareto-optimal routes on (distance, risk) between two node indices,
+    found by recursive weighted-sum splitting. These are exactly the routes that
+    are optimal for some alpha/beta setting of Cost = alpha * Distance + beta * Risk.
+    Returns a list of (length, risk, edges) sorted by increasing length.
+    """
+    length = np.asarray(snapshot.edge_length, dtype=np.float64)
+    risk = np.asarray(snapshot.edge_risk, dtype=np.float64)
+    # Normalise both criteria so the weights used for splitting are well conditioned
+    length_unit = length.mean() if length.size and length.mean() > 0 else 1.0
+    risk_unit = risk.mean() if risk.size and risk.mean() > 0 else 1.0
+    length_n, risk_n = length / length_unit, risk / risk_unit
+
+    def solve(w_length, w_risk):
+        route = bidirectional_dijkstra(snapshot, w_length * length_n + w_risk * risk_n, source, target)
+        if route is None:
+            return None
+        edges = np.asarray(route.edges, dtype=np.int64)
+        return (float(length_n[edges].sum()), float(risk_n[edges].sum()), route.edges)
+
+    # Extremes, with a tiny tie-breaking weight on the other criterion
+    shortest = solve(1.0, 1e-6)
+    if shortest is None:
+        return []
+    safest = solve(1e-6, 1.0)
+    points = [shortest, safest]
+
+    stack = [(shortest, safest)]
+    while stack and len(points) < max_points:
+        a, b = stack.pop()
+        if a[0] >= b[0] - tol or b[1] >= a[1] - tol:
+            continue
+        # Weight vector normal to the segment a-b; a new point must lie strictly below it
+        w_length, w_risk = a[1] - b[1], b[0] - a[0]
+        c = solve(w_length, w_risk)
+        if w_length * c[0] + w_risk * c[1] < w_length * a[0] + w_risk * a[1] - tol * (w_length + w_risk):
+            points.append(c)
+            stack.append((a, c))
+            stack.append((c, b))
+
+    # Keep the non-dominated points, sorted by length
+    points.sort(key=lambda p: (p[0], p[1]))
+    frontier = []
+    for p in points:
+        if not frontier or p[1] < frontier[-1][1] - tol:
+            frontier.append(p)
+    return [(p[0] * length_unit, p[1] * risk_unit, p[2]) for p in frontier]
+
+
+def build_frontiers(snapshot, nodes, max_points=64):
+    # Frontiers for every ordered pair of distinct node indices, keyed by (source, target)
+    frontiers = {}
+    for s in nodes:
+        for t in nodes:
+            if s != t:
+                frontiers[(s, t)] = pareto_frontier(snapshot, s, t, max_points)
+    return frontiers
+
+
+def save_frontiers(frontiers, snapshot, path=None):
+    """
+    Persists frontiers next to the graph snapshot as flat arrays, stamped with
+    the snapshot's risk version so they are rebuilt when edge risk changes.
+    """
+    path = path or os.path.join(snapshot.path or SNAPSHOT_DIR, FRONTIER_FILE)
+    pairs, point_offsets, lengths, risks, path_offsets, path_edges = [], [0], [], [], [0], []
+    for (s, t), frontier in frontiers.items():
+        pairs.append((s, t))
+        for length, risk, edges in frontier:
+            lengths.append(length)
+            risks.append(risk)
+            path_edges.extend(edges)
+            path_offsets.append(len(path_edges))
+        point_offsets.append(len(lengths))
+    # Written to a temporary file and moved into place, so readers never see a partial archive
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            pairs=np.asarray(pairs, dtype=np.int64).reshape(-1, 2),
+            point_offsets=np.asarray(point_offsets, dtype=np.int64),
+            lengths=np.asarray(lengths, dtype=np.float64),
+            risks=np.asarray(risks, dtype=np.float64),
+            path_offsets=np.asarray(path_offsets, dtype=np.int64),
+            path_edges=np.asarray(path_edges, dtype=np.int64),
+            version=np.array(json.dumps({"risk_version": snapshot.risk_version()})),
+        )
+    os.replace(tmp, path)
+    return path
+
+
+def load_frontiers(snapshot, path=None):
+    """
+    Loads persisted frontiers as {(source, target): (lengths, risks, [edges, ...])}.
+    Returns None when the file is missing or was built for different edge risk.
+    """
+    path = path or os.path.join(snapshot.path or SNAPSHOT_DIR, FRONTIER_FILE)
+    if not os.path.exists(path):
+        return None
+    data = np.load(path)
+    if json.loads(str(data["version"])).get("risk_version") != snapshot.risk_version():
+        return None
+    point_offsets, path_offsets, path_edges = data["point_offsets"], data["path_offsets"], data["path_edges"]
+    lengths, risks = data["lengths"], data["risks"]
+    frontiers = {}
+    for i, (s, t) in enumerate(data["pairs"].tolist()):
+        lo, hi = point_offsets[i], point_offsets[i + 1]
+        paths = [path_edges[path_offsets[p]:path_offsets[p + 1]].tolist() for p in range(lo, hi)]
+        frontiers[(s, t)] = (lengths[lo:hi], risks[lo:hi], paths)
+    return frontiers
+
+
+def ensure_frontiers(snapshot, nodes, path=None, max_points=64):
+    # Loads the stored frontiers, rebuilding them only when missing, stale or lacking a pair
+    frontiers = load_frontiers(snapshot, path)
+    wanted = {(s, t) for s in nodes for t in nodes if s != t}
+    if frontiers is not None and wanted <= frontiers.keys():
+        return frontiers
+    save_frontiers(build_frontiers(snapshot, nodes, max_points), snapshot, path)
+    return load_frontiers(snapshot, path)
+
+
+def frontier_route(frontiers, snapshot, source, target, alpha=0.7, beta=0.3, risk_scale=RISK_SCALE):
+    """
+    Answers an alpha/beta query by scanning the stored frontier of the pair.
+    Returns a RouteResult, or None when the pair was not precomputed or has no route.
+    """
+    entry = frontiers.get((source, target)) if frontiers else None
+    if entry is None or len(entry[0]) == 0:
+        return None
+    lengths, risks, paths = entry
+    costs = alpha * lengths + (beta * risk_scale) * risks
+    best = int(np.argmin(costs))
+    edges = paths[best]
+    nodes = [source] + snapshot.edge_target[edges].tolist()
+    return RouteResult(nodes, edges, float(costs[best]), float(lengths[best]))
+
+
+def district_nodes(snapshot):
+    # Graph nodes nearest to each district centroid, in DISTRICT_CENTROIDS order
+    lats, lons = zip(*DISTRICT_CENTROIDS.values())
+    return snap(snapshot, lats, lons).tolist()
+
+
+def build_district_frontiers(snapshot_dir=SNAPSHOT_DIR, max_points=64):
+    # Pipeline stage: rebuilds the frontiers between every pair of districts
+    snapshot = load_snapshot(snapshot_dir)
+    save_frontiers(build_frontiers(snapshot, district_nodes(snapshot), max_points), snapshot)
+    return load_frontiers(snapshot)
+
+
+if __name__ == "__main__":
+    snapshot = load_snapshot(SNAPSHOT_DIR)
+    nodes = district_nodes(snapshot)
+    print(f"Building distance-risk Pareto frontiers for {len(nodes)} districts...")
+    frontiers = ensure_frontiers(snapshot, nodes)
+    sizes = [len(f[0]) for f in frontiers.values()]
+    print(f"✅ {len(frontiers)} frontiers up to date ({sum(sizes)} routes, max {max(sizes)} per pair)")
@@ -0,0 +1,161 @@
+# pipeline.py
+import ast
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+STATE_FILE = ".pipeline_state.json"
+
+# The one POI table every stage uses: the pois stage writes it, the others read it
+POIS_PATH = "pois.csv"
+POIS_PARQUET = os.path.splitext(POIS_PATH)[0] + ".parquet"
+
+# func is "module:function" so that stage modules are only imported when the stage runs.
+# Inputs list both the CSV and its GeoParquet copy, since the loaders read whichever is newer.
+# The stage's module and every local module it imports are part of its key (see local_modules).
+Stage = namedtuple("Stage", ["name", "func", "inputs", "outputs", "params"])
+
+STAGES = [
+    Stage("datasets", "generate_datasets:download_datasets", [],
+          ["roads.csv", "locations.csv", "roads.parquet", "locations.parquet"],
+          {"place": "Uttarakhand, India", "roads_path": "roads.csv", "locations_path": "locations.csv"}),
+    Stage("pois", "add_pois:extract_pois", [], [POIS_PATH, POIS_PARQUET],
+          {"place": "Uttarakhand, India", "out_path": POIS_PATH}),
+    Stage("graph_snapshot", "graph_snapshot:compile_graph",
+          ["roads.csv", "locations.csv", "roads.parquet", "locations.parquet"],
+          ["graph_snapshot/meta.json"],
+          {"roads_path": "roads.csv", "locations_path": "locations.csv", "out_dir": "graph_snapshot"}),
+    Stage("snapping", "snapping:snap_pois_file", ["graph_snapshot/meta.json", POIS_PATH, POIS_PARQUET],
+          ["graph_snapshot/node_kdtree.pkl"], {"snapshot_dir": "graph_snapshot", "pois_path": POIS_PATH}),
+    Stage("risk", "bayesian_risk:run_bayesian_risk", [POIS_PATH, POIS_PARQUET],
+          ["bayesian_risk_summary.csv", "bayesian_risk_by_amenity.csv", "bayesian_risk_by_district.csv"],
+          {"pois_path": POIS_PATH, "summary_path": "bayesian_risk_summary.csv",
+           "amenity_summary_path": "bayesian_risk_by_amenity.csv",
+           "district_summary_path": "bayesian_risk_by_district.csv"}),
+    Stage("summaries", "bayesian_model:run_bayesian_priority_model", [POIS_PATH, POIS_PARQUET],
+          ["bayesian_trace.nc", "bayesian_priority_by_district.csv"],
+          {"pois_path": POIS_PATH, "trace_path": "bayesian_trace.nc",
+           "district_summary_path": "bayesian_priority_by_district.csv"}),
+    Stage("hazard_risk", "hazard_risk:build_risk_layer", ["graph_snapshot/meta.json"],
+          ["graph_snapshot/edge_risk.npy"], {"snapshot_dir": "graph_snapshot"}),
+    Stage("pareto", "pareto:build_district_frontiers", ["graph_snapshot/meta.json", "graph_snapshot/edge_risk.npy"],
+          ["graph_snapshot/pareto_frontiers.npz"], {"snapshot_dir": "graph_snapshot"}),
+    Stage("maps", "visualize_map:render_map", [POIS_PATH, POIS_PARQUET, "roads.csv", "roads.parquet"],
+          ["map.html"],
+          {"pois_path": POIS_PATH, "roads_path": "roads.csv", "out_path": "map.html"}),
+]
+
+
+def file_hash(path, cache=None):
+    """
+    SHA-1 of a file's content. cache maps path -> [size, mtime_ns, digest] and
+    lets unchanged files skip re-hashing; it is updated in place.
+    """
+    stat = os.stat(path)
+    if cache is not None:
+        entry = cache.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    if cache is not None:
+        cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return digest.hexdigest()
+
+
+def local_modules(module_path, seen=None):
+    """
+    The module file plus every .py file next to it that it imports, directly
+    or through other local modules (imports inside functions included), sorted.
+    Third-party and standard library imports have no local file and are ignored.
+    """
+    seen = set() if seen is None else seen
+    if module_path in seen or not os.path.exists(module_path):
+        return sorted(seen)
+    seen.add(module_path)
+    with open(module_path, "rb") as f:
+        tree = ast.parse(f.read(), filename=module_path)
+    folder = os.path.dirname(module_path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            local_modules(os.path.join(folder, name.split(".")[0] + ".py"), seen)
+    return sorted(seen)
+
+
+def stage_key(stage, file_cache=None):
+    # Content hash of a stage's code (its module and the local modules it imports), inputs and parameters
+    digest = hashlib.sha1()
+    digest.update(json.dumps([stage.name, stage.func, stage.params], sort_keys=True).encode())
+    module_path = stage.func.split(":")[0] + ".py"
+    for path in local_modules(module_path) + list(stage.inputs):
+        digest.update(path.encode())
+        digest.update(file_hash(path, file_cache).encode() if os.path.exists(path) else b"missing")
+    return digest.hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_FILE):
+    with open(path, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def run_pipeline(stages=STAGES, only=None, force=False, state_path=STATE_FILE):
+    """
+    Runs the stages in order, skipping any stage whose outputs exist and whose
+    code, inputs and parameters hash to the same key as its last successful run.
+    only limits the run to the named stages; force re-runs them regardless.
+    Returns {stage name: "ran" | "skipped"}.
+    """
+    state = load_state(state_path)
+    report = {}
+    for stage in stages:
+        if only and stage.name not in only:
+            continue
+        key = stage_key(stage, state["files"])
+        outputs_exist = all(os.path.exists(p) for p in stage.outputs)
+        if not force and outputs_exist and state["stages"].get(stage.name) == key:
+            print(f"⏭️  {stage.name}: up to date")
+            report[stage.name] = "skipped"
+            continue
+
+        print(f"▶️  {stage.name}: running {stage.func}")
+        for path in stage.outputs:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+        module_name, func_name = stage.func.split(":")
+        start = time.perf_counter()
+        getattr(importlib.import_module(module_name), func_name)(**stage.params)
+        print(f"✅ {stage.name}: done in {time.perf_counter() - start:.1f}s")
+
+        # Re-keyed after the run, since a stage may update its own inputs; persisted after every stage
+        state["stages"][stage.name] = stage_key(stage, state["files"])
+        save_state(state, state_path)
+        report[stage.name] = "ran"
+    save_state(state, state_path)
+    return report
+
+
+if __name__ == "__main__":
+    # Usage: python pipeline.py [--force] [stage ...]
+    args = sys.argv[1:]
+    force = "--force" in args
+    only = [a for a in args if a != "--force"] or None
+    run_pipeline(only=only, force=force)
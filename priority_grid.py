@@ -0,0 +1,164 @@
+# priority_grid.py
+import numpy as np
+import pandas as pd
+import shapely
+
+from data_processing import load_pois
+from geo_store import to_geometry_array
+from utils import AMENITY_WEIGHTS
+
+# Edge of the finest cells in degrees (about 1 km); each coarser level doubles it
+BASE_CELL_DEG = 0.01
+NUM_LEVELS = 7
+# Per-cell aggregates; the first ones roll up by sum, hazard by max
+SUM_COLUMNS = ["poi_count", "amenity_score", "demand"]
+MAX_COLUMNS = ["hazard"]
+
+
+def cell_size(level):
+    return BASE_CELL_DEG * 2 ** level
+
+
+def cell_indices(lon, lat, level=0):
+    # Integer cell coordinates on a global grid anchored at (-180, -90), so cells are stable across datasets
+    size = cell_size(level)
+    ix = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / size).astype(np.int64)
+    iy = np.floor((np.asarray(lat, dtype=np.float64) + 90.0) / size).astype(np.int64)
+    return ix, iy
+
+
+def cell_bounds(ix, iy, level):
+    # (min lon, min lat, max lon, max lat) of cells
+    size = cell_size(level)
+    lon0 = np.asarray(ix) * size - 180.0
+    lat0 = np.asarray(iy) * size - 90.0
+    return lon0, lat0, lon0 + size, lat0 + size
+
+
+def point_hazard(lon, lat, zones):
+    """
+    Hazard severity at each point from hazard zone polygons (hazard_risk.hazard_zones),
+    combining overlapping zones as independent hazards. One bulk STRtree query.
+    """
+    points = shapely.points(np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+    polygons = zones.geometry.to_numpy()
+    severity = zones["severity"].to_numpy(dtype=np.float64)
+    point_idx, zone_idx = shapely.STRtree(polygons).query(points, predicate="within")
+    log_safe = np.zeros(len(points))
+    np.add.at(log_safe, point_idx, np.log1p(-np.minimum(severity[zone_idx], 1.0 - 1e-9)))
+    return -np.expm1(log_safe)
+
+
+def _aggregate(ix, iy, values):
+    # Groups rows by cell; values is a DataFrame aligned with ix/iy
+    frame = values.assign(ix=ix, iy=iy)
+    agg = {c: "sum" for c in SUM_COLUMNS}
+    agg.update({c: "max" for c in MAX_COLUMNS})
+    return frame.groupby(["ix", "iy"], sort=True).agg(agg).reset_index()
+
+
+class PriorityGrid:
+    """
+    Square-grid priority surface at NUM_LEVELS resolutions.
+
+    Points (POIs, demand points) are binned into the finest level in one
+    vectorized pass; every coarser level is rolled up from the level below,
+    never from the raw points. Scores are computed from the cell aggregates
+    at query time, so re-weighting or changing level does not rescan points.
+    """
+
+    def __init__(self, num_levels=NUM_LEVELS):
+        self.num_levels = num_levels
+        self.levels = [self._empty() for _ in range(num_levels)]
+
+    @staticmethod
+    def _empty():
+        return pd.DataFrame({c: pd.Series(dtype=np.int64 if c in ("ix", "iy") else np.float64)
+                             for c in ["ix", "iy"] + SUM_COLUMNS + MAX_COLUMNS})
+
+    def add_points(self, lon, lat, amenity=None, demand=None, hazard=None):
+        """
+        Adds points to the grid. amenity (names, weighted by AMENITY_WEIGHTS),
+        demand and hazard (severity 0-1) are optional per-point arrays.
+        Only the finest level is merged; coarser levels are re-rolled from it.
+        """
+        n = len(lon)
+        values = pd.DataFrame({
+            "poi_count": np.zeros(n) if amenity is None else np.ones(n),
+            "amenity_score": (np.zeros(n) if amenity is None
+                              else pd.Series(amenity).map(AMENITY_WEIGHTS).fillna(0.0).to_numpy(dtype=np.float64)),
+            "demand": np.zeros(n) if demand is None else np.asarray(demand, dtype=np.float64),
+            "hazard": np.zeros(n) if hazard is None else np.asarray(hazard, dtype=np.float64),
+        })
+        ix, iy = cell_indices(lon, lat)
+        fine = _aggregate(ix, iy, values)
+        if len(self.levels[0]):
+            merged = pd.concat([self.levels[0], fine], ignore_index=True)
+            fine = _aggregate(merged["ix"].to_numpy(), merged["iy"].to_numpy(), merged[SUM_COLUMNS + MAX_COLUMNS])
+        self.levels[0] = fine
+        self._roll_up()
+
+    def _roll_up(self):
+        for level in range(1, self.num_levels):
+            finer = self.levels[level - 1]
+            self.levels[level] = _aggregate(finer["ix"].to_numpy() >> 1, finer["iy"].to_numpy() >> 1,
+                                            finer[SUM_COLUMNS + MAX_COLUMNS])
+
+    def level_for_zoom(self, zoom, cell_pixels=32):
+        # Finest level whose cells are at least cell_pixels wide on a web-mercator map at zoom
+        pixel_deg = 360.0 / (256 * 2 ** zoom)
+        level = int(np.ceil(np.log2(max(cell_pixels * pixel_deg / BASE_CELL_DEG, 1.0))))
+        return min(level, self.num_levels - 1)
+
+    def top_cells(self, k=10, level=0, bbox=None, amenity_weight=1.0, demand_weight=0.01, hazard_weight=1.0):
+        """
+        The k highest-priority cells of a level, optionally only those
+        intersecting bbox (min lon, min lat, max lon, max lat).
+        priority = (amenity_weight * amenity_score + demand_weight * demand) * (1 + hazard_weight * hazard)
+        Returns a DataFrame with the cell aggregates, bounds and priority.
+        """
+        cells = self.levels[level]
+        ix, iy = cells["ix"].to_numpy(), cells["iy"].to_numpy()
+        if bbox is not None:
+            lo_x, lo_y = cell_indices(bbox[0], bbox[1], level)
+            hi_x, hi_y = cell_indices(bbox[2], bbox[3], level)
+            inside = (ix >= lo_x) & (ix <= hi_x) & (iy >= lo_y) & (iy <= hi_y)
+            cells, ix, iy = cells[inside], ix[inside], iy[inside]
+        priority = ((amenity_weight * cells["amenity_score"].to_numpy() + demand_weight * cells["demand"].to_numpy())
+                    * (1.0 + hazard_weight * cells["hazard"].to_numpy()))
+        if len(priority) > k:
+            top = np.argpartition(-priority, k - 1)[:k]
+        else:
+            top = np.arange(len(priority))
+        top = top[np.argsort(-priority[top], kind="stable")]
+        lon0, lat0, lon1, lat1 = cell_bounds(ix[top], iy[top], level)
+        return cells.iloc[top].assign(min_lon=lon0, min_lat=lat0, max_lon=lon1, max_lat=lat1,
+                                      priority=priority[top]).reset_index(drop=True)
+
+
+def build_priority_grid(pois, demand=None, zones=None, num_levels=NUM_LEVELS):
+    """
+    Grid from a POI table (pois.csv / pois.parquet: amenity + geometry) and
+    optional demand points (DataFrame with lat, lon, demand). Polygon POIs
+    count at their centroid. zones (hazard_risk.hazard_zones) give each point
+    its hazard severity.
+    """
+    grid = PriorityGrid(num_levels)
+    points = shapely.centroid(to_geometry_array(pois["geometry"]))
+    lon, lat = shapely.get_x(points), shapely.get_y(points)
+    hazard = point_hazard(lon, lat, zones) if zones is not None else None
+    grid.add_points(lon, lat, amenity=pois["amenity"].to_numpy(), hazard=hazard)
+    if demand is not None and len(demand):
+        d_lon, d_lat = demand["lon"].to_numpy(), demand["lat"].to_numpy()
+        d_hazard = point_hazard(d_lon, d_lat, zones) if zones is not None else None
+        grid.add_points(d_lon, d_lat, demand=demand["demand"].to_numpy(), hazard=d_hazard)
+    return grid
+
+
+if __name__ == "__main__":
+    from hazard_risk import hazard_zones
+
+    grid = build_priority_grid(load_pois("pois.csv", columns=["amenity", "geometry"]), zones=hazard_zones())
+    for level in range(grid.num_levels):
+        print(f"Level {level} ({cell_size(level):.2f} deg): {len(grid.levels[level])} cells")
+    print(grid.top_cells(10, level=2))
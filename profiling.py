@@ -0,0 +1,252 @@
+# profiling.py
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# Spans kept for the Diagnostics view and JSON lines export; per-name totals are kept forever
+MAX_RECORDS = 10000
+# AIDROUTE_PROFILE=1 enables timing at import, AIDROUTE_PROFILE=memory also traces allocations
+PROFILE_ENV = "AIDROUTE_PROFILE"
+
+
+class _NullSpan:
+    # Returned while profiling is disabled, so an instrumented block costs one attribute check
+    def count(self, key, n=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    One timed block. counts holds work counters such as nodes_settled or
+    edges_relaxed; peak_bytes is the peak traced allocation above the
+    allocation at entry, or None when memory tracing is off.
+    """
+
+    __slots__ = ("profiler", "name", "start", "duration", "peak_bytes", "counts", "thread",
+                 "_t0", "_base", "_max_peak")
+
+    def __init__(self, profiler, name, counts):
+        self.profiler = profiler
+        self.name = name
+        self.counts = dict(counts)
+        self.peak_bytes = None
+        self.duration = None
+        self._base = None
+        self._max_peak = None
+
+    def count(self, key, n=1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        if self.profiler.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if stack and stack[-1]._base is not None:
+                stack[-1]._max_peak = max(stack[-1]._max_peak, peak)
+            tracemalloc.reset_peak()
+            self._base, self._max_peak = current, current
+        stack.append(self)
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter() - self._t0
+        stack = self.profiler._stack()
+        stack.pop()
+        if self._base is not None and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak_bytes = max(self._max_peak, peak) - self._base
+            if stack and stack[-1]._base is not None:
+                stack[-1]._max_peak = max(stack[-1]._max_peak, peak)
+        self.profiler._record(self)
+        return False
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "start": self.start,
+            "seconds": self.duration,
+            "peak_bytes": self.peak_bytes,
+            "thread": self.thread,
+            "counts": self.counts,
+        }
+
+
+class Profiler:
+    """
+    Process-wide span recorder. span() is a context manager and profiled()
+    a decorator; both are no-ops until enable() is called. Spans nest per
+    thread, and add_counts() adds to the innermost open span of the calling
+    thread. Memory tracing uses tracemalloc, which is process-wide, so peak
+    allocations of spans running concurrently in several threads overlap.
+    """
+
+    def __init__(self, max_records=MAX_RECORDS):
+        self.enabled = False
+        self.memory = False
+        self.records = deque(maxlen=max_records)
+        self.totals = {}
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracing = False
+
+    def enable(self, memory=False):
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self.memory = False
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+            self.totals.clear()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **counts):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, counts)
+
+    def current(self):
+        stack = self._stack() if self.enabled else None
+        return stack[-1] if stack else NULL_SPAN
+
+    def add_counts(self, **counts):
+        span = self.current()
+        for key, n in counts.items():
+            span.count(key, n)
+
+    def _record(self, span):
+        with self.lock:
+            self.records.append(span.as_dict())
+            total = self.totals.setdefault(span.name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                       "max_peak_bytes": 0, "counts": {}})
+            total["calls"] += 1
+            total["seconds"] += span.duration
+            total["max_seconds"] = max(total["max_seconds"], span.duration)
+            if span.peak_bytes is not None:
+                total["max_peak_bytes"] = max(total["max_peak_bytes"], span.peak_bytes)
+            for key, n in span.counts.items():
+                total["counts"][key] = total["counts"].get(key, 0) + n
+
+    def summary(self):
+        """
+        Per span name: calls, total / mean / max / p95 seconds (percentile
+        over the retained records), max peak bytes and summed counters.
+        """
+        with self.lock:
+            records = list(self.records)
+            totals = {name: dict(t, counts=dict(t["counts"])) for name, t in self.totals.items()}
+        durations = {}
+        for r in records:
+            durations.setdefault(r["name"], []).append(r["seconds"])
+        rows = []
+        for name, t in sorted(totals.items(), key=lambda item: -item[1]["seconds"]):
+            recent = sorted(durations.get(name, [0.0]))
+            rows.append({
+                "span": name,
+                "calls": t["calls"],
+                "total_s": t["seconds"],
+                "mean_s": t["seconds"] / t["calls"],
+                "p95_s": recent[min(int(0.95 * len(recent)), len(recent) - 1)],
+                "max_s": t["max_seconds"],
+                "max_peak_mb": t["max_peak_bytes"] / 1e6,
+                **t["counts"],
+            })
+        return rows
+
+    def recent(self, n):
+        # The n most recent retained spans, newest first; copied under the lock while spans keep being recorded
+        with self.lock:
+            records = list(itertools.islice(reversed(self.records), n))
+        return records
+
+    def to_jsonl(self):
+        # One JSON object per retained span, oldest first
+        with self.lock:
+            records = list(self.records)
+        return "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+
+    def to_prometheus(self, prefix="aidroute"):
+        # Cumulative per-span totals in the Prometheus text exposition format
+        with self.lock:
+            totals = {name: dict(t, counts=dict(t["counts"])) for name, t in self.totals.items()}
+        metrics = [
+            ("span_calls_total", "counter", "Completed spans", lambda t: t["calls"]),
+            ("span_seconds_total", "counter", "Time spent in spans", lambda t: t["seconds"]),
+            ("span_seconds_max", "gauge", "Longest single span", lambda t: t["max_seconds"]),
+            ("span_peak_bytes_max", "gauge", "Largest traced peak allocation in a span", lambda t: t["max_peak_bytes"]),
+        ]
+        lines = []
+        for metric, kind, help_text, value in metrics:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, t in sorted(totals.items()):
+                lines.append(f'{prefix}_{metric}{{span="{_label(name)}"}} {value(t)}')
+        lines.append(f"# HELP {prefix}_span_work_total Work counters reported by spans")
+        lines.append(f"# TYPE {prefix}_span_work_total counter")
+        for name, t in sorted(totals.items()):
+            for key, n in sorted(t["counts"].items()):
+                lines.append(f'{prefix}_span_work_total{{span="{_label(name)}",counter="{_label(key)}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+PROFILER = Profiler()
+if os.environ.get(PROFILE_ENV):
+    PROFILER.enable(memory=os.environ[PROFILE_ENV].lower() == "memory")
+
+
+def span(name, **counts):
+    return PROFILER.span(name, **counts)
+
+
+def add_counts(**counts):
+    PROFILER.add_counts(**counts)
+
+
+def profiled(name=None):
+    # Decorator timing every call of a function as a span (named module.function by default)
+    def decorate(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with Span(PROFILER, span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,126 @@
+# reliability.py
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from data_processing import load_roads
+from edge_costs import RISK_SCALE
+from geo_store import original_rows
+from pareto import pareto_frontier
+
+POSTERIOR_FILE = "roads_with_risk.csv"
+NUM_SCENARIOS = 2000
+# Coefficient of variation assumed for edge risk when no posterior std is available
+DEFAULT_RISK_CV = 0.5
+# Extra cost (meters-equivalent detour) charged in scenarios where a route is cut
+CLOSURE_PENALTY = 50_000.0
+
+# One row per candidate route; quantiles are over scenarios, cvar is the mean of the worst (1 - level) share
+RouteReliability = namedtuple("RouteReliability", [
+    "edges", "length", "passable", "cost_mean", "cost_p05", "cost_p50", "cost_p95", "cvar",
+])
+
+
+def edge_posterior(snapshot, roads=None, default_cv=DEFAULT_RISK_CV):
+    """
+    Per-edge (mean, std) of risk, aligned with the snapshot's edge order.
+    roads is a roads table with risk_mean / risk_std columns covering the
+    rows of roads.csv (risk_model.simulate_road_risks output), matched to
+    edges by original row (geo_store.original_rows). Without it, the
+    snapshot's edge_risk is used with a std of default_cv * mean.
+    """
+    if roads is not None and {"risk_mean", "risk_std"} <= set(roads.columns):
+        positions = pd.Index(original_rows(roads)).get_indexer(np.asarray(snapshot.edge_row))
+        if (positions < 0).any():
+            raise ValueError("Road risk table is missing rows of the roads file the snapshot was compiled from")
+        return (roads["risk_mean"].to_numpy(dtype=np.float64)[positions],
+                roads["risk_std"].to_numpy(dtype=np.float64)[positions])
+    mean = np.asarray(snapshot.edge_risk, dtype=np.float64)
+    return mean, default_cv * mean
+
+
+def load_edge_posterior(snapshot, path=POSTERIOR_FILE, default_cv=DEFAULT_RISK_CV):
+    # edge_posterior from the risk_model.py output file when it exists
+    roads = load_roads(path, columns=["risk_mean", "risk_std"]) if os.path.exists(path) else None
+    return edge_posterior(snapshot, roads, default_cv)
+
+
+def beta_parameters(mean, std, eps=1e-6):
+    # Method-of-moments Beta(a, b) per edge; the variance is capped below the Bernoulli maximum
+    mean = np.clip(mean, eps, 1 - eps)
+    var = np.minimum(np.square(std), mean * (1 - mean) * (1 - eps))
+    var = np.maximum(var, eps * eps)
+    concentration = mean * (1 - mean) / var - 1
+    return mean * concentration, (1 - mean) * concentration
+
+
+def sample_scenarios(mean, std, num_scenarios=NUM_SCENARIOS, seed=None):
+    """
+    Draws num_scenarios scenarios for the given edges at once: edge risk
+    from its Beta posterior, and the edge closed with that probability.
+    Returns (risk, closed), both (scenarios x edges).
+    """
+    rng = np.random.default_rng(seed)
+    a, b = beta_parameters(np.asarray(mean, dtype=np.float64), np.asarray(std, dtype=np.float64))
+    risk = rng.beta(a, b, size=(num_scenarios, len(a)))
+    closed = rng.random(risk.shape) < risk
+    return risk, closed
+
+
+def candidate_routes(snapshot, source, target, frontiers=None, max_routes=16):
+    """
+    Candidate routes (edge id lists) between two node indices: the stored
+    distance-risk frontier of the pair (pareto.load_frontiers) when present,
+    otherwise a freshly computed one.
+    """
+    entry = frontiers.get((source, target)) if frontiers else None
+    if entry is not None and len(entry[0]):
+        return [list(edges) for edges in entry[2]]
+    return [edges for _, _, edges in pareto_frontier(snapshot, source, target, max_points=max_routes)]
+
+
+def route_reliability(snapshot, routes, mean, std, alpha=0.7, beta=0.3, num_scenarios=NUM_SCENARIOS,
+                      cvar_level=0.9, closure_penalty=CLOSURE_PENALTY, risk_scale=RISK_SCALE, seed=None):
+    """
+    Evaluates candidate routes (edge id lists) against the same posterior
+    scenarios. Scenarios are drawn only for the union of the routes' edges;
+    a (union edges x routes) incidence matrix then gives every route's
+    sampled risk and closure count in one matrix product each.
+
+    Scenario cost = alpha * length + beta * risk_scale * sampled risk, plus
+    closure_penalty when any edge of the route is closed.
+    Returns a list of RouteReliability, in the order of routes.
+    """
+    if not routes:
+        return []
+    union, inverse = np.unique(np.concatenate([np.asarray(r, dtype=np.int64) for r in routes]), return_inverse=True)
+    incidence = np.zeros((len(union), len(routes)))
+    offsets = np.cumsum([0] + [len(r) for r in routes])
+    for j in range(len(routes)):
+        np.add.at(incidence[:, j], inverse[offsets[j]:offsets[j + 1]], 1.0)
+
+    risk, closed = sample_scenarios(np.asarray(mean)[union], np.asarray(std)[union], num_scenarios, seed)
+    lengths = np.asarray(snapshot.edge_length, dtype=np.float64)[union] @ incidence
+    cut = (closed.astype(np.float64) @ incidence) > 0
+    costs = alpha * lengths + (beta * risk_scale) * (risk @ incidence) + closure_penalty * cut
+
+    tail = max(int(np.ceil(num_scenarios * (1 - cvar_level))), 1)
+    worst = -np.partition(-costs, tail - 1, axis=0)[:tail]
+    p05, p50, p95 = np.percentile(costs, [5, 50, 95], axis=0)
+    return [
+        RouteReliability(list(routes[j]), float(lengths[j]), float(1.0 - cut[:, j].mean()), float(costs[:, j].mean()),
+                         float(p05[j]), float(p50[j]), float(p95[j]), float(worst[:, j].mean()))
+        for j in range(len(routes))
+    ]
+
+
+def robust_route(reliabilities):
+    # Candidate with the lowest CVaR, i.e. the best expected cost over its worst scenarios
+    return min(reliabilities, key=lambda r: r.cvar) if reliabilities else None
+
+
+def reliability_table(reliabilities):
+    # DataFrame view of route_reliability results, one row per candidate, without the edge lists
+    return pd.DataFrame([r._asdict() for r in reliabilities]).drop(columns="edges")
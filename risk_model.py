@@ -1,18 +1,37 @@
 # risk_model.py
-import pandas as pd
 import numpy as np
 import pymc as pm
+from scipy.special import expit
 
-def simulate_road_risks(roads_df):
+from data_processing import load_roads
+from profiling import profiled
+
+@profiled()
+def simulate_road_risks(roads_df, method="advi", draws=1000, tune=1000, chains=2,
+                        batch_size=1024, advi_iterations=20000, chunk_size=4096, random_seed=42):
     """
     Adds Bayesian risk scores to roads_df.
     Uses road length and highway type (encoded) as predictors.
     Returns the dataframe with columns: risk_mean, risk_std
+
+    method="advi" fits minibatch ADVI, so the cost per iteration does not grow
+    with the number of roads; method="nuts" runs NUTS with one process per chain.
+    Only the 4 global parameters are sampled: per-road risk is computed afterwards
+    from the parameter draws in chunks of chunk_size roads, so the full
+    draws x roads probability trace is never held in memory.
     """
-    # Encode highway type (simplified)
-    highway_types = roads_df['highway'].astype('category').cat.codes.values
+    # Encode highway type (simplified); roads.csv from generate_datasets.py has no highway column
+    if 'highway' in roads_df.columns:
+        highway_types = roads_df['highway'].astype('category').cat.codes.values.astype(np.float64)
+    else:
+        highway_types = np.zeros(len(roads_df))
+
+    length_km = roads_df['length'].values.astype(np.float64) / 1000
 
-    length = roads_df['length'].values
+    # Observed data: simulate risks (here we simulate because no real data)
+    # Let's pretend half of roads are risky for demo purposes
+    rng = np.random.default_rng(random_seed)
+    risk_observed = pm.intX(rng.random(len(length_km)) > 0.5)
 
     with pm.Model() as model:
         # Priors
@@ -21,23 +40,37 @@ def simulate_road_risks(roads_df):
         beta_highway = pm.Normal('beta_highway', 0, 1)
         sigma = pm.HalfNormal('sigma', 1)
 
-        # Linear model for log-odds of risk
-        logit_p = alpha + beta_length * (length / 1000) + beta_highway * highway_types
-
-        # Probability of risk (e.g., probability that road is risky)
-        p = pm.Deterministic('p', pm.math.sigmoid(logit_p))
-
-        # Observed data: simulate risks (here we simulate because no real data)
-        # Let's pretend half of roads are risky for demo purposes
-        risk_obs = pm.Bernoulli('risk_obs', p=p, observed=(np.random.rand(len(length)) > 0.5).astype(int))
+        if method == "advi":
+            length_mb, highway_mb, risk_mb = pm.Minibatch(
+                length_km, highway_types, risk_observed, batch_size=min(batch_size, len(length_km))
+            )
+            # Linear model for log-odds of risk, on a minibatch scaled up to the full data set
+            logit_p = alpha + beta_length * length_mb + beta_highway * highway_mb
+            pm.Bernoulli('risk_obs', logit_p=logit_p, observed=risk_mb, total_size=len(length_km))
+            approx = pm.fit(advi_iterations, method='advi', random_seed=random_seed, progressbar=False)
+            trace = approx.sample(draws, random_seed=random_seed)
+        elif method == "nuts":
+            logit_p = alpha + beta_length * length_km + beta_highway * highway_types
+            pm.Bernoulli('risk_obs', logit_p=logit_p, observed=risk_observed)
+            trace = pm.sample(draws, tune=tune, chains=chains, cores=chains,
+                              random_seed=random_seed, progressbar=False)
+        else:
+            raise ValueError(f"Unknown inference method: {method}")
 
-        # Sample posterior
-        trace = pm.sample(1000, tune=1000, chains=2, cores=1, progressbar=False)
+    # Posterior draws of the global parameters, flattened over chains
+    a = trace.posterior['alpha'].values.reshape(-1)
+    b_length = trace.posterior['beta_length'].values.reshape(-1)
+    b_highway = trace.posterior['beta_highway'].values.reshape(-1)
 
-    # Extract posterior mean and std for risk probability p
-    risk_posterior_samples = trace.posterior['p'].stack(samples=("chain", "draw")).values
-    risk_mean = risk_posterior_samples.mean(axis=1)
-    risk_std = risk_posterior_samples.std(axis=1)
+    # Stream over roads: each chunk holds at most chunk_size x draws probabilities
+    risk_mean = np.empty(len(length_km))
+    risk_std = np.empty(len(length_km))
+    for start in range(0, len(length_km), chunk_size):
+        stop = start + chunk_size
+        p = expit(a + np.multiply.outer(length_km[start:stop], b_length)
+                  + np.multiply.outer(highway_types[start:stop], b_highway))
+        risk_mean[start:stop] = p.mean(axis=1)
+        risk_std[start:stop] = p.std(axis=1)
 
     # Add to dataframe
     roads_df = roads_df.copy()
@@ -48,7 +81,7 @@ def simulate_road_risks(roads_df):
 
 if __name__ == "__main__":
     # For standalone testing
-    roads = pd.read_csv('roads.csv')
+    roads = load_roads('roads.csv')
     roads_with_risk = simulate_road_risks(roads)
     roads_with_risk.to_csv('roads_with_risk.csv', index=False)
     print("Roads with Bayesian risk scores saved to roads_with_risk.csv")
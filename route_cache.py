@@ -0,0 +1,146 @@
+# route_cache.py
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+# nodes / edges: node and edge indices; points: simplified (lat, lon) polyline; geojson: the same polyline serialised
+CachedRoute = namedtuple("CachedRoute", ["nodes", "edges", "cost", "length", "points", "geojson"])
+
+
+def graph_stamp(snapshot):
+    # Changes whenever edge risk changes. Road closures are not part of it: they
+    # invalidate only the routes they affect (RouteCache.invalidate_where).
+    return snapshot.risk_version()
+
+
+def route_key(source, target, alpha, beta, stamp):
+    # Slider values are rounded so that float noise does not split cache entries.
+    # The stamp comes first, so keys extended with extra parts still carry it at k[0].
+    return stamp, source, target, round(float(alpha), 6), round(float(beta), 6)
+
+
+def cached_route(route, points):
+    # Builds a cache entry from a RouteResult and its simplified map points
+    geojson = json.dumps({"type": "LineString", "coordinates": [[lon, lat] for lat, lon in points]},
+                         separators=(",", ":"))
+    return CachedRoute(list(route.nodes), [int(e) for e in route.edges], float(route.cost), float(route.length),
+                       points, geojson)
+
+
+def uses_edges(entry, edges):
+    # True when a cached route (or any of a list of alternatives) runs over one of the edge ids
+    if isinstance(entry, CachedRoute):
+        return not edges.isdisjoint(entry.edges)
+    if isinstance(entry, list):
+        return any(uses_edges(e, edges) for e in entry)
+    return False
+
+
+def entry_bytes(entry):
+    # Approximate footprint: serialised geometry plus node ids and point pairs
+    if entry is None:
+        return 64
+    if isinstance(entry, list) and all(isinstance(e, CachedRoute) for e in entry):
+        # Ranked alternative routes
+        return sum(entry_bytes(e) for e in entry)
+    if not isinstance(entry, CachedRoute):
+        # Plain JSON results (routing_service.py) count by their serialised size
+        return 64 + len(json.dumps(entry, separators=(",", ":")))
+    return 64 + len(entry.geojson) + 8 * (len(entry.nodes) + len(entry.edges)) + 16 * len(entry.points)
+
+
+class RouteCache:
+    """
+    Thread-safe LRU cache of route query results, shared by every session
+    in the process. Keys start with a graph stamp, so entries computed before a
+    risk change are never returned. invalidate() drops them eagerly to free
+    their memory; invalidate_where() drops the entries a road closure
+    affects. The cache holds at most max_entries
+    entries and about max_bytes bytes; least recently used entries are
+    evicted first.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64_000_000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stamp = None
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, entry):
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= entry_bytes(self.entries.pop(key))
+            self.entries[key] = entry
+            self.bytes += entry_bytes(entry)
+            while len(self.entries) > self.max_entries or (self.bytes > self.max_bytes and len(self.entries) > 1):
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= entry_bytes(evicted)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Cached value for key, or compute() stored under key on a miss.
+        compute runs outside the lock, so concurrent misses do not block hits.
+        A None result (no route) is cached too.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        entry = compute()
+        self.put(key, entry)
+        return entry
+
+    def ensure_stamp(self, stamp):
+        # Cheap per-request check: stale entries are only scanned for when the stamp changed
+        if stamp != self.stamp:
+            self.invalidate(stamp)
+
+    def invalidate(self, stamp=None):
+        # Drops entries whose key stamp differs from stamp (all entries when stamp is None)
+        with self.lock:
+            self.stamp = stamp
+            stale = [k for k in self.entries if stamp is None or k[0] != stamp]
+            for k in stale:
+                self.bytes -= entry_bytes(self.entries.pop(k))
+            return len(stale)
+
+    def invalidate_where(self, stale):
+        # Drops the entries for which stale(key, entry) is true; returns how many
+        with self.lock:
+            keys = [k for k, entry in self.entries.items() if stale(k, entry)]
+            for k in keys:
+                self.bytes -= entry_bytes(self.entries.pop(k))
+            return len(keys)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Process-wide cache shared by all dashboard sessions
+ROUTE_CACHE = RouteCache()
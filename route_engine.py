@@ -0,0 +1,268 @@
+# route_engine.py
+import heapq
+import weakref
+from collections import namedtuple
+
+import numpy as np
+
+from graph_snapshot import haversine_m
+from profiling import PROFILER
+
+# nodes/edges are snapshot indices; cost is the sum of the request weights, length in meters
+RouteResult = namedtuple("RouteResult", ["nodes", "edges", "cost", "length"])
+
+INF = float("inf")
+
+
+def _count_work(indptr, settled, extra_settled=(), extra_indptr=None):
+    # Reports settled nodes and relaxed edges to the open profiling span; only called while profiling
+    relaxed = sum(indptr[n + 1] - indptr[n] for n in settled)
+    if extra_indptr is not None:
+        relaxed += sum(extra_indptr[n + 1] - extra_indptr[n] for n in extra_settled)
+    PROFILER.add_counts(nodes_settled=len(settled) + len(extra_settled), edges_relaxed=relaxed)
+
+
+def _result(snapshot, weights, source, edges):
+    nodes = [source] + [int(snapshot.edge_target[e]) for e in edges]
+    edges = np.asarray(edges, dtype=np.int64)
+    return RouteResult(nodes, edges.tolist(), float(weights[edges].sum()), float(snapshot.edge_length[edges].sum()))
+
+
+# id(weights array) -> (weak reference to it, the same weights as a Python list)
+_WEIGHT_LISTS = {}
+
+
+def remember_list(weights, values):
+    # Registers values as the list form of the weights array, until the array is garbage collected
+    key = id(weights)
+    _WEIGHT_LISTS[key] = (weakref.ref(weights), values)
+    weakref.finalize(weights, _WEIGHT_LISTS.pop, key, None)
+    return values
+
+
+def _as_list(weights):
+    """
+    Python list of a per-edge weights array for the search loops. The list is
+    built once per array and reused by later searches, so a cost matrix
+    running one search per origin converts its weights once, not per origin.
+    Weights arrays must not be changed in place after a search unless their
+    owner updates the registered list too (closures.RoadClosures does).
+    """
+    if not isinstance(weights, np.ndarray):
+        return weights if isinstance(weights, list) else list(weights)
+    entry = _WEIGHT_LISTS.get(id(weights))
+    if entry is not None and entry[0]() is weights:
+        return entry[1]
+    return remember_list(weights, weights.tolist())
+
+
+def bidirectional_dijkstra(snapshot, weights, source, target):
+    """
+    Shortest path between two node indices, searching forward from the source
+    and backward from the target over the CSR arrays.
+    weights is a per-edge array aligned with the snapshot's edge order.
+    Returns a RouteResult, or None when the target is unreachable.
+    """
+    if source == target:
+        return RouteResult([source], [], 0.0, 0.0)
+    adj = snapshot.adjacency_lists()
+    indptr, target_of = adj["indptr"], adj["edge_target"]
+    rev_indptr, rev_edges, source_of = adj["rev_indptr"], adj["rev_edges"], adj["edge_source"]
+    w = _as_list(weights)
+
+    dist = ({source: 0.0}, {target: 0.0})
+    parent = ({source: -1}, {target: -1})
+    settled = (set(), set())
+    heaps = ([(0.0, source)], [(0.0, target)])
+    best, meet = INF, -1
+
+    while heaps[0] and heaps[1]:
+        # Stop once no path through an unsettled node can beat the best meeting point
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        d, node = heapq.heappop(heaps[side])
+        if node in settled[side]:
+            continue
+        settled[side].add(node)
+        my_dist, other_dist, my_parent = dist[side], dist[1 - side], parent[side]
+        if side == 0:
+            edges = range(indptr[node], indptr[node + 1])
+        else:
+            edges = (rev_edges[i] for i in range(rev_indptr[node], rev_indptr[node + 1]))
+        for e in edges:
+            nbr = target_of[e] if side == 0 else source_of[e]
+            nd = d + w[e]
+            if nd < my_dist.get(nbr, INF):
+                my_dist[nbr] = nd
+                my_parent[nbr] = e
+                heapq.heappush(heaps[side], (nd, nbr))
+            if nbr in other_dist and nd + other_dist[nbr] < best:
+                best, meet = nd + other_dist[nbr], nbr
+
+    if PROFILER.enabled:
+        _count_work(indptr, settled[0], settled[1], rev_indptr)
+    if meet < 0:
+        return None
+    edges = []
+    node = meet
+    while parent[0][node] >= 0:
+        e = parent[0][node]
+        edges.append(e)
+        node = source_of[e]
+    edges.reverse()
+    node = meet
+    while parent[1][node] >= 0:
+        e = parent[1][node]
+        edges.append(e)
+        node = target_of[e]
+    return _result(snapshot, weights, source, edges)
+
+
+def heuristic_scale(snapshot, weights=None, alpha=None):
+    """
+    Largest factor k such that k * great-circle distance never exceeds the cost
+    of any edge, which keeps the A* heuristic admissible and consistent.
+    With alpha given, k = alpha * min(length / great-circle) (risk only adds cost);
+    otherwise k is taken directly from the weights.
+    """
+    gc = getattr(snapshot, "_edge_gc", None)
+    if gc is None:
+        gc = haversine_m(
+            snapshot.node_y[snapshot.edge_source], snapshot.node_x[snapshot.edge_source],
+            snapshot.node_y[snapshot.edge_target], snapshot.node_x[snapshot.edge_target],
+        )
+        snapshot._edge_gc = gc
+    moving = gc > 0
+    if not moving.any():
+        return 0.0
+    if alpha is not None:
+        ratio = getattr(snapshot, "_length_ratio", None)
+        if ratio is None:
+            ratio = float(np.min(snapshot.edge_length[moving] / gc[moving]))
+            snapshot._length_ratio = ratio
+        return max(alpha * ratio, 0.0)
+    return max(float(np.min(np.asarray(weights)[moving] / gc[moving])), 0.0)
+
+
+def astar(snapshot, weights, source, target, alpha=None):
+    """
+    A* between two node indices with a great-circle heuristic scaled by
+    heuristic_scale(). Pass the alpha used to build weights to reuse the cached
+    length ratio instead of scanning the weights.
+    Returns a RouteResult, or None when the target is unreachable.
+    """
+    if source == target:
+        return RouteResult([source], [], 0.0, 0.0)
+    adj = snapshot.adjacency_lists()
+    indptr, target_of, source_of = adj["indptr"], adj["edge_target"], adj["edge_source"]
+    w = _as_list(weights)
+
+    scale = heuristic_scale(snapshot, weights, alpha)
+    lat_t, lon_t = float(snapshot.node_y[target]), float(snapshot.node_x[target])
+    node_y, node_x = snapshot.node_y, snapshot.node_x
+    h_cache = {}
+
+    def h(node):
+        value = h_cache.get(node)
+        if value is None:
+            value = scale * float(haversine_m(node_y[node], node_x[node], lat_t, lon_t))
+            h_cache[node] = value
+        return value
+
+    dist = {source: 0.0}
+    parent = {source: -1}
+    closed = set()
+    heap = [(h(source), source)]
+    while heap:
+        _, node = heapq.heappop(heap)
+        if node == target:
+            break
+        if node in closed:
+            continue
+        closed.add(node)
+        d = dist[node]
+        for e in range(indptr[node], indptr[node + 1]):
+            nbr = target_of[e]
+            nd = d + w[e]
+            if nd < dist.get(nbr, INF):
+                dist[nbr] = nd
+                parent[nbr] = e
+                heapq.heappush(heap, (nd + h(nbr), nbr))
+    if PROFILER.enabled:
+        _count_work(indptr, closed)
+    if target not in dist:
+        return None
+
+    edges = []
+    node = target
+    while parent[node] >= 0:
+        e = parent[node]
+        edges.append(e)
+        node = source_of[e]
+    edges.reverse()
+    return _result(snapshot, weights, source, edges)
+
+
+def single_source(snapshot, weights, source, targets=None, max_cost=INF):
+    """
+    Dijkstra from one node index. Stops early once every node in targets is
+    settled, or when the next node would exceed max_cost.
+    Returns (dist, length, parent): settled node -> cost, route length in meters,
+    and the edge used to reach it (-1 for the source).
+    """
+    adj = snapshot.adjacency_lists()
+    indptr, target_of, edge_length = adj["indptr"], adj["edge_target"], adj["edge_length"]
+    w = _as_list(weights)
+
+    remaining = None if targets is None else set(targets)
+    tentative = {source: 0.0}
+    tentative_length = {source: 0.0}
+    tentative_parent = {source: -1}
+    dist, length, parent = {}, {}, {}
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if node in dist:
+            continue
+        if d > max_cost:
+            break
+        dist[node] = d
+        length[node] = tentative_length[node]
+        parent[node] = tentative_parent[node]
+        if remaining is not None:
+            remaining.discard(node)
+            if not remaining:
+                break
+        node_length = length[node]
+        for e in range(indptr[node], indptr[node + 1]):
+            nbr = target_of[e]
+            nd = d + w[e]
+            if nd < tentative.get(nbr, INF):
+                tentative[nbr] = nd
+                tentative_length[nbr] = node_length + edge_length[e]
+                tentative_parent[nbr] = e
+                heapq.heappush(heap, (nd, nbr))
+    if PROFILER.enabled:
+        _count_work(indptr, dist)
+    return dist, length, parent
+
+
+def path_edges(snapshot, parent, node):
+    # Edge ids from the search source to node, following a parent map from single_source
+    source_of = snapshot.adjacency_lists()["edge_source"]
+    edges = []
+    while parent[node] >= 0:
+        e = parent[node]
+        edges.append(e)
+        node = source_of[e]
+    edges.reverse()
+    return edges
+
+
+def shortest_path(snapshot, weights, source, target, method="bidirectional", alpha=None):
+    if method == "astar":
+        return astar(snapshot, weights, source, target, alpha)
+    if method == "bidirectional":
+        return bidirectional_dijkstra(snapshot, weights, source, target)
+    raise ValueError(f"Unknown routing method: {method}")
@@ -1,27 +1,33 @@
-import pandas as pd
-import networkx as nx
+from data_processing import load_roads
+from graph_snapshot import SNAPSHOT_DIR, compile_graph, load_snapshot, snapshot_exists
+from route_engine import bidirectional_dijkstra
 
-print("Loading roads data...")
-roads = pd.read_csv('roads.csv')
+def load_graph(roads_path='roads.csv', locations_path='locations.csv'):
+    if snapshot_exists(SNAPSHOT_DIR):
+        return load_snapshot(SNAPSHOT_DIR)
+    return compile_graph(roads_path, locations_path, SNAPSHOT_DIR)
 
-print("Building graph...")
-G = nx.DiGraph()
+def shortest_route(snapshot, source, target):
+    # source/target are OSM node ids; edge lengths are the weights
+    route = bidirectional_dijkstra(snapshot, snapshot.edge_length, *snapshot.node_index([source, target]).tolist())
+    if route is None:
+        return None, []
+    return route.length, snapshot.node_ids[route.nodes].tolist()
 
-# Add edges to graph
-for _, row in roads.iterrows():
-    G.add_edge(row['u'], row['v'], length=row['length'])
+def main():
+    print("Loading roads data...")
+    roads = load_roads('roads.csv', columns=['u', 'v'])
 
-def shortest_route(source, target):
-    try:
-        length, path = nx.single_source_dijkstra(G, source=source, target=target, weight='length')
-        return length, path
-    except nx.NetworkXNoPath:
-        return None, []
+    print("Building graph...")
+    snapshot = load_graph()
+
+    # Example usage (replace with actual node ids from locations.csv)
+    source_node = roads['u'].iloc[0]
+    target_node = roads['v'].iloc[-1]
 
-# Example usage (replace with actual node ids from locations.csv)
-source_node = roads['u'].iloc[0]
-target_node = roads['v'].iloc[-1]
+    length, path = shortest_route(snapshot, source_node, target_node)
+    print(f"Shortest route length: {length}")
+    print(f"Route path: {path}")
 
-length, path = shortest_route(source_node, target_node)
-print(f"Shortest route length: {length}")
-print(f"Route path: {path}")
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,26 @@
 import networkx as nx
+import numpy as np
+
+from alternatives import alternative_routes
+from edge_costs import edge_cost, graph_edge_arrays
+from graph_snapshot import snapshot_from_networkx
+from route_engine import shortest_path
+
+def combined_cost_weights(G, alpha=0.7, beta=0.3):
+    # Per-request combined cost as {edge key: cost} ((u, v, k) on multigraphs), in one vectorized pass; G is not modified
+    edges, length, risk = graph_edge_arrays(G)
+    cost = edge_cost(length, risk, alpha, beta, risk_scale=1.0)
+    return dict(zip(edges, cost.tolist()))
 
 def add_combined_cost(G, alpha=0.7, beta=0.3):
-    for u, v, data in G.edges(data=True):
-        data['combined_cost'] = alpha * data.get('length', 1.0) + beta * data.get('risk_score', 0.0)
+    nx.set_edge_attributes(G, combined_cost_weights(G, alpha, beta), 'combined_cost')
     return G
 
+def graph_snapshot(G):
+    # Array form of G for the routing engine, built per call: G may have been edited since the last
+    # query, and nothing is cached on the caller's graph
+    return snapshot_from_networkx(G)
+
 def district_to_node(district_name, node_to_district, G):
     # Pick the first node in the district for routing simplicity
     for node, district in node_to_district.items():
@@ -12,9 +28,45 @@ def district_to_node(district_name, node_to_district, G):
             return node
     return None
 
-def shortest_safest_route(G, source_node, target_node):
+def snapshot_weights(G, snapshot, weights=None):
+    # Per-edge costs in the snapshot's edge order, from 'combined_cost' or a weights dict;
+    # edges without one cost 1, as with NetworkX's weight='combined_cost'
+    edges = graph_edge_arrays(G)[0]
+    if weights is None:
+        cost = [G.edges[e].get('combined_cost', 1.0) for e in edges]
+    else:
+        cost = [weights.get(e, 1.0) for e in edges]
+    # Align the weights (in G.edges order) with the snapshot's edge order
+    return np.asarray(cost, dtype=np.float64)[snapshot.edge_row]
+
+def route_nodes(G, snapshot, source_node, target_node):
+    # Snapshot indices of two graph nodes; unknown nodes raise like NetworkX does
+    for node in (source_node, target_node):
+        if node not in G:
+            raise nx.NodeNotFound(f"Node {node} not in G")
+    return snapshot.node_index([source_node, target_node]).tolist()
+
+def shortest_safest_route(G, source_node, target_node, weights=None):
+    # weights: optional per-request {edge key: cost} from combined_cost_weights, used instead of 'combined_cost'
     try:
-        length, path = nx.single_source_dijkstra(G, source=source_node, target=target_node, weight='combined_cost')
-        return length, path
-    except Exception as e:
+        snapshot = graph_snapshot(G)
+        cost = snapshot_weights(G, snapshot, weights)
+        source, target = route_nodes(G, snapshot, source_node, target_node)
+        route = shortest_path(snapshot, cost, source, target)
+        if route is None:
+            raise nx.NetworkXNoPath(f"No path between {source_node} and {target_node}")
+        return route.cost, snapshot.node_ids[route.nodes].tolist()
+    except Exception:
+        # No route, unknown node or a graph the arrays cannot represent: same answer as before the engine
         return None, []
+
+def alternative_safest_routes(G, source_node, target_node, k=3, weights=None):
+    # Up to k diverse routes as [(cost, [node ids])], best first; the first is a shortest route
+    try:
+        snapshot = graph_snapshot(G)
+        cost = snapshot_weights(G, snapshot, weights)
+        source, target = route_nodes(G, snapshot, source_node, target_node)
+        return [(alt.route.cost, snapshot.node_ids[alt.route.nodes].tolist())
+                for alt in alternative_routes(snapshot, cost, source, target, k)]
+    except Exception:
+        return []
@@ -0,0 +1,436 @@
+# routing_service.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from cost_matrix import cost_matrix
+from edge_costs import snapshot_cost
+from graph_snapshot import SNAPSHOT_DIR, load_snapshot
+from route_cache import ROUTE_CACHE, graph_stamp, route_key
+from route_engine import shortest_path
+from snapping import node_index, snap
+from utils import DISTRICT_CENTROIDS
+
+# Searches running or handed to the pool at once, per worker process
+SLOTS_PER_WORKER = 2
+# Requests allowed to wait for a slot; beyond this the service answers 503
+MAX_QUEUE = 256
+MAX_BODY_BYTES = 4_000_000
+MAX_BATCH = 1000
+# Largest origins x targets cost matrix one request may ask for
+MAX_MATRIX_CELLS = 10_000
+# Batch queries are split into chunks of this size across the pool
+BATCH_CHUNK = 16
+# Per-worker cache of weight arrays for recent (alpha, beta) settings
+MAX_WEIGHT_SETS = 8
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+# ----- Worker processes -----
+
+# Per-worker state, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(snapshot_path):
+    # Every worker memory-maps the same snapshot; adjacency lists and KD-tree are private copies built once per worker
+    snapshot = load_snapshot(snapshot_path)
+    snapshot.adjacency_lists()
+    node_index(snapshot)
+    _worker["snapshot"] = snapshot
+    _worker["weights"] = {}
+
+
+def _weights(alpha, beta):
+    cache = _worker["weights"]
+    key = (round(alpha, 6), round(beta, 6))
+    if key not in cache:
+        if len(cache) >= MAX_WEIGHT_SETS:
+            cache.pop(next(iter(cache)))
+        cache[key] = snapshot_cost(_worker["snapshot"], alpha, beta)
+    return cache[key]
+
+
+def _resolve(snapshot, point):
+    # Node index for {"node": osmid} or {"lat": .., "lon": ..}
+    if "node" in point:
+        return int(snapshot.node_index(int(point["node"])))
+    return snap(snapshot, float(point["lat"]), float(point["lon"]))
+
+
+def _finite(value):
+    return value if np.isfinite(value) else None
+
+
+def worker_route(query):
+    """
+    One route query: {"source", "target", "alpha", "beta", "method", "geometry"}.
+    Returns {"nodes", "cost", "length"} (+ "coordinates" as [lat, lon]) or
+    {"error"} when there is no route.
+    """
+    snapshot = _worker["snapshot"]
+    alpha, beta = float(query.get("alpha", 0.7)), float(query.get("beta", 0.3))
+    source, target = _resolve(snapshot, query["source"]), _resolve(snapshot, query["target"])
+    route = shortest_path(snapshot, _weights(alpha, beta), source, target,
+                          method=query.get("method", "astar"), alpha=alpha)
+    if route is None:
+        return {"error": "no route"}
+    result = {"nodes": snapshot.node_ids[route.nodes].tolist(), "cost": route.cost, "length": route.length}
+    if query.get("geometry"):
+        result["coordinates"] = snapshot.path_latlons(route.nodes)
+    return result
+
+
+def worker_routes(queries):
+    results = []
+    for query in queries:
+        try:
+            results.append(worker_route(query))
+        except (KeyError, TypeError, ValueError) as e:
+            results.append({"error": str(e)})
+    return results
+
+
+def worker_matrix(request):
+    snapshot = _worker["snapshot"]
+    alpha, beta = float(request.get("alpha", 0.7)), float(request.get("beta", 0.3))
+    origins = [_resolve(snapshot, p) for p in request["origins"]]
+    targets = [_resolve(snapshot, p) for p in request["targets"]]
+    costs, lengths, _ = cost_matrix(snapshot, origins, targets, weights=_weights(alpha, beta), workers=1)
+    return {
+        "costs": [[_finite(c) for c in row] for row in costs.tolist()],
+        "lengths": [[_finite(v) for v in row] for row in lengths.tolist()],
+    }
+
+
+def worker_nearest(request):
+    snapshot = _worker["snapshot"]
+    lat = np.array([p["lat"] for p in request["points"]], dtype=np.float64)
+    lon = np.array([p["lon"] for p in request["points"]], dtype=np.float64)
+    idx, meters = snap(snapshot, lat, lon, return_distance=True)
+    return {"nodes": snapshot.node_ids[idx].tolist(), "distance_m": meters.round(1).tolist()}
+
+
+# ----- HTTP service -----
+
+class Overloaded(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+def check_point(point, name):
+    # A {"lat", "lon"} or {"node"} object with numeric values; anything else is a 400, not a worker error
+    if not isinstance(point, dict):
+        raise BadRequest(f"{name} must be an object with lat and lon, or node")
+    for key in (("node",) if "node" in point else ("lat", "lon")):
+        value = point.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise BadRequest(f"{name}.{key} must be a number")
+
+
+def check_query(query, name="request"):
+    if not isinstance(query, dict):
+        raise BadRequest(f"{name} must be an object")
+    for key in ("source", "target"):
+        if key not in query:
+            raise BadRequest(f"{name}: source and target are required")
+        check_point(query[key], f"{name}.{key}")
+
+
+class RoutingService:
+    """
+    asyncio HTTP/1.1 (keep-alive) JSON service in front of a process pool.
+
+    The event loop only parses requests and awaits results; searches run in
+    worker processes that memory-map one graph snapshot. At most
+    workers * SLOTS_PER_WORKER requests (or /routes chunks) are in the pool
+    at once, up to max_queue more wait for a slot, and further requests get
+    503 at once. Malformed bodies get 400.
+
+    POST /route    {"source": {"lat", "lon"} | {"node"}, "target": .., "alpha", "beta", "method", "geometry"}
+    POST /routes   {"queries": [route request, ...]}
+    POST /matrix   {"origins": [point, ...], "targets": [point, ...], "alpha", "beta"}
+    POST /nearest  {"points": [{"lat", "lon"}, ...]}
+    GET  /health   queue and cache statistics
+    """
+
+    def __init__(self, snapshot_path=SNAPSHOT_DIR, workers=None, max_queue=MAX_QUEUE):
+        self.snapshot_path = snapshot_path
+        self.workers = workers or os.cpu_count()
+        self.max_queue = max_queue
+        self.snapshot = load_snapshot(snapshot_path)
+        self.stamp = graph_stamp(self.snapshot)
+        self.pool = None
+        self.slots = None
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+
+    async def start(self, host="127.0.0.1", port=8080):
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.snapshot_path,))
+        self.slots = asyncio.Semaphore(self.workers * SLOTS_PER_WORKER)
+        # Warm up the pool so the first requests do not pay for worker start and snapshot load
+        await asyncio.gather(*(self._run(os.getpid) for _ in range(self.workers)))
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    async def admit(self, factory):
+        # Admission control: wait for a pool slot, or fail fast when the queue is full
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded()
+        self.waiting += 1
+        queued = True
+        try:
+            async with self.slots:
+                self.waiting -= 1
+                queued = False
+                return await factory()
+        finally:
+            if queued:
+                self.waiting -= 1
+
+    async def submit(self, func, *args):
+        return await self.admit(lambda: self._run(func, *args))
+
+    # ----- Endpoints -----
+
+    async def route(self, body):
+        check_query(body)
+        # Identical queries are answered from the route cache without touching the pool
+        source, target = (tuple(sorted(p.items())) for p in (body["source"], body["target"]))
+        options = (body.get("method", "astar"), bool(body.get("geometry")))
+        key = route_key(source, (target, options), body.get("alpha", 0.7), body.get("beta", 0.3), self.stamp)
+        cached = ROUTE_CACHE.get(key)
+        if cached is not None:
+            return cached
+        result = await self.submit(worker_route, body)
+        if "error" not in result:
+            ROUTE_CACHE.put(key, result)
+        return result
+
+    async def routes(self, body):
+        queries = body.get("queries")
+        if not isinstance(queries, list) or len(queries) > MAX_BATCH:
+            raise BadRequest(f"queries must be a list of at most {MAX_BATCH} route requests")
+        for i, query in enumerate(queries):
+            check_query(query, f"queries[{i}]")
+        # Every chunk is admitted like a single request, so a batch never holds more than its share of
+        # the pool; a batch that cannot fit in the queue is rejected as a whole rather than half run
+        chunks = [queries[i:i + BATCH_CHUNK] for i in range(0, len(queries), BATCH_CHUNK)]
+        if self.waiting + len(chunks) > self.max_queue:
+            self.rejected += 1
+            raise Overloaded()
+        results = await asyncio.gather(*(self.submit(worker_routes, chunk) for chunk in chunks))
+        return {"results": [r for chunk in results for r in chunk]}
+
+    async def matrix(self, body):
+        origins, targets = body.get("origins"), body.get("targets")
+        if not isinstance(origins, list) or not isinstance(targets, list) or not origins or not targets:
+            raise BadRequest("origins and targets are required")
+        if len(origins) * len(targets) > MAX_MATRIX_CELLS:
+            raise BadRequest(f"origins x targets must be at most {MAX_MATRIX_CELLS} cells")
+        for name, points in (("origins", origins), ("targets", targets)):
+            for i, point in enumerate(points):
+                check_point(point, f"{name}[{i}]")
+        return await self.submit(worker_matrix, body)
+
+    async def nearest(self, body):
+        points = body.get("points")
+        if not isinstance(points, list):
+            raise BadRequest("points must be a list")
+        for i, point in enumerate(points):
+            check_point({"lat": point.get("lat"), "lon": point.get("lon")} if isinstance(point, dict) else point,
+                        f"points[{i}]")
+        return await self.submit(worker_nearest, body)
+
+    def health(self):
+        return {"status": "ok", "workers": self.workers, "waiting": self.waiting, "served": self.served,
+                "rejected": self.rejected, "nodes": self.snapshot.num_nodes, "edges": self.snapshot.num_edges,
+                "route_cache": ROUTE_CACHE.stats()}
+
+    async def dispatch(self, method, path, body):
+        endpoints = {"/route": self.route, "/routes": self.routes, "/matrix": self.matrix, "/nearest": self.nearest}
+        path = urlsplit(path).path
+        if path == "/health":
+            return 200, self.health()
+        if path not in endpoints:
+            return 404, {"error": f"unknown endpoint {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            payload = json.loads(body or b"{}")
+            if not isinstance(payload, dict):
+                raise BadRequest("request body must be a JSON object")
+            result = await endpoints[path](payload)
+        except (BadRequest, KeyError, TypeError, ValueError) as e:
+            return 400, {"error": str(e)}
+        except Overloaded:
+            return 503, {"error": "queue full, retry later"}
+        self.served += 1
+        return 200, result
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = await self.dispatch(method, path, body)
+                    except Exception as e:
+                        status, payload = 500, {"error": str(e)}
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                data = json.dumps(payload, separators=(",", ":")).encode()
+                head = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}", "Content-Type: application/json",
+                        f"Content-Length: {len(data)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if status == 503:
+                    head.append("Retry-After: 1")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(snapshot_path=SNAPSHOT_DIR, host="127.0.0.1", port=8080, workers=None, max_queue=MAX_QUEUE):
+    service = RoutingService(snapshot_path, workers, max_queue)
+    server = await service.start(host, port)
+    print(f"✅ Routing service on http://{host}:{port} ({service.workers} workers, "
+          f"{service.snapshot.num_nodes} nodes, {service.snapshot.num_edges} edges)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+# ----- Load test client -----
+
+async def _post(reader, writer, host, path, payload):
+    data = json.dumps(payload).encode()
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(data)}\r\n\r\n").encode("latin-1") + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def load_test(url="http://127.0.0.1:8080", requests=2000, concurrency=32, endpoint="/route",
+                    batch_size=32, seed=0, jitter=0.05):
+    """
+    Sends route queries between randomly jittered district centroids over
+    concurrency keep-alive connections and reports throughput and latency
+    percentiles. endpoint="/routes" sends batches of batch_size queries.
+    """
+    parts = urlsplit(url)
+    rng = random.Random(seed)
+    centroids = list(DISTRICT_CENTROIDS.values())
+
+    def point():
+        lat, lon = rng.choice(centroids)
+        return {"lat": lat + rng.uniform(-jitter, jitter), "lon": lon + rng.uniform(-jitter, jitter)}
+
+    def payload():
+        query = {"source": point(), "target": point(), "alpha": rng.choice([0.3, 0.5, 0.7]), "beta": 0.3}
+        if endpoint == "/routes":
+            return {"queries": [query] + [{"source": point(), "target": point()} for _ in range(batch_size - 1)]}
+        return query
+
+    latencies, statuses = [], {}
+    remaining = [requests]
+
+    async def client():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                start = time.perf_counter()
+                status = await _post(reader, writer, parts.hostname, endpoint, payload())
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    lat_ms = np.array(latencies) * 1000
+    queries = len(latencies) * (batch_size if endpoint == "/routes" else 1)
+    report = {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_s": len(latencies) / elapsed,
+        "queries_per_s": queries / elapsed,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+        "statuses": statuses,
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless routing service and its load-test client")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_args = commands.add_parser("serve")
+    serve_args.add_argument("--snapshot", default=SNAPSHOT_DIR)
+    serve_args.add_argument("--host", default="127.0.0.1")
+    serve_args.add_argument("--port", type=int, default=8080)
+    serve_args.add_argument("--workers", type=int, default=None)
+    serve_args.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    test_args = commands.add_parser("loadtest")
+    test_args.add_argument("--url", default="http://127.0.0.1:8080")
+    test_args.add_argument("--requests", type=int, default=2000)
+    test_args.add_argument("--concurrency", type=int, default=32)
+    test_args.add_argument("--endpoint", default="/route", choices=["/route", "/routes"])
+    test_args.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+    if args.command == "serve":
+        asyncio.run(serve(args.snapshot, args.host, args.port, args.workers, args.max_queue))
+    else:
+        asyncio.run(load_test(args.url, args.requests, args.concurrency, args.endpoint, args.batch_size))
@@ -0,0 +1,109 @@
+# snapping.py
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.spatial import cKDTree
+
+from data_processing import load_pois, save_table
+from geo_store import to_geometry_array
+from graph_snapshot import EARTH_RADIUS_M, SNAPSHOT_DIR, load_snapshot
+
+INDEX_FILE = "node_kdtree.pkl"
+
+
+def to_unit_xyz(lat, lon):
+    # Points on the unit sphere; chord distance is monotonic in great-circle distance
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def _coords_stamp(snapshot):
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(snapshot.node_x).tobytes())
+    digest.update(np.ascontiguousarray(snapshot.node_y).tobytes())
+    return digest.hexdigest()
+
+
+def node_index(snapshot):
+    """
+    KD-tree over the snapshot's node coordinates, built once per graph.
+    It is kept on the snapshot and pickled next to the snapshot files so that
+    later processes load it instead of rebuilding.
+    """
+    tree = getattr(snapshot, "_kdtree", None)
+    if tree is not None:
+        return tree
+    path = os.path.join(snapshot.path, INDEX_FILE) if snapshot.path else None
+    stamp = _coords_stamp(snapshot)
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            saved_stamp, tree = pickle.load(f)
+        if saved_stamp != stamp:
+            tree = None
+    if tree is None:
+        tree = cKDTree(to_unit_xyz(snapshot.node_y, snapshot.node_x))
+        if path:
+            # Temporary file plus rename, so a concurrent process never unpickles a partial index
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump((stamp, tree), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+    snapshot._kdtree = tree
+    return tree
+
+
+def snap(snapshot, lat, lon, return_distance=False):
+    """
+    Nearest graph node index for each (lat, lon), in one vectorized query.
+    With return_distance=True also returns the great-circle distance in meters.
+    """
+    scalar = np.ndim(lat) == 0
+    chord, idx = node_index(snapshot).query(to_unit_xyz(np.atleast_1d(lat), np.atleast_1d(lon)))
+    if not return_distance:
+        return int(idx[0]) if scalar else idx
+    meters = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(chord / 2, 1.0))
+    return (int(idx[0]), float(meters[0])) if scalar else (idx, meters)
+
+
+def snap_points(snapshot, df, lat_col="y", lon_col="x"):
+    # Copy of df with node_id (OSM id of the nearest node) and snap_distance_m columns
+    idx, meters = snap(snapshot, df[lat_col].to_numpy(), df[lon_col].to_numpy(), return_distance=True)
+    df = df.copy()
+    df["node_id"] = snapshot.node_ids[idx]
+    df["snap_distance_m"] = meters
+    return df
+
+
+def snap_pois(snapshot, pois):
+    """
+    Adds node_id / snap_distance_m to a POI table with WKT or decoded geometry
+    (pois.csv / pois.parquet). Polygon features are snapped by their centroid.
+    """
+    geoms = to_geometry_array(pois["geometry"])
+    points = shapely.centroid(geoms)
+    lonlat = shapely.get_coordinates(points)
+    snapped = snap_points(snapshot, pd.DataFrame({"y": lonlat[:, 1], "x": lonlat[:, 0]}))
+    pois = pois.copy()
+    pois["node_id"] = snapped["node_id"].to_numpy()
+    pois["snap_distance_m"] = snapped["snap_distance_m"].round(1).to_numpy()
+    return pois
+
+
+def snap_pois_file(snapshot_dir=SNAPSHOT_DIR, pois_path="pois.csv"):
+    # Adds node_id and snap_distance_m to a POI table in place (and builds the snapshot's KD-tree)
+    snapshot = load_snapshot(snapshot_dir)
+    pois = snap_pois(snapshot, load_pois(pois_path))
+    save_table(pois, pois_path)
+    return pois
+
+
+if __name__ == "__main__":
+    print("Snapping POIs to road graph nodes...")
+    pois = snap_pois_file()
+    print(f"✅ Added node_id to {len(pois)} POIs in pois.csv (median snap distance {pois['snap_distance_m'].median():.0f} m)")
@@ -0,0 +1,194 @@
+# synthetic.py
+import os
+import sys
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+from scipy.spatial import Delaunay, cKDTree
+
+from bayesian_risk import compute_risk_score
+from geo_store import write_geo_table
+from graph_snapshot import compile_graph, haversine_m
+from hazard_risk import SEVERITY_SCORE
+from utils import AMENITY_WEIGHTS, DISTRICT_CENTROIDS, UTTARAKHAND_BBOX
+
+# Synthetic OSM ids start here so they never collide with small real ids
+BASE_OSMID = 10_000_000_000
+
+
+def nodes_for_edges(num_edges, mean_degree=2.6):
+    # Node count giving num_edges directed edges at mean_degree out-edges per node (at least 2, for a connected graph)
+    return max(int(num_edges / max(mean_degree, 2.0)), 2)
+
+
+def is_connected(u, v, num_nodes):
+    # Every node reachable from every other one along the directed edges u -> v
+    graph = coo_matrix((np.ones(len(u)), (u, v)), shape=(num_nodes, num_nodes))
+    return connected_components(graph, directed=True, connection="strong")[0] == 1
+
+
+def _delaunay_links(coords):
+    # Unique links (i < j) of the Delaunay triangulation; connected over all points
+    if len(coords) < 3:
+        return np.array([[0, 1]])[:len(coords) - 1]
+    # QJ joggles the input so every point (even duplicates) is a vertex of the triangulation
+    simplices = Delaunay(coords, qhull_options="QJ").simplices
+    links = np.vstack([simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [0, 2]]])
+    return np.unique(np.sort(links, axis=1), axis=0)
+
+
+def _spanning_links(coords, links):
+    # Links (i < j) of the minimum spanning tree of a connected set of links, by planar length
+    num_nodes = len(coords)
+    # Offset keeps duplicate points (zero distance) from reading as missing links
+    length = np.linalg.norm(coords[links[:, 0]] - coords[links[:, 1]], axis=1) + 1e-12
+    tree = minimum_spanning_tree(coo_matrix((length, (links[:, 0], links[:, 1])), shape=(num_nodes, num_nodes)))
+    tree = tree.tocoo()
+    return np.sort(np.column_stack([tree.row, tree.col]), axis=1)
+
+
+def synthetic_nodes(num_nodes, bbox=UTTARAKHAND_BBOX, town_share=0.7, town_spread=0.08, rng=None):
+    """
+    Node coordinates (lon, lat): town_share of the nodes are clustered around
+    the district centroids (normal with town_spread degrees), the rest spread
+    uniformly over bbox.
+    """
+    rng = np.random.default_rng(rng)
+    towns = np.array([(lon, lat) for lat, lon in DISTRICT_CENTROIDS.values()])
+    in_towns = int(num_nodes * town_share)
+    centre = towns[rng.integers(0, len(towns), in_towns)]
+    clustered = centre + rng.normal(0.0, town_spread, (in_towns, 2))
+    spread = rng.uniform(bbox[:2], bbox[2:], (num_nodes - in_towns, 2))
+    coords = np.vstack([clustered, spread])
+    return np.clip(coords, bbox[:2], bbox[2:])
+
+
+def synthetic_network(num_nodes, mean_degree=2.6, max_degree=8, detour=1.15, seed=42, bbox=UTTARAKHAND_BBOX,
+                      num_edges=None):
+    """
+    Connected road network with the roads.csv / locations.csv schemas and
+    exactly num_edges directed edges (default num_nodes * mean_degree).
+
+    The backbone is the minimum spanning tree of the Delaunay triangulation,
+    so every node is reachable. Further links are drawn at random from the
+    remaining Delaunay links and each node's max_degree / 2 nearest
+    neighbours until the edge count is reached. Every link is a two-way road
+    (both directions are rows), except a single one-way road when num_edges
+    is odd. Road lengths are the great-circle distance times detour, and each
+    geometry bends through one jittered midpoint.
+    Returns (locations, roads) GeoDataFrames.
+    """
+    rng = np.random.default_rng(seed)
+    coords = synthetic_nodes(num_nodes, bbox, rng=rng)
+    osmid = BASE_OSMID + np.arange(num_nodes, dtype=np.int64)
+    num_edges = int(round(num_nodes * mean_degree)) if num_edges is None else int(num_edges)
+    if num_edges < 2 * (num_nodes - 1):
+        raise ValueError(f"{num_edges} edges cannot connect {num_nodes} nodes with two-way roads")
+
+    delaunay = _delaunay_links(coords)
+    backbone = _spanning_links(coords, delaunay)
+    half_max = max(max_degree // 2, 1)
+    _, nbrs = cKDTree(coords).query(coords, k=min(half_max + 1, num_nodes))
+    knn = np.column_stack([np.repeat(np.arange(num_nodes), nbrs.shape[1] - 1), nbrs[:, 1:].ravel()])
+    candidates = np.unique(np.sort(np.vstack([knn, delaunay]), axis=1), axis=0)
+    candidates = candidates[candidates[:, 0] != candidates[:, 1]]
+    # Links not already in the backbone, as i * num_nodes + j codes
+    codes = candidates[:, 0].astype(np.int64) * num_nodes + candidates[:, 1]
+    candidates = candidates[~np.isin(codes, backbone[:, 0].astype(np.int64) * num_nodes + backbone[:, 1])]
+    extra = (num_edges + 1) // 2 - len(backbone)
+    if extra > len(candidates):
+        raise ValueError(f"Only {2 * (len(backbone) + len(candidates))} edges available for {num_nodes} nodes; "
+                         f"lower mean_degree or raise max_degree")
+    pairs = np.vstack([backbone, candidates[rng.choice(len(candidates), extra, replace=False)]])
+    # One row per direction; with an odd count the last (non-backbone) link stays one-way
+    u = np.concatenate([pairs[:, 0], pairs[:, 1]])[:num_edges]
+    v = np.concatenate([pairs[:, 1], pairs[:, 0]])[:num_edges]
+    if not is_connected(u, v, num_nodes):
+        raise RuntimeError("Synthetic network is not connected")
+
+    start, end = coords[u], coords[v]
+    straight = haversine_m(start[:, 1], start[:, 0], end[:, 1], end[:, 0])
+    mid = (start + end) / 2 + rng.normal(0.0, 0.1, (len(u), 1)) * (end - start)[:, ::-1] * [1, -1]
+    geometry = shapely.linestrings(np.stack([start, mid, end], axis=1))
+
+    locations = gpd.GeoDataFrame({
+        "osmid": osmid,
+        "y": coords[:, 1],
+        "x": coords[:, 0],
+        "street_count": np.bincount(u, minlength=num_nodes),
+    }, geometry=shapely.points(coords), crs="EPSG:4326")
+    roads = gpd.GeoDataFrame({
+        "u": osmid[u],
+        "v": osmid[v],
+        "length": np.round(straight * detour, 3),
+    }, geometry=geometry, crs="EPSG:4326")
+    return locations, roads
+
+
+def synthetic_pois(num_pois, locations, max_offset=0.005, seed=43):
+    # POIs (pois.csv schema) placed near random graph nodes
+    rng = np.random.default_rng(seed)
+    at = rng.integers(0, len(locations), num_pois)
+    x = locations["x"].to_numpy()[at] + rng.uniform(-max_offset, max_offset, num_pois)
+    y = locations["y"].to_numpy()[at] + rng.uniform(-max_offset, max_offset, num_pois)
+    amenity = rng.choice(list(AMENITY_WEIGHTS), num_pois)
+    return gpd.GeoDataFrame({
+        "id": BASE_OSMID + np.arange(num_pois, dtype=np.int64),
+        "amenity": amenity,
+        "risk_score": pd.Series(amenity).map(compute_risk_score).to_numpy(),
+    }, geometry=shapely.points(x, y), crs="EPSG:4326")
+
+
+def synthetic_hazards(num_zones, bbox=UTTARAKHAND_BBOX, min_radius=0.02, max_radius=0.2, seed=44):
+    # Circular hazard zones in the hazard_risk.hazard_zones layout
+    rng = np.random.default_rng(seed)
+    centres = rng.uniform(bbox[:2], bbox[2:], (num_zones, 2))
+    radius = rng.uniform(min_radius, max_radius, num_zones)
+    severity = rng.choice(list(SEVERITY_SCORE), num_zones)
+    return gpd.GeoDataFrame({
+        "district_name": [f"zone-{i}" for i in range(num_zones)],
+        "hazard": rng.choice(["Flood", "Landslide", "Earthquake", "Forest Fire"], num_zones),
+        "severity": pd.Series(severity).map(SEVERITY_SCORE).to_numpy(),
+    }, geometry=shapely.buffer(shapely.points(centres), radius), crs="EPSG:4326")
+
+
+def synthetic_demand(num_points, locations, seed=45):
+    # Demand points (lat, lon, demand) at random graph nodes
+    rng = np.random.default_rng(seed)
+    at = rng.integers(0, len(locations), num_points)
+    return pd.DataFrame({
+        "lat": locations["y"].to_numpy()[at],
+        "lon": locations["x"].to_numpy()[at],
+        "demand": rng.integers(50, 300, num_points),
+    })
+
+
+def write_synthetic_dataset(out_dir, num_edges=100_000, mean_degree=2.6, num_pois=None, seed=42):
+    """
+    Writes roads.csv, locations.csv and pois.csv (+ GeoParquet copies) for a
+    connected synthetic network of num_edges edges into out_dir and compiles
+    its graph snapshot into out_dir/graph_snapshot. Returns the snapshot.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    locations, roads = synthetic_network(nodes_for_edges(num_edges, mean_degree), mean_degree, seed=seed,
+                                         num_edges=num_edges)
+    pois = synthetic_pois(num_pois if num_pois is not None else max(num_edges // 50, 100), locations, seed=seed + 1)
+    for name, df in (("roads", roads), ("locations", locations), ("pois", pois)):
+        csv = pd.DataFrame(df)
+        csv["geometry"] = shapely.to_wkt(df.geometry.to_numpy(), rounding_precision=7)
+        csv.to_csv(os.path.join(out_dir, f"{name}.csv"), index=False)
+        write_geo_table(df, os.path.join(out_dir, f"{name}.parquet"))
+    return compile_graph(os.path.join(out_dir, "roads.csv"), os.path.join(out_dir, "locations.csv"),
+                         os.path.join(out_dir, "graph_snapshot"))
+
+
+if __name__ == "__main__":
+    # Usage: python synthetic.py [num_edges] [out_dir]
+    num_edges = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else "synthetic"
+    snapshot = write_synthetic_dataset(out_dir, num_edges)
+    print(f"✅ Synthetic dataset saved to {out_dir}/ ({snapshot.num_nodes} nodes, {snapshot.num_edges} edges)")
@@ -0,0 +1,58 @@
+# test_closures.py
+import numpy as np
+import pytest
+
+from closures import ClosureRegistry, RoadClosures
+from edge_costs import snapshot_cost
+from graph_snapshot import snapshot_from_networkx
+from route_engine import INF, single_source
+from test_route_engine import grid_graph
+
+
+def assert_trees_match(closures):
+    # Every tracked tree equals a fresh search on the current closure weights
+    for source, tree in closures.trees.items():
+        dist, _, parent = single_source(closures.snapshot, closures.weights, source)
+        for node in range(closures.snapshot.num_nodes):
+            if node not in dist:
+                assert tree.dist[node] == INF
+                continue
+            assert tree.dist[node] == pytest.approx(dist[node])
+            assert tree.parent[node] == parent[node]
+
+
+def test_repaired_trees_match_fresh_search():
+    snapshot = snapshot_from_networkx(grid_graph(size=10, seed=3))
+    closures = RoadClosures(snapshot, snapshot_cost(snapshot, 0.7, 0.3))
+    rng = np.random.default_rng(0)
+    for source in rng.choice(snapshot.num_nodes, 5, replace=False).tolist():
+        closures.track(source)
+
+    names = []
+    for factor in (INF, 3.0, INF, INF):
+        edges = rng.choice(snapshot.num_edges, 12, replace=False)
+        names.append(closures.close_edges(edges, factor))
+        assert_trees_match(closures)
+    for name in (names[2], names[0], names[3], names[1]):
+        closures.lift(name)
+        assert_trees_match(closures)
+    assert np.array_equal(closures.weights, closures.base)
+
+
+def test_registry_reapplies_closures_to_new_snapshot():
+    G = grid_graph(size=6, seed=1)
+    registry = ClosureRegistry()
+    first = snapshot_from_networkx(G)
+    closures = registry.view(first, (0.7, 0.3), lambda: snapshot_cost(first, 0.7, 0.3))
+    name = registry.close_edges(first, [0, 5, 9])
+    assert np.isinf(closures.weights[[0, 5, 9]]).all()
+
+    # A reloaded snapshot gets the same roads closed, found by their road rows
+    second = snapshot_from_networkx(G)
+    reloaded = registry.view(second, (0.7, 0.3), lambda: snapshot_cost(second, 0.7, 0.3))
+    assert reloaded is not closures
+    closed = registry.edges(second, name)
+    assert np.array_equal(np.sort(second.edge_row[closed]), np.sort(first.edge_row[[0, 5, 9]]))
+    assert np.isinf(reloaded.weights[closed]).all()
+    registry.lift(name)
+    assert np.isfinite(reloaded.weights).all()
@@ -0,0 +1,72 @@
+# test_conjugate.py
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from conjugate import BetaBernoulli, GammaPoisson, hdi_columns
+
+# az.summary columns, as found in bayesian_risk_summary.csv
+SUMMARY_COLUMNS = ["mean", "sd", "hdi_2.5%", "hdi_97.5%", "mcse_mean", "mcse_sd", "ess_bulk", "ess_tail", "r_hat"]
+
+
+def observations(n=300, p=0.12, seed=42):
+    return (np.random.default_rng(seed).random(n) < p).astype(int)
+
+
+def test_beta_bernoulli_matches_analytic_posterior():
+    y = observations()
+    model = BetaBernoulli(prior_alpha=1, prior_beta=1)
+    model.update("p", y)
+    summary = model.summary(hdi_prob=0.95)
+    assert list(summary.columns) == SUMMARY_COLUMNS
+
+    reference = stats.beta(1 + y.sum(), 1 + len(y) - y.sum())
+    row = summary.loc["p"]
+    assert row["mean"] == pytest.approx(reference.mean(), abs=1e-3)
+    assert row["sd"] == pytest.approx(reference.std(), abs=1e-3)
+    low, high = hdi_columns(0.95)
+    # The HDI holds 95% of the mass and is no wider than the equal-tailed interval
+    assert reference.cdf(row[high]) - reference.cdf(row[low]) == pytest.approx(0.95, abs=5e-3)
+    equal_tailed = reference.ppf(0.975) - reference.ppf(0.025)
+    assert row[high] - row[low] <= equal_tailed + 2e-3
+
+
+def test_batch_and_online_updates_agree():
+    y = observations()
+    keys = np.array(["Dehradun", "Haridwar", "Almora"])[np.arange(len(y)) % 3]
+    batch = BetaBernoulli()
+    batch.update_groups(keys, y)
+    online = BetaBernoulli()
+    for key, obs in zip(keys, y):
+        online.update(key, obs)
+    pd.testing.assert_frame_equal(batch.summary(keys=sorted(set(keys))), online.summary(keys=sorted(set(keys))))
+
+
+def test_gamma_poisson_posterior_mean():
+    model = GammaPoisson(prior_alpha=2, prior_beta=1)
+    model.update("Nainital", [3, 5, 4])
+    model.update("Nainital", 6, exposure=2)
+    summary = model.summary()
+    assert list(summary.columns) == SUMMARY_COLUMNS
+    assert summary.loc["Nainital", "mean"] == pytest.approx((2 + 18) / (1 + 5), abs=1e-3)
+
+
+def test_beta_bernoulli_matches_pymc():
+    pm = pytest.importorskip("pymc")
+    az = pytest.importorskip("arviz")
+    y = observations()
+    with pm.Model():
+        p = pm.Beta("p", alpha=1, beta=1)
+        pm.Bernoulli("obs", p=p, observed=y)
+        trace = pm.sample(1000, tune=1000, chains=2, cores=1, random_seed=42, progressbar=False)
+    mcmc = az.summary(trace, hdi_prob=0.95).loc["p"]
+
+    model = BetaBernoulli(prior_alpha=1, prior_beta=1)
+    model.update("p", y)
+    analytic = model.summary(hdi_prob=0.95).loc["p"]
+    # Within Monte Carlo error of 2,000 draws
+    assert analytic["mean"] == pytest.approx(mcmc["mean"], abs=0.005)
+    assert analytic["sd"] == pytest.approx(mcmc["sd"], abs=0.003)
+    assert analytic["hdi_2.5%"] == pytest.approx(mcmc["hdi_2.5%"], abs=0.01)
+    assert analytic["hdi_97.5%"] == pytest.approx(mcmc["hdi_97.5%"], abs=0.01)
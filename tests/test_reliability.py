@@ -0,0 +1,28 @@
+# test_reliability.py
+import os
+
+import numpy as np
+import pytest
+
+from data_processing import load_roads
+from geo_store import ROW_ID_COLUMN
+from reliability import load_edge_posterior
+from synthetic import write_synthetic_dataset
+
+
+def test_posterior_file_is_matched_by_row_id(tmp_path):
+    pytest.importorskip("pymc")
+    from risk_model import simulate_road_risks
+
+    snapshot = write_synthetic_dataset(str(tmp_path), 2_000, seed=3)
+    # As in risk_model.py: roads come from the spatially sorted Parquet copy, the output is written as CSV
+    roads = load_roads(os.path.join(tmp_path, "roads.csv"))
+    assert (roads[ROW_ID_COLUMN].to_numpy() != np.arange(len(roads))).any()
+    with_risk = simulate_road_risks(roads, advi_iterations=200, draws=50)
+    path = os.path.join(tmp_path, "roads_with_risk.csv")
+    with_risk.to_csv(path, index=False)
+
+    mean, std = load_edge_posterior(snapshot, path)
+    expected = with_risk.set_index(ROW_ID_COLUMN).loc[np.asarray(snapshot.edge_row)]
+    np.testing.assert_allclose(mean, expected["risk_mean"].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(std, expected["risk_std"].to_numpy(), rtol=1e-12)
@@ -0,0 +1,105 @@
+# test_route_engine.py
+import itertools
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from edge_costs import snapshot_cost
+from graph_snapshot import haversine_m, snapshot_from_networkx
+from route_engine import astar, bidirectional_dijkstra
+from routing import add_combined_cost, shortest_safest_route
+from utils import load_graph_and_nodes
+
+
+def grid_graph(size=8, seed=0):
+    # Small directed grid with road lengths at or above the great-circle distance, some roads one-way
+    rng = np.random.default_rng(seed)
+    G = nx.DiGraph()
+    for i, j in itertools.product(range(size), repeat=2):
+        G.add_node(i * size + j, x=78.0 + 0.01 * i, y=30.0 + 0.01 * j)
+    for i, j in itertools.product(range(size), repeat=2):
+        for di, dj in ((1, 0), (0, 1)):
+            if i + di >= size or j + dj >= size:
+                continue
+            a, b = i * size + j, (i + di) * size + j + dj
+            straight = float(haversine_m(G.nodes[a]["y"], G.nodes[a]["x"], G.nodes[b]["y"], G.nodes[b]["x"]))
+            for u, v in ((a, b), (b, a)):
+                if (u, v) == (b, a) and rng.random() < 0.15:
+                    continue
+                G.add_edge(u, v, length=straight * rng.uniform(1.0, 1.5), risk_score=rng.random())
+    return G
+
+
+@pytest.fixture(params=["load_graph_and_nodes", "grid"])
+def graph(request):
+    if request.param == "grid":
+        return grid_graph()
+    return load_graph_and_nodes()[0]
+
+
+@pytest.mark.parametrize("alpha, beta", [(1.0, 0.0), (0.7, 0.3), (0.2, 0.8)])
+def test_costs_match_networkx(graph, alpha, beta):
+    add_combined_cost(graph, alpha, beta)
+    snapshot = snapshot_from_networkx(graph)
+    weights = snapshot_cost(snapshot, alpha, beta, risk_scale=1.0)
+    rng = np.random.default_rng(1)
+    nodes = list(graph.nodes)
+    pairs = [tuple(rng.choice(nodes, 2, replace=False).tolist()) for _ in range(60)]
+    for u, v in pairs:
+        s, t = snapshot.node_index([u, v]).tolist()
+        try:
+            expected = nx.shortest_path_length(graph, u, v, weight="combined_cost")
+        except nx.NetworkXNoPath:
+            assert bidirectional_dijkstra(snapshot, weights, s, t) is None
+            assert astar(snapshot, weights, s, t, alpha=alpha) is None
+            continue
+        bidir = bidirectional_dijkstra(snapshot, weights, s, t)
+        star = astar(snapshot, weights, s, t, alpha=alpha)
+        assert bidir.cost == pytest.approx(expected)
+        assert star.cost == pytest.approx(expected)
+        # The returned edges form a path from u to v whose cost is the reported one
+        assert bidir.nodes[0] == s and bidir.nodes[-1] == t
+        assert float(weights[bidir.edges].sum()) == pytest.approx(bidir.cost)
+
+
+def test_weights_match_combined_cost(graph):
+    add_combined_cost(graph, 0.7, 0.3)
+    snapshot = snapshot_from_networkx(graph)
+    # edge_row maps snapshot edges back to G.edges order
+    costs = [c for _, _, c in graph.edges(data="combined_cost")]
+    expected = np.array(costs)[snapshot.edge_row]
+    assert np.allclose(snapshot_cost(snapshot, 0.7, 0.3, risk_scale=1.0), expected)
+
+
+def test_shortest_safest_route_matches_networkx():
+    G, _ = load_graph_and_nodes()
+    add_combined_cost(G)
+    cost, path = shortest_safest_route(G, 1, 4)
+    expected_cost, expected_path = nx.single_source_dijkstra(G, 1, 4, weight="combined_cost")
+    assert cost == pytest.approx(expected_cost)
+    assert path == expected_path
+    assert shortest_safest_route(G, 4, 1) == (None, [])
+    assert shortest_safest_route(G, 1, 99) == (None, [])
+
+
+def test_shortest_safest_route_follows_graph_edits():
+    G, _ = load_graph_and_nodes()
+    add_combined_cost(G)
+    shortest_safest_route(G, 1, 4)
+    # Same edge count, different edges: the route must use the new graph
+    G.remove_edge(1, 5)
+    G.add_edge(1, 2, length=5, risk_score=0.1)
+    add_combined_cost(G)
+    cost, path = shortest_safest_route(G, 1, 4)
+    expected_cost, expected_path = nx.single_source_dijkstra(G, 1, 4, weight="combined_cost")
+    assert cost == pytest.approx(expected_cost)
+    assert path == expected_path
+    assert "_snapshot" not in G.graph
+    # A node added later is routable, and edges without combined_cost count as 1
+    G.add_node(6, x=79.0, y=29.5)
+    G.add_edge(4, 6)
+    cost, path = shortest_safest_route(G, 1, 6)
+    expected_cost, expected_path = nx.single_source_dijkstra(G, 1, 6, weight="combined_cost")
+    assert cost == pytest.approx(expected_cost)
+    assert path == expected_path
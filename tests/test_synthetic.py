@@ -0,0 +1,22 @@
+# test_synthetic.py
+import numpy as np
+import pytest
+
+from synthetic import BASE_OSMID, is_connected, nodes_for_edges, synthetic_network
+
+
+@pytest.mark.parametrize("num_edges", [2_000, 2_001, 20_000])
+def test_network_is_connected_with_requested_edges(num_edges):
+    locations, roads = synthetic_network(nodes_for_edges(num_edges), num_edges=num_edges, seed=7)
+    assert len(roads) == num_edges
+    u = roads["u"].to_numpy() - BASE_OSMID
+    v = roads["v"].to_numpy() - BASE_OSMID
+    assert is_connected(u, v, len(locations))
+    # No self loops or repeated directed edges
+    assert (u != v).all()
+    assert len(np.unique(u * len(locations) + v)) == num_edges
+
+
+def test_too_few_edges_raise():
+    with pytest.raises(ValueError):
+        synthetic_network(100, num_edges=150)
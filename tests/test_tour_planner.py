@@ -0,0 +1,67 @@
+# test_tour_planner.py
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tour_planner import TourPlanner
+
+
+def planner(num_zones=30, seed=0, **kwargs):
+    # Asymmetric costs between random points, one demand row per zone besides the depot
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 100, (num_zones + 1, 2))
+    costs = np.linalg.norm(xy[:, None] - xy[None], axis=2) * rng.uniform(1.0, 1.3, (num_zones + 1,) * 2)
+    np.fill_diagonal(costs, 0.0)
+    names = [f"z{i}" for i in range(num_zones + 1)]
+    demand = pd.DataFrame({"District": names[1:], "Demand": rng.integers(10, 60, num_zones),
+                           "Priority_Score": rng.uniform(0, 1, num_zones)})
+    return TourPlanner(names, costs, "z0", demand, [400.0, 400.0, 400.0], **kwargs)
+
+
+def test_move_deltas_match_full_evaluation():
+    p = planner()
+    rng = np.random.default_rng(1)
+    stops = list(rng.permutation(len(p.stop_loc)))
+    route, other = stops[:12], stops[12:20]
+    state = p._route_state(route)
+    base = p.route_objective(route)
+    for pos in range(len(route) + 1):
+        new = route[:pos] + [other[0]] + route[pos:]
+        assert p._insert_delta(route, state, other[0], pos) == pytest.approx(p.route_objective(new) - base)
+    for i in range(len(route)):
+        removed = route[:i] + route[i + 1:]
+        assert p._remove_delta(route, state, i) == pytest.approx(p.route_objective(removed) - base)
+        replaced = route[:i] + [other[1]] + route[i + 1:]
+        assert p._replace_delta(route, state, i, other[1]) == pytest.approx(p.route_objective(replaced) - base)
+    assert p._insert_delta([], p._route_state([]), other[0], 0) == pytest.approx(p.route_objective([other[0]]))
+
+
+def test_two_opt_only_applies_improving_reversals():
+    p = planner(seed=2)
+    routes, _ = p.construct()
+    p._deadline = float("inf")
+    for _ in range(50):
+        before = [p.route_objective(r) for r in routes]
+        if not p._two_opt(routes):
+            break
+        after = [p.route_objective(r) for r in routes]
+        assert sum(after) < sum(before)
+    # At a 2-opt optimum no reversal improves any route
+    for route in routes:
+        base = p.route_objective(route)
+        for i in range(len(route) - 1):
+            for j in range(i + 1, len(route)):
+                assert p.route_objective(route[:i] + route[i:j + 1][::-1] + route[j + 1:]) >= base - 1e-6
+
+
+def test_solve_respects_time_limit_with_partial_plan():
+    p = planner(num_zones=400, seed=3)
+    start = time.monotonic()
+    plan = p.solve(time_limit=0.0)
+    assert time.monotonic() - start < 1.0
+    # Nothing was placed before the deadline: every stop is reported unserved
+    assert len(plan.unserved) == len(p.stop_loc)
+    plan = planner(num_zones=400, seed=3).solve(time_limit=0.5)
+    assert plan is not None and len(plan.unserved) < 400
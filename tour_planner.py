@@ -0,0 +1,365 @@
+# tour_planner.py
+import random
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from cost_matrix import cost_matrix
+from snapping import snap
+from utils import DISTRICT_CENTROIDS
+
+# routes: list of stop-name lists per vehicle; loads/costs per vehicle; unserved: stops no vehicle can take
+TourPlan = namedtuple("TourPlan", ["routes", "loads", "costs", "objective", "unserved"])
+
+# Kicks in a row without a new best plan after which the search stops before its time limit
+MAX_STALE_KICKS = 50
+# Seconds between the partial plans published while the initial construction runs
+CONSTRUCT_PUBLISH_INTERVAL = 0.25
+
+
+def district_cost_matrix(snapshot, alpha=0.7, beta=0.3, workers=1, closures=None):
+    # Travel cost between every pair of districts, as (names, square matrix).
+    # closures: RoadClosures on the alpha/beta weights, whose tracked district trees give the rows.
+    names = list(DISTRICT_CENTROIDS)
+    lats, lons = zip(*DISTRICT_CENTROIDS.values())
+    nodes = snap(snapshot, lats, lons)
+    costs, _, _ = cost_matrix(snapshot, nodes, nodes, alpha, beta, workers=workers, closures=closures)
+    return names, costs
+
+
+class TourPlanner:
+    """
+    Capacitated multi-vehicle relief tour planner over a precomputed cost matrix.
+
+    Starts from a priority-ordered cheapest-insertion construction and improves
+    it with relocate / swap / 2-opt local search plus random kicks until the time
+    limit. Every move is priced in O(1) (O(segment) for 2-opt) from per-route
+    prefix arrays (_route_state) instead of re-evaluating whole routes.
+    self.best always holds the best TourPlan found so far, so another thread
+    can read it at any moment while solve() runs; during construction it is a
+    partial plan with the stops not yet placed marked unserved.
+
+    The objective is total travel cost plus priority_weight times the
+    priority-weighted mean arrival cost, so high-priority zones are served early.
+    """
+
+    def __init__(self, names, costs, depot, priority_df, fleet, priority_weight=1.0, seed=42):
+        self.names = list(names)
+        self.costs = np.asarray(costs, dtype=np.float64)
+        # Nested lists: indexing them in the move loops is much cheaper than indexing the array
+        self.cost_rows = self.costs.tolist()
+        index = {name: i for i, name in enumerate(self.names)}
+        self.depot = index[depot]
+        self.fleet = [float(c) for c in fleet]
+        self.priority_weight = priority_weight
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.best = None
+        self._deadline = float("inf")
+
+        # Stops: one per demand row, split when a single vehicle cannot carry it
+        max_capacity = max(self.fleet) if self.fleet else 0.0
+        self.stop_loc, self.stop_demand, self.stop_priority, self.stop_name = [], [], [], []
+        for row in priority_df.itertuples(index=False):
+            if row.District == depot:
+                continue
+            remaining = float(row.Demand)
+            while remaining > 0 and max_capacity > 0:
+                load = min(remaining, max_capacity)
+                self.stop_loc.append(index[row.District])
+                self.stop_demand.append(load)
+                self.stop_priority.append(float(row.Priority_Score))
+                self.stop_name.append(row.District)
+                remaining -= load
+        total_priority = sum(self.stop_priority) or 1.0
+        self.stop_weight = [p / total_priority for p in self.stop_priority]
+
+    # ----- Evaluation -----
+
+    def route_cost(self, route):
+        # (travel cost including the return to depot, priority-weighted arrival cost)
+        c = self.cost_rows
+        prev, travel, lateness = self.depot, 0.0, 0.0
+        for s in route:
+            loc = self.stop_loc[s]
+            travel += c[prev][loc]
+            lateness += self.stop_weight[s] * travel
+            prev = loc
+        if route:
+            travel += c[prev][self.depot]
+        return travel, lateness
+
+    def route_objective(self, route):
+        travel, lateness = self.route_cost(route)
+        return travel + self.priority_weight * lateness
+
+    def load(self, route):
+        return sum(self.stop_demand[s] for s in route)
+
+    def _route_state(self, route):
+        """
+        Prefix arrays that price moves on route in O(1): arrival[k] is the
+        travel cost on reaching route[k], suffix[k] the stop weight from
+        position k on and weighted[k] the sum of weight * arrival before
+        position k. suffix and weighted have one extra entry.
+        """
+        c, loc, weight = self.cost_rows, self.stop_loc, self.stop_weight
+        arrival, weighted = [], [0.0]
+        prev, travel = self.depot, 0.0
+        for s in route:
+            travel += c[prev][loc[s]]
+            arrival.append(travel)
+            weighted.append(weighted[-1] + weight[s] * travel)
+            prev = loc[s]
+        suffix = [0.0] * (len(route) + 1)
+        for k in range(len(route) - 1, -1, -1):
+            suffix[k] = suffix[k + 1] + weight[route[k]]
+        return arrival, suffix, weighted
+
+    def _ends(self, route, start, end):
+        # Locations before position start and after position end (the depot at either end of the route)
+        prev = self.stop_loc[route[start - 1]] if start > 0 else self.depot
+        nxt = self.stop_loc[route[end + 1]] if end + 1 < len(route) else self.depot
+        return prev, nxt
+
+    def _insert_delta(self, route, state, s, pos):
+        # Objective change from inserting stop s before position pos (at the end when pos == len(route))
+        c, arrival, suffix = self.cost_rows, state[0], state[1]
+        prev, nxt = self._ends(route, pos, pos - 1)
+        x = self.stop_loc[s]
+        detour = c[prev][x] + c[x][nxt] - c[prev][nxt]
+        at = (arrival[pos - 1] if pos else 0.0) + c[prev][x]
+        # The stop itself arrives at `at`; every later stop arrives detour later
+        return detour + self.priority_weight * (self.stop_weight[s] * at + suffix[pos] * detour)
+
+    def _remove_delta(self, route, state, i):
+        # Objective change from removing the stop at position i
+        c, arrival, suffix = self.cost_rows, state[0], state[1]
+        prev, nxt = self._ends(route, i, i)
+        s = route[i]
+        x = self.stop_loc[s]
+        detour = c[prev][x] + c[x][nxt] - c[prev][nxt]
+        return -(detour + self.priority_weight * (self.stop_weight[s] * arrival[i] + suffix[i + 1] * detour))
+
+    def _replace_delta(self, route, state, i, t):
+        # Objective change from putting stop t in place of the stop at position i
+        c, arrival, suffix = self.cost_rows, state[0], state[1]
+        prev, nxt = self._ends(route, i, i)
+        s = route[i]
+        xs, xt = self.stop_loc[s], self.stop_loc[t]
+        change = c[prev][xt] + c[xt][nxt] - c[prev][xs] - c[xs][nxt]
+        at_prev = arrival[i - 1] if i else 0.0
+        lateness = self.stop_weight[t] * (at_prev + c[prev][xt]) - self.stop_weight[s] * arrival[i]
+        return change + self.priority_weight * (lateness + suffix[i + 1] * change)
+
+    def _plan(self, routes, unserved):
+        costs = [float(self.route_cost(r)[0]) for r in routes]
+        objective = float(sum(self.route_objective(r) for r in routes))
+        return TourPlan(
+            [[self.stop_name[s] for s in r] for r in routes],
+            [self.load(r) for r in routes],
+            costs,
+            objective,
+            [self.stop_name[s] for s in unserved],
+        )
+
+    def _publish(self, routes, unserved):
+        plan = self._plan(routes, unserved)
+        with self.lock:
+            if self.best is None or len(plan.unserved) < len(self.best.unserved) or (
+                len(plan.unserved) == len(self.best.unserved) and plan.objective < self.best.objective - 1e-9
+            ):
+                self.best = plan
+                self._best_routes = [list(r) for r in routes]
+                self._best_unserved = list(unserved)
+                return True
+        return False
+
+    # ----- Construction -----
+
+    def construct(self, on_improve=None):
+        """
+        Cheapest feasible insertion, highest-priority stops first. Stops the
+        deadline leaves unplaced are returned as unserved, and partial plans
+        are published every CONSTRUCT_PUBLISH_INTERVAL seconds meanwhile.
+        """
+        routes = [[] for _ in self.fleet]
+        states = [self._route_state(r) for r in routes]
+        loads = [0.0 for _ in self.fleet]
+        unserved = []
+        order = sorted(range(len(self.stop_loc)), key=lambda s: -self.stop_priority[s])
+        next_publish = time.monotonic() + CONSTRUCT_PUBLISH_INTERVAL
+        for k, s in enumerate(order):
+            now = time.monotonic()
+            if now >= self._deadline:
+                unserved.extend(order[k:])
+                break
+            if now >= next_publish:
+                next_publish = now + CONSTRUCT_PUBLISH_INTERVAL
+                if self._publish(routes, unserved + order[k:]) and on_improve:
+                    on_improve(self.best)
+            best = None
+            for v, route in enumerate(routes):
+                if loads[v] + self.stop_demand[s] > self.fleet[v]:
+                    continue
+                for pos in range(len(route) + 1):
+                    delta = self._insert_delta(route, states[v], s, pos)
+                    if np.isfinite(delta) and (best is None or delta < best[0]):
+                        best = (delta, v, pos)
+            if best is None:
+                unserved.append(s)
+            else:
+                _, v, pos = best
+                routes[v].insert(pos, s)
+                states[v] = self._route_state(routes[v])
+                loads[v] += self.stop_demand[s]
+        return routes, unserved
+
+    # ----- Local search -----
+
+    def _out_of_time(self):
+        return time.monotonic() >= self._deadline
+
+    def _relocate(self, routes):
+        states = [self._route_state(r) for r in routes]
+        loads = [self.load(r) for r in routes]
+        for v, route in enumerate(routes):
+            for i, s in enumerate(route):
+                if self._out_of_time():
+                    return False
+                removed = route[:i] + route[i + 1:]
+                gain_out = -self._remove_delta(route, states[v], i)
+                removed_state = self._route_state(removed)
+                for w, other in enumerate(routes):
+                    if w != v and loads[w] + self.stop_demand[s] > self.fleet[w]:
+                        continue
+                    target, state = (removed, removed_state) if w == v else (other, states[w])
+                    for pos in range(len(target) + 1):
+                        if w == v and pos == i:
+                            continue
+                        if self._insert_delta(target, state, s, pos) < gain_out - 1e-9:
+                            if w == v:
+                                routes[v] = removed[:pos] + [s] + removed[pos:]
+                            else:
+                                routes[v] = removed
+                                routes[w] = other[:pos] + [s] + other[pos:]
+                            return True
+        return False
+
+    def _swap(self, routes):
+        for v in range(len(routes)):
+            for w in range(v + 1, len(routes)):
+                a, b = routes[v], routes[w]
+                state_a, state_b = self._route_state(a), self._route_state(b)
+                load_a, load_b = self.load(a), self.load(b)
+                for i, s in enumerate(a):
+                    if self._out_of_time():
+                        return False
+                    for j, t in enumerate(b):
+                        da, db = self.stop_demand[s], self.stop_demand[t]
+                        if load_a - da + db > self.fleet[v] or load_b - db + da > self.fleet[w]:
+                            continue
+                        delta = self._replace_delta(a, state_a, i, t) + self._replace_delta(b, state_b, j, s)
+                        if delta < -1e-9:
+                            routes[v] = a[:i] + [t] + a[i + 1:]
+                            routes[w] = b[:j] + [s] + b[j + 1:]
+                            return True
+        return False
+
+    def _two_opt(self, routes):
+        # Reverses route[i..j]; the reversed segment is grown one stop at a time from its front
+        c, loc, weight = self.cost_rows, self.stop_loc, self.stop_weight
+        for v, route in enumerate(routes):
+            arrival, suffix, weighted = self._route_state(route)
+            for i in range(len(route) - 1):
+                if self._out_of_time():
+                    return False
+                prev = self._ends(route, i, i)[0]
+                at_prev = arrival[i - 1] if i else 0.0
+                last = first = loc[route[i]]
+                # Reversed segment: internal travel, total weight and weighted arrival relative to at_prev
+                seg_travel, seg_weight = 0.0, weight[route[i]]
+                seg_late = weight[route[i]] * c[prev][first]
+                for j in range(i + 1, len(route)):
+                    x, wx = loc[route[j]], weight[route[j]]
+                    # Prepending x delays every stop already in the segment by shift
+                    shift = c[prev][x] + c[x][first] - c[prev][first]
+                    seg_late += wx * c[prev][x] + seg_weight * shift
+                    seg_travel += c[x][first]
+                    seg_weight += wx
+                    first = x
+                    nxt = self._ends(route, j, j)[1]
+                    change = (c[prev][x] + seg_travel + c[last][nxt]) - (
+                        c[prev][last] + arrival[j] - arrival[i] + c[x][nxt])
+                    old_late = weighted[j + 1] - weighted[i] - at_prev * (suffix[i] - suffix[j + 1])
+                    if change + self.priority_weight * (seg_late - old_late + suffix[j + 1] * change) < -1e-9:
+                        routes[v] = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                        return True
+        return False
+
+    def _insert_unserved(self, routes, unserved):
+        # Retry stops left out by construction, e.g. after loads were rebalanced
+        for s in list(unserved):
+            for v, route in enumerate(routes):
+                if self.load(route) + self.stop_demand[s] <= self.fleet[v]:
+                    state = self._route_state(route)
+                    deltas = [self._insert_delta(route, state, s, p) for p in range(len(route) + 1)]
+                    best_pos = int(np.argmin(deltas))
+                    if np.isfinite(deltas[best_pos]):
+                        route.insert(best_pos, s)
+                        unserved.remove(s)
+                        break
+
+    def _kick(self, routes, moves=2):
+        # Random feasible relocations to leave a local optimum
+        for _ in range(moves):
+            v = self.rng.randrange(len(routes))
+            if not routes[v]:
+                continue
+            s = routes[v].pop(self.rng.randrange(len(routes[v])))
+            options = [w for w in range(len(routes)) if self.load(routes[w]) + self.stop_demand[s] <= self.fleet[w]]
+            w = self.rng.choice(options)
+            routes[w].insert(self.rng.randrange(len(routes[w]) + 1), s)
+
+    def solve(self, time_limit=2.0, on_improve=None, max_stale_kicks=MAX_STALE_KICKS):
+        """
+        Runs construction and then local search until time_limit seconds have
+        passed, or until max_stale_kicks kicks in a row found no better plan
+        (small instances converge long before the limit).
+        on_improve(plan) is called with every new best plan. Returns self.best.
+        """
+        self._deadline = time.monotonic() + time_limit
+        routes, unserved = self.construct(on_improve)
+        if self._publish(routes, unserved) and on_improve:
+            on_improve(self.best)
+        if not self.fleet:
+            return self.best
+
+        operators = [self._relocate, self._swap, self._two_opt]
+        stale_kicks = 0
+        while not self._out_of_time():
+            self._insert_unserved(routes, unserved)
+            improved = any(op(routes) for op in operators)
+            if self._publish(routes, unserved):
+                stale_kicks = 0
+                if on_improve:
+                    on_improve(self.best)
+            if improved:
+                continue
+            if stale_kicks >= max_stale_kicks:
+                break
+            stale_kicks += 1
+            # Local optimum: restart from the best plan with a random kick
+            routes = [list(r) for r in self._best_routes]
+            unserved = list(self._best_unserved)
+            self._kick(routes)
+        return self.best
+
+
+def plan_relief_tours(names, costs, depot, priority_df, fleet, time_limit=2.0, priority_weight=1.0,
+                      max_stale_kicks=MAX_STALE_KICKS):
+    # Convenience wrapper: build a planner and return its best plan within time_limit
+    return TourPlanner(names, costs, depot, priority_df, fleet, priority_weight).solve(time_limit,
+                                                                                       max_stale_kicks=max_stale_kicks)
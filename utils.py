@@ -2,6 +2,36 @@ import geopandas as gpd
 import pandas as pd
 from shapely.geometry import Point, Polygon
 
+# (min lon, min lat, max lon, max lat) of Uttarakhand
+UTTARAKHAND_BBOX = (77.55, 28.7, 81.05, 31.45)
+
+# Centroids for Uttarakhand districts (lat, lon)
+DISTRICT_CENTROIDS = {
+    "Dehradun": (30.3165, 78.0322),
+    "Haridwar": (29.9457, 78.1642),
+    "Nainital": (29.3919, 79.4542),
+    "Udham Singh Nagar": (28.9754, 79.3957),
+    "Almora": (29.5987, 79.6581),
+    "Pithoragarh": (29.5588, 80.2200),
+    "Rudraprayag": (30.2833, 79.0167),
+    "Tehri Garhwal": (30.3343, 78.4577),
+    "Champawat": (29.3099, 80.1351),
+    "Chamoli": (30.5079, 79.4083),
+    "Bageshwar": (29.8591, 79.8862),
+}
+
+# Relief importance of each amenity type, used for priority scoring
+AMENITY_WEIGHTS = {
+    'hospital': 5,
+    'clinic': 4,
+    'shelter': 3,
+    'fire_station': 4,
+    'police': 4,
+    'school': 2,
+    'pharmacy': 3,
+    'community_centre': 1
+}
+
 def load_districts():
     # Create 5 dummy districts as squares with names
     districts = [
@@ -1,41 +1,33 @@
 import folium
-import pandas as pd
-import geopandas as gpd
-from shapely import wkt
-
-# Load POIs with geometry and risk
-pois = pd.read_csv('pois.csv')
-pois['geometry'] = pois['geometry'].apply(wkt.loads)
-
-# Load roads with geometry
-roads = gpd.read_file('roads.csv') if False else None  # roads.csv is CSV with WKT geometry? We'll convert.
-
-# Since roads.csv geometry is WKT, convert:
-roads = pd.read_csv('roads.csv')
-roads['geometry'] = roads['geometry'].apply(wkt.loads)
-roads_gdf = gpd.GeoDataFrame(roads, geometry='geometry')
-
-# Initialize map centered around mean of POIs
-center = [pois.geometry.y.mean(), pois.geometry.x.mean()]
-m = folium.Map(location=center, zoom_start=8)
-
-# Add POIs to map colored by risk
-for _, row in pois.iterrows():
-    color = 'red' if row['risk_score'] > 0.5 else 'green'
-    folium.CircleMarker(
-        location=[row.geometry.y, row.geometry.x],
-        radius=5,
-        color=color,
-        fill=True,
-        fill_color=color,
-        popup=f"Amenity: {row.get('amenity', 'N/A')}<br>Risk: {row['risk_score']:.2f}"
-    ).add_to(m)
-
-# Add roads lines
-for _, row in roads_gdf.iterrows():
-    folium.GeoJson(row['geometry'], 
-                   style_function=lambda x: {'color': 'blue', 'weight': 1}).add_to(m)
-
-# Save to HTML
-m.save('map.html')
-print("Map saved as map.html")
+import shapely
+
+from data_processing import load_pois, load_roads
+from map_render import add_poi_clusters, add_road_layers
+
+def render_map(pois_path='pois.csv', roads_path='roads.csv', out_path='map.html'):
+    # Load POIs and roads with decoded geometry (GeoParquet when available, else CSV)
+    pois = load_pois(pois_path)
+    roads_gdf = load_roads(roads_path, columns=['geometry'])
+
+    # Polygon POIs (e.g. hospital grounds) are drawn at their centroid
+    points = shapely.centroid(pois.geometry.to_numpy())
+    pois = pois.assign(lon=shapely.get_x(points), lat=shapely.get_y(points))
+
+    # Initialize map centered around mean of POIs (canvas renderer for the many vector shapes)
+    center = [pois['lat'].mean(), pois['lon'].mean()]
+    m = folium.Map(location=center, zoom_start=8, prefer_canvas=True)
+
+    # POIs colored by risk, clustered in the browser
+    add_poi_clusters(m, pois)
+
+    # Roads merged into one layer per zoom band, simplified and size-capped
+    for lo, hi, tolerance, size in add_road_layers(m, roads_gdf.geometry.to_numpy()):
+        print(f"Roads for zoom {lo}-{hi}: {size / 1e6:.1f} MB (tolerance {tolerance:.2g} deg)")
+
+    # Save to HTML
+    m.save(out_path)
+    print(f"Map saved as {out_path}")
+    return m
+
+if __name__ == "__main__":
+    render_map()